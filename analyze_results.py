@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 import pandas as pd
 
 # Configuration
@@ -7,17 +8,33 @@ API_URL = 'http://216.22.5.204:5000/analyze'
 #API_URL = 'http://localhost:5000/analyze'
 INPUT_FILE = 'Dry_Wash2.json'
 
-def main():
-    print(f"1. Loading data from {INPUT_FILE}...")
-    try:
-        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print("Error: File not found.")
-        return
+# Submit the whole file as one background job (POST /jobs) instead of batches of 50
+USE_JOB_API = False
+JOB_POLL_SECONDS = 5
 
-    print(f"2. Sending {len(data)} conversations to API (in batches)...")
-    
+
+def run_job(data):
+    """Submit all conversations as a single job and wait for its results."""
+    base_url = API_URL.rsplit('/analyze', 1)[0]
+    response = requests.post(f'{base_url}/jobs', json=data)
+    response.raise_for_status()
+    job = response.json()
+    print(f"   Job {job['job_id']} queued.")
+
+    while job['status'] not in ('done', 'failed'):
+        time.sleep(JOB_POLL_SECONDS)
+        job = requests.get(f"{base_url}/jobs/{job['job_id']}").json()
+        print(f"   Progress: {job['processed']}/{job['total']} ({job['progress']}%)")
+
+    if job['status'] == 'failed':
+        print(f"   Job failed: {job.get('error')}")
+
+    # Partial results are kept even if the job failed midway
+    return requests.get(f"{base_url}/jobs/{job['job_id']}/results").json()['results']
+
+
+def run_batches(data):
+    """Send conversations to /analyze in synchronous batches."""
     results = []
     batch_size = 50  # Send 50 items at a time to avoid timeout
     
@@ -36,6 +53,25 @@ def main():
         except Exception as e:
             print(f" Error: {e}")
 
+    return results
+
+
+def main():
+    print(f"1. Loading data from {INPUT_FILE}...")
+    try:
+        with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print("Error: File not found.")
+        return
+
+    if USE_JOB_API:
+        print(f"2. Sending {len(data)} conversations to API (as one job)...")
+        results = run_job(data)
+    else:
+        print(f"2. Sending {len(data)} conversations to API (in batches)...")
+        results = run_batches(data)
+
     if not results:
         print("No results obtained.")
         return
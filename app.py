@@ -1,34 +1,153 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, url_for, stream_with_context
 from sentiment import SentimentAnalyzer
+import sentiment
+from prediction_cache import prediction_cache
+import job_store
+import upload_limits
+import windowing
+from coalescer import RequestCoalescer
+from json_stream import iter_lines
+import json
+import os
+import time
 
 app = Flask(__name__)
 
+# Conversations analyzed per step when streaming NDJSON in and out of /analyze
+NDJSON_BATCH_SIZE = int(os.environ.get('NDJSON_BATCH_SIZE', '32'))
+
+# Request body limits (bytes, or with a K/M/G suffix); larger requests get 413
+ANALYZE_MAX_BYTES = upload_limits.env_size('ANALYZE_MAX_BYTES', '32M')
+JOBS_MAX_BYTES = upload_limits.env_size('JOBS_MAX_BYTES', '256M')
+
+# NDJSON streamed to /analyze is read line by line, so its total size only
+# needs a sanity cap; each line (one conversation) gets the JSON body limit
+ANALYZE_STREAM_MAX_BYTES = upload_limits.env_size('ANALYZE_STREAM_MAX_BYTES', '4G')
+NDJSON_MAX_LINE_BYTES = ANALYZE_MAX_BYTES
+
+# Single-conversation calls arriving together share model batches. Only worth
+# it when a worker serves requests concurrently (gunicorn THREADS > 1);
+# 'auto' enables it then, '1'/'0' force it on/off
+COALESCE_REQUESTS = os.environ.get('COALESCE_REQUESTS', 'auto')
+if COALESCE_REQUESTS == 'auto':
+    COALESCE_REQUESTS = '1' if int(os.environ.get('THREADS', '1')) > 1 else '0'
+coalescer = RequestCoalescer(SentimentAnalyzer.analyze_batch) if COALESCE_REQUESTS == '1' else None
+
+upload_limits.install(app, {
+    'analyze': ANALYZE_MAX_BYTES,
+    'create_job': JOBS_MAX_BYTES,
+}, stream_limits={'analyze': ANALYZE_STREAM_MAX_BYTES})
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    limit = request.max_content_length or upload_limits.MAX_REQUEST_BYTES
+    return jsonify({'error': f'Request too large (max {upload_limits.describe(limit)})'}), 413
+
+
+# Served by /version (also by the ASGI app, app_asgi.py)
+VERSION_INFO = {
+    'version': '3.0',
+    'sentiment_levels': 7,
+    'features': ['weighted_scoring', 'real_7_scores', 'reduced_neutral_bias'],
+    'labels': [
+        'Very Negative',
+        'Negative',
+        'Slightly Negative',
+        'Neutral',
+        'Slightly Positive',
+        'Positive',
+        'Very Positive'
+    ]
+}
+
+
+def analyze_items(items: list) -> list:
+    """Analyze a list of conversations, tagging each result with its id."""
+    # All messages of the whole batch share one model work queue
+    results = SentimentAnalyzer.analyze_batch(items)
+    for item, result in zip(items, results):
+        # Make sure to include some ID if present to map back
+        cid = item.get('_id') or item.get('id')
+        if cid:
+            result['id'] = cid
+    return results
+
+
+def stream_ndjson_results(stream, batch_size: int | None = None):
+    """
+    Read one conversation per line from `stream` and yield one NDJSON result
+    line per input line, in order. Only `batch_size` conversations are held in
+    memory at a time, so peak memory does not grow with the payload size.
+    Lines over NDJSON_MAX_LINE_BYTES are skipped and answered with an error.
+    """
+    batch_size = batch_size or NDJSON_BATCH_SIZE
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        for result in analyze_items(batch):
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+        batch.clear()
+
+    for line_no, raw in enumerate(iter_lines(stream, max_line=NDJSON_MAX_LINE_BYTES), 1):
+        if raw is None:
+            error = 'Line too long'
+        else:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            error = None if isinstance(item, dict) else 'Invalid JSON object'
+        if error:
+            # Keep output aligned with input: emit pending results before the error line
+            yield from flush()
+            yield json.dumps({'error': error, 'line': line_no}) + '\n'
+            continue
+
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from flush()
+
+    yield from flush()
+
+
+@app.before_request
+def ensure_job_worker():
+    # Each gunicorn worker runs its own background job thread
+    job_store.start_worker(analyze_items)
+
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
+    # 0. Streaming mode: NDJSON in, NDJSON out, parsed and answered incrementally
+    if request.mimetype == 'application/x-ndjson':
+        return Response(
+            stream_with_context(stream_ndjson_results(request.stream)),
+            mimetype='application/x-ndjson'
+        )
+
     # 1. Check for file upload (multipart/form-data)
     if 'file' in request.files:
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
             
-        filename = file.filename.lower()
-        text = ""
-        
-        if filename.endswith('.pdf'):
-            from file_parser import parse_pdf
-            text = parse_pdf(file)
-        elif filename.endswith('.docx'):
-            from file_parser import parse_docx
-            text = parse_docx(file)
-        elif filename.endswith('.txt'):
-            text = file.read().decode('utf-8', errors='ignore')
-        else:
+        from file_parser import iter_document, first_text
+        chunks = iter_document(file, file.filename)
+        if chunks is None:
             return jsonify({'error': 'Unsupported file type. Use PDF, DOCX or TXT.'}), 400
-            
-        if not text.strip():
-             return jsonify({'error': 'Could not extract text from file or file is empty'}), 400
-             
-        result = SentimentAnalyzer.analyze_conversation(text)
+
+        # Pages/paragraphs are segmented and scored as they are extracted
+        chunks = first_text(chunks)
+        if chunks is None:
+            return jsonify({'error': 'Could not extract text from file or file is empty'}), 400
+
+        result = SentimentAnalyzer.analyze_text(chunks)
         return jsonify(result)
 
     # 2. Check for JSON body
@@ -39,41 +158,98 @@ def analyze():
         
     # Check if it's a list (batch) or single object
     if isinstance(data, list):
-        results = []
-        for item in data:
-            result = SentimentAnalyzer.analyze_conversation(item)
-            # Make sure to include some ID if present to map back
-            cid = item.get('_id') or item.get('id')
-            if cid:
-                result['id'] = cid
-            results.append(result)
-        return jsonify(results)
+        return jsonify(analyze_items(data))
     else:
         # Single mode
-        result = SentimentAnalyzer.analyze_conversation(data)
+        if coalescer is not None and isinstance(data, dict):
+            result = coalescer(data)
+        else:
+            result = SentimentAnalyzer.analyze_conversation(data)
         return jsonify(result)
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a batch of conversations for background analysis."""
+    data = request.get_json(force=True, silent=True)
+
+    if not isinstance(data, list) or not data:
+        return jsonify({'error': 'Invalid request. Send a non-empty JSON list of conversations.'}), 400
+
+    job_id = job_store.create_job(data)
+    job = job_store.get_job(job_id)
+    job['status_url'] = url_for('job_status', job_id=job_id)
+    job['results_url'] = url_for('job_results', job_id=job_id)
+    return jsonify(job), 202, {'Location': job['status_url']}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Job status and progress."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Results available so far (partial while the job is running)."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+    job['offset'] = offset
+    job['results'] = job_store.get_results(job_id, offset, limit)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    """Stream results as NDJSON lines while the job runs, until it finishes."""
+    if job_store.get_job(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        offset = request.args.get('offset', 0, type=int)
+        while True:
+            job = job_store.get_job(job_id)
+            for result in job_store.get_results(job_id, offset):
+                offset += 1
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+            # Status was read before the results, so nothing is left behind once finished
+            if job['status'] == 'failed':
+                yield json.dumps({'error': job.get('error', 'Job failed'), 'job_id': job_id}) + '\n'
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(job_store.JOB_POLL_SECONDS)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/health', methods=['GET'])
 def health():
+    """Liveness: answers as soon as the process is up, model loaded or not."""
     return jsonify({'status': 'ok'})
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 200 once the model is loaded in this worker, 503 until then."""
+    status = sentiment.model_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Runtime counters (prediction cache, model startup, windowing, request coalescing) for this worker."""
+    return jsonify({
+        'prediction_cache': prediction_cache.stats(),
+        'model': sentiment.model_status(),
+        'windowing': windowing.stats(),
+        'coalescer': coalescer.stats() if coalescer is not None else None
+    })
+
 @app.route('/version', methods=['GET'])
 def version():
     """Returns version info to verify deployment"""
-    return jsonify({
-        'version': '3.0',
-        'sentiment_levels': 7,
-        'features': ['weighted_scoring', 'real_7_scores', 'reduced_neutral_bias'],
-        'labels': [
-            'Very Negative',
-            'Negative', 
-            'Slightly Negative',
-            'Neutral',
-            'Slightly Positive',
-            'Positive',
-            'Very Positive'
-        ]
-    })
+    return jsonify(VERSION_INFO)
 
 if __name__ == '__main__':
+    sentiment.start_warm_up()
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,365 @@
+"""
+ASGI variant of the sentiment API (Starlette), with the same contract as app.py:
+POST /analyze (JSON object, JSON list, NDJSON stream or PDF/DOCX/TXT upload),
+GET /health, /ready, /version and /stats.
+
+    uvicorn app_asgi:app --host 0.0.0.0 --port 5000
+
+Request bodies and uploads are received on the event loop, so a slow client
+only costs a coroutine, never a model slot. Inference runs in a bounded
+thread pool (INFERENCE_WORKERS threads); at most ASGI_MAX_PENDING analyses
+may be queued or running, further requests get 429 right away. Single
+conversations are coalesced into shared batches (coalescer.py). When a
+client disconnects, its queued work is cancelled and a running document
+analysis stops at its next group of sentence windows.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import sentiment
+import upload_limits
+import windowing
+from app import (
+    ANALYZE_MAX_BYTES, ANALYZE_STREAM_MAX_BYTES, NDJSON_BATCH_SIZE, NDJSON_MAX_LINE_BYTES, VERSION_INFO, analyze_items
+)
+from coalescer import RequestCoalescer
+from file_parser import first_text, iter_document
+from json_stream import LineSplitter
+from prediction_cache import prediction_cache
+from sentiment import AnalysisCancelled, SentimentAnalyzer
+
+# Threads running the model (each uses TORCH_THREADS intra-op threads)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '1'))
+
+# Analyses queued or running before new requests are refused with 429
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', '32'))
+
+# Body limits per path; other paths get upload_limits.MAX_REQUEST_BYTES
+BODY_LIMITS = {'/analyze': ANALYZE_MAX_BYTES}
+
+# Limits per path of streamed NDJSON bodies (read line by line)
+STREAM_BODY_LIMITS = {'/analyze': ANALYZE_STREAM_MAX_BYTES}
+
+# How often a request waiting for the model checks whether its client is gone
+DISCONNECT_POLL_SECONDS = 0.1
+
+executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+
+# Coalesced single conversations run on the same bounded executor
+coalescer = RequestCoalescer(
+    lambda items: executor.submit(SentimentAnalyzer.analyze_batch, items).result(),
+    name='asgi-coalescer'
+)
+
+_pending_lock = threading.Lock()
+_pending = 0
+_rejected = 0
+
+
+def _release(_future):
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _admit(start, bounded: bool = True):
+    """
+    Start one analysis (`start()` returns its concurrent Future), refusing
+    with 429 when ASGI_MAX_PENDING analyses are already queued or running.
+    """
+    global _pending, _rejected
+    with _pending_lock:
+        if bounded and _pending >= ASGI_MAX_PENDING:
+            _rejected += 1
+            raise HTTPException(429, 'Server busy, retry later', headers={'Retry-After': '1'})
+        _pending += 1
+    try:
+        future = start()
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+async def _wait(request: Request, future, cancel_event: threading.Event | None = None):
+    """
+    Await a concurrent Future. If the client disconnects first, the work is
+    cancelled (or told to stop through `cancel_event`) and ClientDisconnect raised.
+    """
+    waiter = asyncio.wrap_future(future)
+    # Nobody awaits the result of abandoned work: keep asyncio from logging it
+    waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+    while True:
+        done, _ = await asyncio.wait({waiter}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return waiter.result()
+        if await request.is_disconnected():
+            future.cancel()
+            if cancel_event is not None:
+                cancel_event.set()
+            raise ClientDisconnect()
+
+
+class BodyLimitMiddleware:
+    """
+    413 for bodies over the path's limit: up front by Content-Length, or as
+    soon as a chunked body passes it. NDJSON bodies get `stream_limits`.
+    """
+
+    def __init__(self, app, limits: dict, default: int, stream_limits: dict | None = None):
+        self.app = app
+        self.limits = limits
+        self.default = default
+        self.stream_limits = stream_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope['headers'])
+        content_type = headers.get(b'content-type', b'').decode('latin-1')
+        if content_type.startswith(upload_limits.STREAM_MIMETYPE) and scope['path'] in self.stream_limits:
+            limit = self.stream_limits[scope['path']]
+        else:
+            limit = self.limits.get(scope['path'], self.default)
+        too_large = f'Request too large (max {upload_limits.describe(limit)})'
+
+        length = headers.get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > limit:
+            await JSONResponse({'error': too_large}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise HTTPException(413, too_large)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body generator reads the request as it goes.
+    Starlette's stock disconnect listener (ASGI spec < 2.4 servers, uvicorn
+    included) would receive, and lose, the request body chunks it races for;
+    here disconnects surface through request.stream() instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+def _close_uploads(form):
+    """Close the spooled files of a parsed form (sync: callable from the inference thread)."""
+    for _, value in form.multi_items():
+        if isinstance(value, UploadFile):
+            value.file.close()
+
+
+async def _analyze_upload(request: Request) -> Response:
+    form = await request.form()
+    future = None
+    try:
+        file = form.get('file')
+        if file is None or isinstance(file, str):
+            return JSONResponse({'error': 'Invalid request. Send JSON body or upload a file.'}, status_code=400)
+        if not file.filename:
+            return JSONResponse({'error': 'No selected file'}, status_code=400)
+
+        chunks = iter_document(file.file, file.filename)
+        if chunks is None:
+            return JSONResponse({'error': 'Unsupported file type. Use PDF, DOCX or TXT.'}, status_code=400)
+
+        # Opening the document and reading its first page is blocking I/O
+        chunks = await run_in_threadpool(first_text, chunks)
+        if chunks is None:
+            return JSONResponse({'error': 'Could not extract text from file or file is empty'}, status_code=400)
+
+        cancel_event = threading.Event()
+        future = _admit(lambda: executor.submit(SentimentAnalyzer.analyze_text, chunks, cancel_event))
+        return JSONResponse(await _wait(request, future, cancel_event))
+    finally:
+        if future is None:
+            await form.close()
+        else:
+            # The analysis may still be reading the upload (client gone, cancel
+            # pending until its next window group): close it once it is done
+            future.add_done_callback(lambda _: _close_uploads(form))
+
+
+async def _stream_ndjson(request: Request, batch_size: int = NDJSON_BATCH_SIZE):
+    """Async twin of app.stream_ndjson_results: one result line per input line, in order."""
+    batch = []
+    line_no = 0
+
+    async def flush():
+        results = await _wait(request, _admit(lambda: executor.submit(analyze_items, list(batch)), bounded=False))
+        batch.clear()
+        return [json.dumps(result, ensure_ascii=False) + '\n' for result in results]
+
+    async def lines():
+        # The splitter behind json_stream.iter_lines (Flask app), fed the ASGI body chunks
+        splitter = LineSplitter(NDJSON_MAX_LINE_BYTES)
+        async for chunk in request.stream():
+            for raw in splitter.feed(chunk):
+                yield raw
+        for raw in splitter.finish():
+            yield raw
+
+    try:
+        async for raw in lines():
+            line_no += 1
+            if raw is None:
+                error = 'Line too long'
+            else:
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    item = None
+                error = None if isinstance(item, dict) else 'Invalid JSON object'
+            if error:
+                # Keep output aligned with input: emit pending results before the error line
+                if batch:
+                    for out in await flush():
+                        yield out
+                yield json.dumps({'error': error, 'line': line_no}) + '\n'
+                continue
+
+            batch.append(item)
+            if len(batch) >= batch_size:
+                for out in await flush():
+                    yield out
+
+        if batch:
+            for out in await flush():
+                yield out
+    except HTTPException as e:
+        # The response has already started: report the error in-band
+        yield json.dumps({'error': e.detail, 'line': line_no}) + '\n'
+    except (ClientDisconnect, AnalysisCancelled):
+        return
+
+
+async def analyze(request: Request) -> Response:
+    content_type = request.headers.get('content-type', '')
+    try:
+        # 0. Streaming mode: NDJSON in, NDJSON out, parsed and answered incrementally
+        if content_type.startswith('application/x-ndjson'):
+            with _pending_lock:
+                busy = _pending >= ASGI_MAX_PENDING
+            if busy:
+                raise HTTPException(429, 'Server busy, retry later', headers={'Retry-After': '1'})
+            return NDJSONStreamingResponse(_stream_ndjson(request), media_type='application/x-ndjson')
+
+        # 1. File upload (multipart/form-data)
+        if content_type.startswith('multipart/form-data'):
+            return await _analyze_upload(request)
+
+        # 2. JSON body
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            data = None
+        if not data:
+            return JSONResponse({'error': 'Invalid request. Send JSON body or upload a file.'}, status_code=400)
+
+        if isinstance(data, list):
+            future = _admit(lambda: executor.submit(analyze_items, data))
+        elif isinstance(data, dict):
+            future = _admit(lambda: coalescer.submit(data))
+        else:
+            future = _admit(lambda: executor.submit(SentimentAnalyzer.analyze_conversation, data))
+        return JSONResponse(await _wait(request, future))
+    except (ClientDisconnect, AnalysisCancelled):
+        # Nobody is listening any more (nginx's "client closed request")
+        return Response(status_code=499)
+
+
+async def health(request: Request) -> Response:
+    """Liveness: answers as soon as the process is up, model loaded or not."""
+    return JSONResponse({'status': 'ok'})
+
+
+async def ready(request: Request) -> Response:
+    """Readiness: 200 once the model is loaded, 503 until then."""
+    status = sentiment.model_status()
+    return JSONResponse(status, status_code=200 if status['ready'] else 503)
+
+
+async def stats(request: Request) -> Response:
+    """Runtime counters (prediction cache, model startup, windowing, coalescing, inference queue)."""
+    with _pending_lock:
+        inference = {
+            'workers': INFERENCE_WORKERS,
+            'pending': _pending,
+            'max_pending': ASGI_MAX_PENDING,
+            'rejected': _rejected
+        }
+    return JSONResponse({
+        'prediction_cache': prediction_cache.stats(),
+        'model': sentiment.model_status(),
+        'windowing': windowing.stats(),
+        'coalescer': coalescer.stats(),
+        'inference': inference
+    })
+
+
+async def version(request: Request) -> Response:
+    """Returns version info to verify deployment"""
+    return JSONResponse(VERSION_INFO)
+
+
+async def http_error(request: Request, exc: HTTPException) -> Response:
+    return JSONResponse({'error': exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if os.environ.get('MODEL_WARMUP', '1') == '1':
+        sentiment.start_warm_up()
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/analyze', analyze, methods=['POST']),
+        Route('/health', health, methods=['GET']),
+        Route('/ready', ready, methods=['GET']),
+        Route('/stats', stats, methods=['GET']),
+        Route('/version', version, methods=['GET']),
+    ],
+    middleware=[Middleware(
+        BodyLimitMiddleware, limits=BODY_LIMITS, default=upload_limits.MAX_REQUEST_BYTES,
+        stream_limits=STREAM_BODY_LIMITS
+    )],
+    exception_handlers={HTTPException: http_error},
+    lifespan=lifespan
+)
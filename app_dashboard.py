@@ -3,16 +3,28 @@ Sentiment Analysis Dashboard — Flask Web Application
 Runs on port 5001, independent from the API on port 5000.
 """
 
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, session, abort
 from sentiment import SentimentAnalyzer
+import sentiment
 from feedback_store import (
     save_feedback, load_feedbacks, clear_feedbacks,
     get_correction_offsets, get_feedback_stats
 )
+from prediction_cache import prediction_cache
+from json_stream import iter_json_array, NotAnArrayError
+import upload_limits
+import upload_pool
+import windowing
+from upload_pool import analyze_shards, predict_conversations
+from session_store import (
+    SessionWriter, load_session, load_messages, list_sessions, delete_session,
+    query_results, load_metrics, update_row_label, rescore_session, rescore_sessions,
+    valid_session_id, DEFAULT_PAGE_SIZE
+)
 import json
 import uuid
 import os
-import gc
+import numpy as np
 from datetime import datetime
 
 app = Flask(__name__)
@@ -22,9 +34,41 @@ app.secret_key = os.urandom(24)
 # For production, this could be Redis or a database
 analysis_sessions = {}
 
-# Directory to store session results on disk
-SESSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sessions')
-os.makedirs(SESSIONS_DIR, exist_ok=True)
+# Sessions shown per page on the upload page
+SESSIONS_PER_PAGE = 10
+
+# Conversations decoded and analyzed together during an upload (one pool shard)
+UPLOAD_BATCH_SIZE = int(os.environ.get('UPLOAD_BATCH_SIZE', '32'))
+
+# Request body limits (bytes, or with a K/M/G suffix); larger requests get 413
+DASHBOARD_UPLOAD_MAX_BYTES = upload_limits.env_size('DASHBOARD_UPLOAD_MAX_BYTES', '256M')
+
+upload_limits.install(app, {'upload': DASHBOARD_UPLOAD_MAX_BYTES})
+
+
+POSITIVE_LABELS = {'Very Positive', 'Positive', 'Slightly Positive'}
+NEGATIVE_LABELS = {'Very Negative', 'Negative', 'Slightly Negative'}
+
+
+def label_group_pct(label_counts: dict, labels: set, total: int) -> float:
+    """Percentage of conversations whose label belongs to `labels`."""
+    count = sum(label_counts.get(lbl, 0) for lbl in labels)
+    return round(count / total * 100, 1) if total else 0
+
+
+def breakdown_rows(buckets: dict) -> list:
+    """Turn per-agent/per-day metric buckets into sorted table rows."""
+    rows = []
+    for key, bucket in sorted(buckets.items()):
+        count = bucket['count']
+        rows.append({
+            'key': key or '—',
+            'count': count,
+            'avg_score': round(bucket['score_sum'] / count, 1) if count else 0,
+            'positive_pct': label_group_pct(bucket['label_counts'], POSITIVE_LABELS, count),
+            'negative_pct': label_group_pct(bucket['label_counts'], NEGATIVE_LABELS, count)
+        })
+    return rows
 
 
 def label_to_css_class(label: str) -> str:
@@ -52,47 +96,125 @@ def get_message_preview(conversation: dict) -> str:
     return '(sem mensagens)'
 
 
-def save_session(session_id: str, data: dict):
-    """Persist session results to disk."""
-    path = os.path.join(SESSIONS_DIR, f'{session_id}.json')
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False)
+def build_result_rows(conversations: list, start_index: int, use_refinement: bool, offsets: dict,
+                      probas: list | None = None) -> list:
+    """
+    Analyze a batch of uploaded conversations and build their result rows.
+    `probas` are the batch's model probabilities when already computed (by
+    the upload pool, see upload_pool.py); otherwise the model runs here.
+    Each row carries the model probabilities of its messages ('probas') so
+    the session can be re-scored later without running the model.
+    """
+    refine_with = offsets if use_refinement else None
+    if probas is None:
+        probas = predict_conversations(conversations, start_index)
 
+    # Score the analyzed conversations together; the others get an error row
+    analyzed = [p for p in probas if p is not None]
+    matrix = np.concatenate(analyzed) if analyzed else np.empty((0, 3), dtype=np.float64)
+    segment_ids = np.repeat(np.arange(len(analyzed)), [len(p) for p in analyzed])
+    scored = iter(SentimentAnalyzer.score_batch(matrix, segment_ids, len(analyzed), refine_with))
+    analyses = [next(scored) if p is not None else None for p in probas]
 
-def load_session(session_id: str) -> dict | None:
-    """Load session results from disk."""
-    path = os.path.join(SESSIONS_DIR, f'{session_id}.json')
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
-
-
-def list_sessions() -> list:
-    """List all saved analysis sessions."""
-    sessions = []
-    if not os.path.exists(SESSIONS_DIR):
-        return sessions
-    
-    for fname in sorted(os.listdir(SESSIONS_DIR), reverse=True):
-        if fname.endswith('.json'):
-            sid = fname.replace('.json', '')
-            data = load_session(sid)
-            if data:
-                sessions.append({
-                    'id': sid,
-                    'filename': data.get('filename', 'Desconhecido'),
-                    'count': data.get('count', 0),
-                    'date': data.get('date', '')
-                })
-    return sessions[:10]  # Show last 10
+    rows = []
+    for i, (conversation, analysis) in enumerate(zip(conversations, analyses), start_index):
+        conv_id = conversation.get('_id') or conversation.get('id') or str(i)
+        conversation_probas = probas[i - start_index]
+        
+        if analysis is None:
+            analysis = {
+                'score': 50.0,
+                'sentiment_label': 'Neutral',
+                'level_scores': {},
+                'refined': False,
+                'analysis_error': True
+            }
+            conversation_probas = []
+        
+        rows.append({
+            'id': conv_id,
+            'score': analysis['score'],
+            'sentiment_label': analysis['sentiment_label'],
+            'level_scores': analysis.get('level_scores', {}),
+            'refined': analysis.get('refined', False),
+            'preview': get_message_preview(conversation),
+            'ai_agent': conversation.get('AI Agent', '').strip(),
+            'link': conversation.get('Link', ''),
+            'created_at': conversation.get('CreatedAt', ''),
+            'human_escalation': conversation.get('HumanEscalation', False),
+            'css_class': label_to_css_class(analysis['sentiment_label']),
+            'messages': conversation.get('Full Conversation', []),
+            'probas': conversation_probas
+        })
+        if analysis.get('analysis_error'):
+            rows[-1]['analysis_error'] = True
+    return rows
 
 
 @app.route('/')
 def index():
-    """Upload page."""
-    sessions = list_sessions()
-    return render_template('upload.html', sessions=sessions)
+    """Upload page with the paged session catalog."""
+    search = request.args.get('q', '').strip()
+    catalog = list_sessions(
+        page=request.args.get('page', 1, type=int),
+        per_page=SESSIONS_PER_PAGE,
+        search=search or None
+    )
+    return render_template(
+        'upload.html', sessions=catalog['sessions'], catalog=catalog, search=search,
+        max_upload_bytes=DASHBOARD_UPLOAD_MAX_BYTES,
+        max_upload_size=upload_limits.describe(DASHBOARD_UPLOAD_MAX_BYTES)
+    )
+
+
+@app.url_value_preprocessor
+def check_session_id(endpoint, values):
+    """404 for any <session_id> in a URL that is not a session id ('..', '.', ...)."""
+    if values and 'session_id' in values and not valid_session_id(values['session_id']):
+        abort(404)
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Rejected before the body was read: back to the upload page with the limit."""
+    limit = request.max_content_length or upload_limits.MAX_REQUEST_BYTES
+    flash(f'Arquivo muito grande. O limite é {upload_limits.describe(limit)}.', 'error')
+    return index(), 413
+
+
+@app.route('/sessions/<session_id>/delete', methods=['POST'])
+def delete_session_route(session_id):
+    """Delete a saved analysis session."""
+    if delete_session(session_id):
+        flash('Análise removida.', 'success')
+    else:
+        flash('Sessão de análise não encontrada.', 'error')
+    return redirect(url_for('index', q=request.args.get('q') or None, page=request.args.get('page') or None))
+
+
+@app.route('/sessions/<session_id>/rescore', methods=['POST'])
+def rescore_session_route(session_id):
+    """Recompute a session's labels from its stored probabilities with the current feedbacks."""
+    done = rescore_session(session_id, get_correction_offsets())
+    if done is None:
+        flash('Sessão de análise não encontrada.', 'error')
+        return redirect(url_for('index'))
+    if done:
+        flash('Análise recalculada com os feedbacks atuais.', 'success')
+    else:
+        flash('Esta análise foi salva sem as probabilidades do modelo. Envie o arquivo novamente para recalculá-la.', 'error')
+    return redirect(url_for('results', session_id=session_id))
+
+
+@app.route('/sessions/rescore', methods=['POST'])
+def rescore_sessions_route():
+    """Recompute every saved session with the current feedbacks."""
+    summary = rescore_sessions(get_correction_offsets())
+    message = f"{summary['rescored']} análise(s) recalculada(s)."
+    if summary['skipped']:
+        message += f" {summary['skipped']} análise(s) antiga(s) sem probabilidades foram ignoradas."
+    flash(message, 'success')
+    return redirect(request.referrer or url_for('index'))
 
 
 @app.route('/upload', methods=['POST'])
@@ -111,75 +233,90 @@ def upload():
         flash('Formato não suportado. Use um arquivo JSON.', 'error')
         return redirect(url_for('index'))
     
-    try:
-        data = json.load(file)
-    except json.JSONDecodeError:
-        flash('Arquivo JSON inválido.', 'error')
-        return redirect(url_for('index'))
-    
-    if not isinstance(data, list):
-        flash('O JSON deve conter uma lista de conversas.', 'error')
-        return redirect(url_for('index'))
-    
     # Check if refinement is available
     offsets = get_correction_offsets()
     use_refinement = offsets['count'] > 0
     
-    # Process each conversation
-    results = []
-    for i, conversation in enumerate(data):
-        conv_id = conversation.get('_id') or conversation.get('id') or str(i)
-        
-        try:
-            if use_refinement:
-                analysis = SentimentAnalyzer.analyze_conversation_with_refinement(conversation)
-            else:
-                analysis = SentimentAnalyzer.analyze_conversation(conversation)
-                analysis['refined'] = False
-        except Exception as e:
-            print(f"Error analyzing conversation {conv_id}: {e}")
-            analysis = {
-                'score': 50.0,
-                'sentiment_label': 'Neutral',
-                'level_scores': {},
-                'refined': False
-            }
-        
-        results.append({
-            'id': conv_id,
-            'score': analysis['score'],
-            'sentiment_label': analysis['sentiment_label'],
-            'level_scores': analysis.get('level_scores', {}),
-            'refined': analysis.get('refined', False),
-            'preview': get_message_preview(conversation),
-            'ai_agent': conversation.get('AI Agent', '').strip(),
-            'link': conversation.get('Link', ''),
-            'created_at': conversation.get('CreatedAt', ''),
-            'human_escalation': conversation.get('HumanEscalation', False),
-            'css_class': label_to_css_class(analysis['sentiment_label']),
-            'messages': conversation.get('Full Conversation', [])
-        })
-        
-        # Garbage collection every 50 items
-        if (i + 1) % 50 == 0:
-            gc.collect()
-    
-    # Create session
+    upload_id = request.args.get('upload_id', '')
+    upload_pool.expire_progress()
+    upload_pool.report_progress(upload_id, state='running', conversations=0, percent=0)
+
+    # Upload size, for progress; the spooled upload is seekable
+    stream = file.stream
+    try:
+        stream.seek(0, os.SEEK_END)
+        total_bytes = stream.tell()
+        stream.seek(0)
+    except (AttributeError, OSError):
+        total_bytes = 0
+
+    def shards():
+        """(start index, bytes decoded so far) and conversations of each batch."""
+        batch = []
+        start = 0
+        for conversation in iter_json_array(stream):
+            batch.append(conversation)
+            if len(batch) >= UPLOAD_BATCH_SIZE:
+                yield (start, stream.tell()), batch
+                start += len(batch)
+                batch = []
+        if batch:
+            yield (start, total_bytes), batch
+
+    # Decode the array incrementally and analyze it batch by batch, in the
+    # upload pool when there is one (results come back in input order); each
+    # raw conversation is dropped as soon as its result row is built, and
+    # message bodies go straight to the session's message store
     session_id = datetime.now().strftime('%Y%m%d_%H%M%S') + '_' + uuid.uuid4().hex[:6]
-    session_data = {
-        'filename': file.filename,
-        'count': len(results),
-        'date': datetime.now().strftime('%d/%m/%Y %H:%M'),
-        'results': results,
-        'refinement_active': use_refinement,
-        'feedback_count': offsets['count']
-    }
-    
-    save_session(session_id, session_data)
-    
+    writer = SessionWriter(session_id)
+    try:
+        for (start, position), batch, probas in analyze_shards(shards()):
+            for row in build_result_rows(batch, start, use_refinement, offsets, probas):
+                writer.add(row)
+            upload_pool.report_progress(
+                upload_id, state='running', conversations=writer.count,
+                percent=round(100.0 * position / total_bytes, 1) if total_bytes else None
+            )
+
+        # Create session
+        writer.close({
+            'filename': file.filename,
+            'date': datetime.now().strftime('%d/%m/%Y %H:%M'),
+            'refinement_active': use_refinement,
+            'feedback_count': offsets['count']
+        })
+    except NotAnArrayError:
+        writer.discard()
+        upload_pool.report_progress(upload_id, state='error')
+        flash('O JSON deve conter uma lista de conversas.', 'error')
+        return redirect(url_for('index'))
+    except json.JSONDecodeError:
+        writer.discard()
+        upload_pool.report_progress(upload_id, state='error')
+        flash('Arquivo JSON inválido.', 'error')
+        return redirect(url_for('index'))
+    except Exception as e:
+        # Model/pool failure, session store I/O error, unexpected element...:
+        # no half-written session, and the page stops polling
+        print(f"Error processing upload {file.filename}: {e}")
+        writer.discard()
+        upload_pool.report_progress(upload_id, state='error')
+        flash('Erro ao processar o arquivo. Verifique se cada item da lista é uma conversa.', 'error')
+        return redirect(url_for('index'))
+
+    upload_pool.report_progress(upload_id, state='done', conversations=writer.count, percent=100)
     return redirect(url_for('results', session_id=session_id))
 
 
+@app.route('/upload/progress/<upload_id>')
+def upload_progress(upload_id):
+    """Progress of an upload being analyzed (polled by the upload page)."""
+    progress = upload_pool.read_progress(upload_id)
+    if progress is None:
+        return jsonify({'state': 'unknown'}), 404
+    return jsonify(progress)
+
+
 @app.route('/results/<session_id>')
 def results(session_id):
     """Display analysis results."""
@@ -189,21 +326,14 @@ def results(session_id):
         flash('Sessão de análise não encontrada.', 'error')
         return redirect(url_for('index'))
     
-    results_list = data['results']
+    # Metrics were aggregated when the session was saved (no per-row data is loaded)
+    metrics = load_metrics(session_id, data)
+    label_counts = metrics['label_counts']
+    total = metrics['total']
+    avg_score = round(metrics['score_sum'] / total, 1) if total else 0
     
-    # Calculate metrics
-    scores = [r['score'] for r in results_list]
-    avg_score = round(sum(scores) / len(scores), 1) if scores else 0
-    
-    positive_labels = {'Very Positive', 'Positive', 'Slightly Positive'}
-    negative_labels = {'Very Negative', 'Negative', 'Slightly Negative'}
-    
-    positive_count = sum(1 for r in results_list if r['sentiment_label'] in positive_labels)
-    negative_count = sum(1 for r in results_list if r['sentiment_label'] in negative_labels)
-    total = len(results_list)
-    
-    positive_pct = round(positive_count / total * 100, 1) if total else 0
-    negative_pct = round(negative_count / total * 100, 1) if total else 0
+    positive_pct = label_group_pct(label_counts, POSITIVE_LABELS, total)
+    negative_pct = label_group_pct(label_counts, NEGATIVE_LABELS, total)
     
     # Distribution
     label_order = [
@@ -216,11 +346,6 @@ def results(session_id):
         ('Very Negative', 'very-negative'),
     ]
     
-    label_counts = {}
-    for r in results_list:
-        lbl = r['sentiment_label']
-        label_counts[lbl] = label_counts.get(lbl, 0) + 1
-    
     distribution = []
     for label, css_class in label_order:
         count = label_counts.get(label, 0)
@@ -234,16 +359,58 @@ def results(session_id):
     
     return render_template('results.html',
         session=data,
-        results=results_list,
+        session_id=session_id,
+        agents=sorted(agent for agent in metrics['by_agent'] if agent),
+        page_size=DEFAULT_PAGE_SIZE,
         avg_score=avg_score,
         positive_pct=positive_pct,
         negative_pct=negative_pct,
         distribution=distribution,
+        agent_breakdown=breakdown_rows(metrics['by_agent']),
+        day_breakdown=breakdown_rows(metrics['by_day']),
         refinement_active=data.get('refinement_active', False),
         feedback_count=data.get('feedback_count', 0)
     )
 
 
+def _bool_arg(name: str) -> bool | None:
+    """Tri-state query flag: '1'/'true' -> True, '0'/'false' -> False, absent -> None."""
+    value = request.args.get(name, '').lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    return None
+
+
+@app.route('/api/sessions/<session_id>/results')
+def session_results_api(session_id):
+    """Paged, sorted and filtered result rows of a session."""
+    page = query_results(
+        session_id,
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int),
+        sort=request.args.get('sort', 'index'),
+        order=request.args.get('order', 'asc'),
+        label=request.args.get('label') or None,
+        agent=request.args.get('agent') or None,
+        human_escalation=_bool_arg('human_escalation'),
+        refined=_bool_arg('refined')
+    )
+    if page is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(page)
+
+
+@app.route('/results/<session_id>/conversations/<int:index>')
+def conversation_messages(session_id, index):
+    """Message bodies of one conversation, fetched lazily by the results modal."""
+    messages = load_messages(session_id, index)
+    if messages is None:
+        return jsonify({'error': 'Conversation not found'}), 404
+    return jsonify({'index': index, 'messages': messages})
+
+
 @app.route('/feedback', methods=['POST'])
 def feedback():
     """Save a user correction (AJAX endpoint)."""
@@ -259,12 +426,21 @@ def feedback():
     
     if not all([conversation_id, original_label, corrected_label]):
         return jsonify({'error': 'Missing fields'}), 400
+
+    session_id = data.get('session_id')
+    if session_id is not None and not valid_session_id(session_id):
+        return jsonify({'error': 'Session not found'}), 404
     
     if original_label == corrected_label:
         return jsonify({'error': 'Same label, no correction needed'}), 400
     
     save_feedback(conversation_id, original_label, corrected_label, original_score)
     
+    # Keep the stored session in sync so its metrics reflect the correction
+    index = data.get('index')
+    if session_id and isinstance(index, int):
+        update_row_label(session_id, index, corrected_label, label_to_css_class(corrected_label))
+    
     return jsonify({
         'success': True,
         'message': f'Correção salva: {original_label} → {corrected_label}'
@@ -293,9 +469,36 @@ def clear_feedbacks_route():
     return redirect(url_for('feedbacks_page'))
 
 
+@app.route('/stats')
+def stats():
+    """Runtime counters (prediction cache hits/misses, model startup, windowing, upload pool) for this worker."""
+    return jsonify({
+        'prediction_cache': prediction_cache.stats(),
+        'model': sentiment.model_status(),
+        'windowing': windowing.stats(),
+        'upload_pool': upload_pool.stats()
+    })
+
+
+@app.route('/health')
+def health():
+    """Liveness: answers as soon as the process is up, model loaded or not."""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/ready')
+def ready():
+    """Readiness: 200 once the model is loaded in this worker, 503 until then."""
+    status = sentiment.model_status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
 if __name__ == '__main__':
     print("=" * 50)
     print("  Sentiment Analysis Dashboard")
     print("  http://localhost:5001")
     print("=" * 50)
+    # The debug reloader's parent process only watches files
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        sentiment.start_warm_up()
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,79 @@
+"""
+Parity check of an inference backend against stock PyTorch.
+
+    python backend_parity.py --backend torch-int8
+    python backend_parity.py --backend onnx --input Dry_Wash2.json --limit 500
+
+Runs the fixture texts (inference.PARITY_TEXTS, or the customer messages of
+a conversations export) through both backends and reports the max/mean
+probability delta, how many predictions changed class, and the time each
+backend took. Exits with status 1 when the max delta exceeds --tolerance.
+"""
+
+import argparse
+import json
+import sys
+
+import torch
+from pysentimiento import create_analyzer
+from pysentimiento.preprocessing import preprocess_tweet
+
+import inference
+
+LANG = "pt"
+
+
+def load_texts(path: str, limit: int) -> list:
+    """Customer messages of a conversations export (or a plain list of strings)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    texts = []
+    for item in data:
+        if isinstance(item, str):
+            texts.append(item)
+        elif isinstance(item.get('message'), str):
+            texts.append(item['message'])
+        else:
+            texts.extend(m.get('message', '') for m in item.get('Full Conversation', []) if not m.get('sender'))
+        if len(texts) >= limit:
+            break
+    return [t.strip() for t in texts[:limit] if len(t.strip()) > 2]
+
+
+def load_analyzer():
+    analyzer = create_analyzer(task="sentiment", lang=LANG)
+    analyzer.model.eval()
+    return analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default=inference.INFERENCE_BACKEND, choices=sorted(inference.BACKENDS))
+    parser.add_argument('--input', help='conversations export to take texts from (default: built-in fixtures)')
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--tolerance', type=float, default=0.05, help='max accepted probability delta')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    texts = load_texts(args.input, args.limit) if args.input else inference.PARITY_TEXTS
+
+    # Separate model instances: int8 quantization rewrites its model in place
+    reference_analyzer = load_analyzer()
+    reference = inference.TorchBackend(reference_analyzer.model)
+    backend = inference.create_backend(args.backend, load_analyzer().model, threads=args.threads)
+
+    prep_args = dict(getattr(reference_analyzer, 'preprocessing_args', None) or {})
+    prep_args.setdefault('lang', LANG)
+    prepared = [preprocess_tweet(t, **prep_args) for t in texts]
+
+    report = inference.check_parity(backend, reference, reference_analyzer.tokenizer, prepared)
+    print(json.dumps(report, indent=2))
+    if report['max_delta'] > args.tolerance:
+        print(f"FAIL: max probability delta {report['max_delta']:.4f} > {args.tolerance}")
+        sys.exit(1)
+    print(f"OK: max probability delta {report['max_delta']:.4f} <= {args.tolerance}")
+
+
+if __name__ == '__main__':
+    main()
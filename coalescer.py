@@ -0,0 +1,143 @@
+"""
+Coalescer — micro-batching of concurrent single-conversation requests.
+
+Request threads submit one item each; a background thread collects them
+and calls the batch handler (e.g. SentimentAnalyzer.analyze_batch) once
+per group, so concurrent callers share full model batches instead of
+each running its own. A group is flushed when it reaches max_batch_size
+items or when its oldest item has waited max_wait_ms, whichever comes
+first. Every caller gets its own result (or exception) through a Future.
+
+stats() reports the queue depth, batch sizes, flush reasons and the time
+items spent waiting and being processed.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+# Max items per flushed batch
+COALESCE_MAX_BATCH = int(os.environ.get('COALESCE_MAX_BATCH', '32'))
+
+# Max time the oldest queued item waits before its batch is flushed
+COALESCE_MAX_WAIT_MS = float(os.environ.get('COALESCE_MAX_WAIT_MS', '10'))
+
+
+class RequestCoalescer:
+    """Queue single items and run them through `handler(items) -> results` in batches."""
+
+    def __init__(self, handler, max_batch_size: int = COALESCE_MAX_BATCH,
+                 max_wait_ms: float = COALESCE_MAX_WAIT_MS, name: str = 'coalescer'):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+        self._reset()
+        # Locks and the flush thread do not survive fork: start over in the child
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._fallbacks = 0
+        self._max_batch = 0
+        self._sizes = Counter()
+        self._reasons = Counter()
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def submit(self, item) -> Future:
+        """Queue `item`; the returned Future resolves to its result."""
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+            self._pending.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def __call__(self, item, timeout: float | None = None):
+        """Submit `item` and wait for its result."""
+        return self.submit(item).result(timeout)
+
+    def _next_batch(self) -> tuple:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._pending), self.max_batch_size)
+            batch = [self._pending.popleft() for _ in range(size)]
+        return batch, 'size' if size >= self.max_batch_size else 'wait'
+
+    def _loop(self):
+        while True:
+            batch, reason = self._next_batch()
+            self._run(batch, reason)
+
+    def _run(self, batch: list, reason: str):
+        # Callers that gave up (cancelled futures) are dropped
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        fallback = False
+        try:
+            results = self.handler([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"handler returned {len(results)} results for {len(batch)} items")
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            # One bad item must not fail the whole group: retry them one by one
+            print(f"Error in coalesced batch of {len(batch)}, retrying individually: {e}")
+            fallback = True
+            for item, future, _ in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(self.handler([item])[0])
+                except Exception as item_error:
+                    future.set_exception(item_error)
+        finished = time.perf_counter()
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._fallbacks += fallback
+            self._max_batch = max(self._max_batch, len(batch))
+            self._sizes[len(batch)] += 1
+            self._reasons[reason] += 1
+            self._wait_seconds += sum(start - queued for _, _, queued in batch)
+            self._run_seconds += finished - start
+
+    def stats(self) -> dict:
+        """Queue depth and batching counters for this process."""
+        with self._cond:
+            depth = len(self._pending)
+        with self._stats_lock:
+            return {
+                'queue_depth': depth,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'largest_batch': self._max_batch,
+                'batch_sizes': dict(sorted(self._sizes.items())),
+                'flush_reasons': dict(self._reasons),
+                'fallbacks': self._fallbacks,
+                'avg_wait_ms': round(self._wait_seconds / self._items * 1000.0, 2) if self._items else 0.0,
+                'avg_batch_ms': round(self._run_seconds / self._batches * 1000.0, 2) if self._batches else 0.0
+            }
@@ -1,14 +1,25 @@
 """
 Feedback Store — persists user corrections for model refinement.
-Stores feedbacks in feedbacks.json and calculates correction offsets.
+Stores feedbacks in feedbacks.sqlite (WAL) and calculates correction offsets.
+
+Each correction is upserted by conversation_id in one transaction that also
+updates running per-label shift sums/counts, so offsets never need a scan.
+Offsets are cached in memory until another connection commits a change
+(detected with PRAGMA data_version), so every gunicorn worker sees a new
+correction on its next call.
 """
 
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 from collections import defaultdict
 
 DATA_DIR = os.environ.get('DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+FEEDBACK_DB = os.environ.get('FEEDBACK_DB', os.path.join(DATA_DIR, 'feedbacks.sqlite'))
+
+# Legacy JSON store, imported into FEEDBACK_DB once and then renamed
 FEEDBACK_FILE = os.path.join(DATA_DIR, 'feedbacks.json')
 
 # Map labels to numeric positions for offset calculation
@@ -24,106 +35,230 @@ LABEL_ORDER = [
 
 LABEL_TO_INDEX = {label: i for i, label in enumerate(LABEL_ORDER)}
 
+_lock = threading.RLock()
+_conn = None
+_conn_key = None
+
+# Offsets computed from the aggregates, valid while data_version is unchanged
+_offsets_cache = {'version': None, 'offsets': None}
+
+
+def _db() -> sqlite3.Connection:
+    """Return the SQLite connection for this process (reopened after fork)."""
+    global _conn, _conn_key
+    key = (os.getpid(), FEEDBACK_DB)
+    if _conn is None or _conn_key != key:
+        os.makedirs(os.path.dirname(os.path.abspath(FEEDBACK_DB)), exist_ok=True)
+        conn = sqlite3.connect(FEEDBACK_DB, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS feedbacks (
+                conversation_id TEXT PRIMARY KEY,
+                original_label TEXT NOT NULL,
+                corrected_label TEXT NOT NULL,
+                original_score REAL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_timestamp ON feedbacks (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_feedbacks_labels ON feedbacks (original_label, corrected_label);
+            CREATE TABLE IF NOT EXISTS feedback_offsets (
+                original_label TEXT PRIMARY KEY,
+                shift_sum INTEGER NOT NULL,
+                shift_count INTEGER NOT NULL
+            );
+        ''')
+        _conn = conn
+        _conn_key = key
+        _offsets_cache['version'] = None
+        _migrate_legacy(conn)
+    return _conn
+
 
-def load_feedbacks() -> list:
-    """Load all stored feedbacks."""
+def _migrate_legacy(conn: sqlite3.Connection):
+    """Import feedbacks.json into an empty database (runs once, in any process)."""
     if not os.path.exists(FEEDBACK_FILE):
-        return []
+        return
     try:
         with open(FEEDBACK_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return []
+            legacy = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Error reading legacy feedbacks: {e}")
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Another worker may have migrated while we were reading the file
+        if conn.execute('SELECT 1 FROM feedbacks LIMIT 1').fetchone() is None:
+            for fb in legacy:
+                _upsert(
+                    conn,
+                    fb.get('conversation_id', ''),
+                    fb.get('original_label', 'Unknown'),
+                    fb.get('corrected_label', 'Unknown'),
+                    fb.get('original_score'),
+                    fb.get('timestamp') or datetime.now().isoformat()
+                )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    try:
+        os.replace(FEEDBACK_FILE, FEEDBACK_FILE + '.migrated')
+    except OSError:
+        pass
+
+
+def _label_shift(original_label: str, corrected_label: str) -> int | None:
+    """Label steps between original and corrected label, or None if a label is unknown."""
+    if original_label in LABEL_TO_INDEX and corrected_label in LABEL_TO_INDEX:
+        return LABEL_TO_INDEX[corrected_label] - LABEL_TO_INDEX[original_label]
+    return None
+
+
+def _add_shift(conn: sqlite3.Connection, original_label: str, corrected_label: str, sign: int):
+    """Add (sign=1) or remove (sign=-1) one correction from the running aggregates."""
+    shift = _label_shift(original_label, corrected_label)
+    if shift is None:
+        return
+    conn.execute(
+        'INSERT INTO feedback_offsets (original_label, shift_sum, shift_count) VALUES (?, ?, ?) '
+        'ON CONFLICT (original_label) DO UPDATE SET '
+        'shift_sum = shift_sum + excluded.shift_sum, shift_count = shift_count + excluded.shift_count',
+        (original_label, sign * shift, sign)
+    )
+    conn.execute('DELETE FROM feedback_offsets WHERE original_label = ? AND shift_count = 0', (original_label,))
+
+
+def _upsert(conn, conversation_id, original_label, corrected_label, original_score, timestamp):
+    """Replace the correction of a conversation, keeping the aggregates in step. Caller holds a transaction."""
+    old = conn.execute(
+        'SELECT original_label, corrected_label FROM feedbacks WHERE conversation_id = ?',
+        (conversation_id,)
+    ).fetchone()
+    if old is not None:
+        _add_shift(conn, old[0], old[1], -1)
+    conn.execute(
+        'INSERT OR REPLACE INTO feedbacks '
+        '(conversation_id, original_label, corrected_label, original_score, timestamp) VALUES (?, ?, ?, ?, ?)',
+        (conversation_id, original_label, corrected_label, original_score, timestamp)
+    )
+    _add_shift(conn, original_label, corrected_label, 1)
+
+
+def load_feedbacks(limit: int | None = None) -> list:
+    """Load stored feedbacks, oldest first (only the `limit` most recent ones if given)."""
+    with _lock:
+        rows = _db().execute(
+            'SELECT * FROM (SELECT conversation_id, original_label, corrected_label, original_score, timestamp '
+            'FROM feedbacks ORDER BY timestamp DESC LIMIT ?) ORDER BY timestamp',
+            (-1 if limit is None else limit,)
+        ).fetchall()
+    return [
+        {
+            'conversation_id': r[0],
+            'original_label': r[1],
+            'corrected_label': r[2],
+            'original_score': r[3],
+            'timestamp': r[4]
+        }
+        for r in rows
+    ]
 
 
 def save_feedback(conversation_id: str, original_label: str, corrected_label: str, original_score: float):
-    """Save a single user correction."""
-    feedbacks = load_feedbacks()
-    
-    # Remove existing feedback for same conversation (allow re-correction)
-    feedbacks = [fb for fb in feedbacks if fb.get('conversation_id') != conversation_id]
-    
-    feedbacks.append({
-        'conversation_id': conversation_id,
-        'original_label': original_label,
-        'corrected_label': corrected_label,
-        'original_score': original_score,
-        'timestamp': datetime.now().isoformat()
-    })
-    
-    with open(FEEDBACK_FILE, 'w', encoding='utf-8') as f:
-        json.dump(feedbacks, f, ensure_ascii=False, indent=2)
+    """Save a single user correction (replaces an earlier one for the same conversation)."""
+    with _lock:
+        conn = _db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            _upsert(conn, conversation_id, original_label, corrected_label, original_score,
+                    datetime.now().isoformat())
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        # Our own commits do not change data_version on this connection
+        _offsets_cache['version'] = None
 
 
 def clear_feedbacks():
     """Delete all feedbacks."""
-    if os.path.exists(FEEDBACK_FILE):
-        os.remove(FEEDBACK_FILE)
+    with _lock:
+        conn = _db()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM feedbacks')
+            conn.execute('DELETE FROM feedback_offsets')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        _offsets_cache['version'] = None
+
+
+def _compute_offsets(conn: sqlite3.Connection) -> dict:
+    rows = conn.execute('SELECT original_label, shift_sum, shift_count FROM feedback_offsets').fetchall()
+    shift_count = sum(r[2] for r in rows)
+    if not shift_count:
+        return {'score_offset': 0.0, 'label_shifts': {}, 'count': 0}
+
+    # Global score offset: each label step ≈ ~14.3 score points (100/7)
+    avg_shift = sum(r[1] for r in rows) / shift_count
+    score_offset = avg_shift * 14.3
+
+    # Per-label average shifts
+    label_shifts = {}
+    for label, total, count in rows:
+        label_shifts[label] = round(total / count, 2)
+
+    return {
+        'score_offset': round(score_offset, 2),
+        'label_shifts': label_shifts,
+        'count': conn.execute('SELECT COUNT(*) FROM feedbacks').fetchone()[0]
+    }
 
 
 def get_correction_offsets() -> dict:
     """
     Calculate a score offset based on accumulated feedbacks.
-    
+
     Returns a dict with:
       - 'score_offset': float — value to add to raw score (can be negative)
       - 'label_shifts': dict — per original_label, the average shift in labels
       - 'count': int — total feedbacks used
-    
+
     The idea: if the user keeps correcting "Neutral" → "Positive",
     we learn to push borderline scores upward.
     """
-    feedbacks = load_feedbacks()
-    
-    if not feedbacks:
-        return {'score_offset': 0.0, 'label_shifts': {}, 'count': 0}
-    
-    # Calculate average label shift per original label
-    shifts_by_label = defaultdict(list)
-    all_shifts = []
-    
-    for fb in feedbacks:
-        orig = fb.get('original_label', '')
-        corr = fb.get('corrected_label', '')
-        
-        if orig in LABEL_TO_INDEX and corr in LABEL_TO_INDEX:
-            shift = LABEL_TO_INDEX[corr] - LABEL_TO_INDEX[orig]
-            shifts_by_label[orig].append(shift)
-            all_shifts.append(shift)
-    
-    if not all_shifts:
-        return {'score_offset': 0.0, 'label_shifts': {}, 'count': 0}
-    
-    # Global score offset: each label step ≈ ~14.3 score points (100/7)
-    avg_shift = sum(all_shifts) / len(all_shifts)
-    score_offset = avg_shift * 14.3
-    
-    # Per-label average shifts
-    label_shifts = {}
-    for label, shifts in shifts_by_label.items():
-        label_shifts[label] = round(sum(shifts) / len(shifts), 2)
-    
-    return {
-        'score_offset': round(score_offset, 2),
-        'label_shifts': label_shifts,
-        'count': len(feedbacks)
-    }
+    with _lock:
+        conn = _db()
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != _offsets_cache['version'] or _offsets_cache['offsets'] is None:
+            _offsets_cache['offsets'] = _compute_offsets(conn)
+            _offsets_cache['version'] = version
+        offsets = _offsets_cache['offsets']
+
+    return dict(offsets, label_shifts=dict(offsets['label_shifts']))
 
 
 def get_feedback_stats() -> dict:
     """Get summary statistics of feedbacks."""
-    feedbacks = load_feedbacks()
-    
-    if not feedbacks:
+    with _lock:
+        rows = _db().execute(
+            'SELECT original_label, corrected_label, COUNT(*) FROM feedbacks '
+            'GROUP BY original_label, corrected_label'
+        ).fetchall()
+
+    if not rows:
         return {'total': 0, 'corrections_by_label': {}}
-    
-    corrections = defaultdict(lambda: defaultdict(int))
-    for fb in feedbacks:
-        orig = fb.get('original_label', 'Unknown')
-        corr = fb.get('corrected_label', 'Unknown')
-        corrections[orig][corr] += 1
-    
+
+    corrections = defaultdict(dict)
+    for orig, corr, count in rows:
+        corrections[orig][corr] = count
+
     return {
-        'total': len(feedbacks),
+        'total': sum(r[2] for r in rows),
         'corrections_by_label': dict(corrections)
     }
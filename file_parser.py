@@ -1,25 +1,186 @@
+"""
+File parser — text of uploaded PDF, DOCX and TXT files.
+
+The iter_* functions yield the text page by page (PDF), paragraph by
+paragraph (DOCX) or block by block (TXT), so it can be fed straight into
+sentence windowing (segmenter.py) without building the whole document as
+one string. Uploads spooled to disk (upload_limits.py) are read from their
+temporary file, never copied into memory as a whole. Every upload is capped
+at MAX_PDF_PAGES pages and MAX_TEXT_BYTES bytes of extracted text, so one
+huge file cannot monopolize the worker. PDF pages can be extracted by a
+process pool (PDF_PROCESSES).
+"""
+
+import codecs
 import io
+import itertools
+import mmap
+import multiprocessing
+import os
+
 from pypdf import PdfReader
 import docx
 
-def parse_pdf(file_stream) -> str:
-    """Extracts text from a PDF file stream."""
+# Pages read per PDF; the rest of the document is ignored (0 = no limit)
+MAX_PDF_PAGES = int(os.environ.get('PARSER_MAX_PDF_PAGES', '500'))
+
+# Bytes of extracted text (UTF-8) read per upload (0 = no limit)
+MAX_TEXT_BYTES = int(os.environ.get('PARSER_MAX_TEXT_BYTES', str(8 * 1024 * 1024)))
+
+# Processes extracting the pages of one PDF (0 or 1 = in the request's own process)
+PDF_PROCESSES = int(os.environ.get('PARSER_PDF_PROCESSES', '0'))
+
+# Pages handed to a pool process at a time
+PDF_PAGES_PER_TASK = 4
+
+# TXT uploads are decoded in blocks of this many bytes
+TXT_BLOCK_SIZE = 64 * 1024
+
+
+def cap_bytes(chunks, max_bytes: int = MAX_TEXT_BYTES):
+    """Pass text chunks through until `max_bytes` bytes of UTF-8 text were yielded."""
+    if not max_bytes:
+        yield from chunks
+        return
+    remaining = max_bytes
+    for chunk in chunks:
+        size = len(chunk.encode('utf-8'))
+        if size > remaining:
+            head = chunk.encode('utf-8')[:remaining].decode('utf-8', errors='ignore')
+            if head:
+                yield head
+            print(f"Text capped at {max_bytes} bytes")
+            # Stop the reader (and its process pool) right away
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            return
+        remaining -= size
+        yield chunk
+
+
+def first_text(chunks):
+    """
+    Skip leading blank chunks. Returns None when there is no text at all,
+    otherwise an iterator over all the chunks from the first non-blank one.
+    """
+    chunks = iter(chunks)
+    for chunk in chunks:
+        if chunk.strip():
+            return itertools.chain([chunk], chunks)
+    return None
+
+
+# Reader of the PDF being extracted, opened once in each pool process
+_pool_reader = None
+
+
+def _open_pool_reader(data):
+    global _pool_reader
+    _pool_reader = PdfReader(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+
+
+def _extract_pool_page(index: int) -> str:
+    return _pool_reader.pages[index].extract_text() or ''
+
+
+def _pool_context():
+    # fork: the pool processes must not re-import the app (and load the model)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _map_upload(file_stream):
+    """
+    The bytes of an upload for the page pool: the spooled temporary file
+    memory-mapped (shared with the forked pool, never copied), or the
+    in-memory contents when the stream has no file behind it.
+    """
+    stream = getattr(file_stream, 'stream', file_stream)
+    try:
+        stream.seek(0)
+        return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        stream.seek(0)
+        return stream.read()
+
+
+def iter_pdf_pages(file_stream, max_pages: int = MAX_PDF_PAGES, processes: int = PDF_PROCESSES):
+    """Yield the text of each PDF page (newline-terminated), in order."""
     try:
-        reader = PdfReader(file_stream)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        if processes > 1:
+            data = _map_upload(file_stream)
+            reader = PdfReader(data if isinstance(data, mmap.mmap) else io.BytesIO(data))
+        else:
+            reader = PdfReader(file_stream)
+        n_pages = len(reader.pages)
+        if max_pages and n_pages > max_pages:
+            print(f"PDF has {n_pages} pages, reading the first {max_pages}")
+            n_pages = max_pages
+
+        if processes > 1 and n_pages > 1:
+            context = _pool_context()
+            if isinstance(data, mmap.mmap) and context.get_start_method() != 'fork':
+                data = data[:]
+            with context.Pool(min(processes, n_pages), _open_pool_reader, (data,)) as pool:
+                for text in pool.imap(_extract_pool_page, range(n_pages), chunksize=PDF_PAGES_PER_TASK):
+                    yield text + "\n"
+        else:
+            for index in range(n_pages):
+                yield (reader.pages[index].extract_text() or '') + "\n"
     except Exception as e:
         print(f"Error parsing PDF: {e}")
-        return ""
 
-def parse_docx(file_stream) -> str:
-    """Extracts text from a DOCX file stream."""
+
+def iter_docx_paragraphs(file_stream):
+    """Yield the text of each DOCX paragraph (newline-terminated), in order."""
     try:
         doc = docx.Document(file_stream)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        return text
+        for para in doc.paragraphs:
+            yield para.text + "\n"
     except Exception as e:
         print(f"Error parsing DOCX: {e}")
-        return ""
+
+
+def iter_txt_blocks(file_stream, block_size: int = TXT_BLOCK_SIZE):
+    """Yield the text of a UTF-8 TXT file block by block (invalid bytes are dropped)."""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    while True:
+        block = file_stream.read(block_size)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+# Text generators by file extension
+DOCUMENT_READERS = {
+    '.pdf': iter_pdf_pages,
+    '.docx': iter_docx_paragraphs,
+    '.txt': iter_txt_blocks,
+}
+
+
+def iter_document(file_stream, filename: str):
+    """
+    Capped text chunks of an uploaded file, chosen by its extension.
+    Returns None for unsupported file types.
+    """
+    reader = DOCUMENT_READERS.get(os.path.splitext(filename.lower())[1])
+    if reader is None:
+        return None
+    return cap_bytes(reader(file_stream))
+
+
+def parse_pdf(file_stream) -> str:
+    """Extracts text from a PDF file stream."""
+    return ''.join(cap_bytes(iter_pdf_pages(file_stream)))
+
+
+def parse_docx(file_stream) -> str:
+    """Extracts text from a DOCX file stream."""
+    return ''.join(cap_bytes(iter_docx_paragraphs(file_stream)))
@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration — one preloaded model shared by N forked workers.
+
+With preload_app the app is imported and the sentiment model loaded once in
+the master; workers are forked afterwards and share the weight pages
+copy-on-write. Each worker then warms the model up in a background thread,
+answering /health right away and /ready once the model is usable. See
+DEPLOY.md for the memory/throughput profile.
+
+All settings can be overridden with environment variables; command line
+flags (e.g. -b) still take precedence over this file.
+"""
+
+import gc
+import os
+import sys
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WORKERS', '1'))
+threads = int(os.environ.get('THREADS', '1'))
+timeout = int(os.environ.get('TIMEOUT', '300'))
+
+# Load the model in the master before forking
+preload_app = os.environ.get('PRELOAD_APP', '1') == '1'
+
+# Intra-op torch threads per worker
+torch_threads = int(os.environ.get('TORCH_THREADS', '1'))
+
+# Warm the model up in each worker as soon as it starts (0 = on the first request)
+model_warmup = os.environ.get('MODEL_WARMUP', '1') == '1'
+
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers are forked."""
+    if preload_app:
+        # Importing the app no longer loads the model: load it here so the
+        # workers inherit it. No forward pass in the master, torch thread
+        # pools must not exist before fork.
+        import sentiment
+        sentiment.get_model()
+
+    # Move every object loaded so far (model, tokenizer, modules) to the
+    # permanent generation so the workers' cyclic GC never writes to those
+    # pages and breaks the copy-on-write sharing.
+    gc.freeze()
+    server.log.info(f"Forking {workers} worker(s) x {torch_threads} torch thread(s)")
+
+
+def post_fork(server, worker):
+    """Runs in each worker right after fork."""
+    if 'torch' in sys.modules:
+        # Loaded in the master; otherwise the worker's own load sets it
+        sys.modules['torch'].set_num_threads(torch_threads)
+    if model_warmup:
+        import sentiment
+        sentiment.start_warm_up()
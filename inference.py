@@ -0,0 +1,230 @@
+"""
+Inference — pluggable execution backends for the sentiment model.
+
+The backend is chosen with INFERENCE_BACKEND:
+  torch       stock PyTorch fp32 (reference)
+  torch-int8  PyTorch with dynamic int8 quantization of the Linear layers
+  onnx        the model exported to an ONNX graph and run by ONNX Runtime
+
+Every backend takes padded input_ids/attention_mask batches and returns
+POS/NEG/NEU probability rows, so sentiment.py does not care which one runs.
+check_parity() reports how far a backend drifts from the reference;
+backend_parity.py runs it on a fixture set from the command line.
+"""
+
+import os
+import time
+
+import numpy as np
+import torch
+
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch')
+
+# Where the exported ONNX graph is kept (created on first use if missing)
+ONNX_MODEL_PATH = os.environ.get(
+    'ONNX_MODEL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'sentiment.onnx')
+)
+
+# Opset of the exported graph
+ONNX_OPSET = 14
+
+# Short Portuguese customer messages covering every sentiment level, used
+# as the default fixture set of the parity check
+PARITY_TEXTS = [
+    'Isso é um absurdo, ninguém me dá uma resposta!',
+    'Péssimo atendimento, nunca mais compro com vocês.',
+    'Já é a terceira vez que reclamo e nada foi resolvido.',
+    'O produto veio com defeito e estou esperando a troca há duas semanas.',
+    'Não gostei muito da demora, mas tudo bem.',
+    'Meu pedido ainda não chegou.',
+    'Qual o horário de funcionamento da loja?',
+    'Ok, vou aguardar o retorno.',
+    'Pode me enviar o boleto por e-mail?',
+    'Bom dia, gostaria de saber o status do meu pedido 12345.',
+    'Chegou certinho, obrigado.',
+    'Gostei do atendimento, foram rápidos.',
+    'Muito obrigado pela ajuda, vocês são ótimos!',
+    'Amei o produto, superou minhas expectativas!!! 😍',
+    'Excelente serviço, recomendo a todos.',
+    'kkkk valeu, deu tudo certo no final',
+    'Atendente muito educada, mas o problema continua sem solução.',
+    'Fiquei decepcionado com a qualidade, esperava mais pelo preço que paguei.',
+    'Estou muito satisfeita, a entrega foi antes do prazo e o produto é lindo.',
+    'Vocês cobraram duas vezes no meu cartão e ninguém resolve, vou abrir reclamação no Procon.',
+]
+
+
+class TorchBackend:
+    """Stock PyTorch execution (the reference backend)."""
+
+    name = 'torch'
+    tensor_type = 'pt'
+    uses_torch_model = True
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, input_ids, attention_mask) -> list:
+        with torch.no_grad():
+            logits = self.model(
+                input_ids=input_ids.to(self.model.device),
+                attention_mask=attention_mask.to(self.model.device)
+            ).logits
+        return torch.softmax(logits, dim=-1).tolist()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    PyTorch with dynamic int8 quantization: Linear weights are stored as int8
+    and activations quantized on the fly, which shrinks the encoder to about
+    a quarter of its fp32 size and speeds up CPU matmuls.
+    """
+
+    name = 'torch-int8'
+
+    def __init__(self, model):
+        # In place, so the fp32 Linear weights are released
+        super().__init__(torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True))
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Export wrapper: plain tensor output instead of a ModelOutput."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export_onnx(model, path: str = ONNX_MODEL_PATH):
+    """Export the model to an ONNX graph with dynamic batch and sequence axes."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    dummy = torch.ones((1, 8), dtype=torch.long)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model).eval(),
+            (dummy, dummy),
+            tmp_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'}
+            },
+            opset_version=ONNX_OPSET
+        )
+    os.replace(tmp_path, path)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime execution of the exported graph.
+
+    The runtime session is opened lazily in each process: ONNX Runtime
+    thread pools must not be created before gunicorn forks its workers.
+    """
+
+    name = 'onnx'
+    tensor_type = 'np'
+    uses_torch_model = False
+
+    def __init__(self, model=None, path: str = ONNX_MODEL_PATH, threads: int = 1):
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires the onnxruntime package")
+        if not os.path.exists(path):
+            if model is None:
+                raise RuntimeError(f"ONNX model not found at {path}")
+            print(f"Exporting sentiment model to {path}...")
+            export_onnx(model, path)
+        self.path = path
+        self.threads = threads
+        self._session = None
+        self._session_pid = None
+
+    def _get_session(self):
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = self.threads
+            options.inter_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+            self._session_pid = os.getpid()
+        return self._session
+
+    def predict(self, input_ids, attention_mask) -> list:
+        logits = self._get_session().run(['logits'], {
+            'input_ids': np.asarray(input_ids, dtype=np.int64),
+            'attention_mask': np.asarray(attention_mask, dtype=np.int64)
+        })[0]
+        return _softmax(logits.astype(np.float64)).tolist()
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_backend(name: str, model, threads: int = 1):
+    """Build the backend called `name` around a loaded (eval-mode) model."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+    if name == OnnxBackend.name:
+        return OnnxBackend(model, threads=threads)
+    return BACKENDS[name](model)
+
+
+def predict_padded(backend, tokenizer, input_ids: list, pad_to: int | None = None) -> list:
+    """Pad one batch of token id lists (to `pad_to` tokens if given) and run it through `backend`."""
+    if pad_to is None:
+        features = tokenizer.pad({'input_ids': input_ids}, return_tensors=backend.tensor_type)
+    else:
+        features = tokenizer.pad(
+            {'input_ids': input_ids}, padding='max_length', max_length=pad_to, return_tensors=backend.tensor_type
+        )
+    return backend.predict(features['input_ids'], features['attention_mask'])
+
+
+def check_parity(backend, reference, tokenizer, texts: list, batch_size: int = 8) -> dict:
+    """
+    Compare `backend` against `reference` on already preprocessed `texts`.
+
+    Returns the max and mean absolute probability delta, how many texts
+    changed their argmax class, and the time each backend took.
+    """
+    input_ids = tokenizer(texts, truncation=True, max_length=tokenizer.model_max_length)['input_ids']
+    outputs = {}
+    timings = {}
+    for role, runner in (('reference', reference), ('backend', backend)):
+        start = time.perf_counter()
+        rows = []
+        for i in range(0, len(input_ids), batch_size):
+            rows.extend(predict_padded(runner, tokenizer, input_ids[i:i + batch_size]))
+        timings[role] = time.perf_counter() - start
+        outputs[role] = np.array(rows, dtype=np.float64)
+
+    delta = np.abs(outputs['backend'] - outputs['reference'])
+    return {
+        'backend': backend.name,
+        'reference': reference.name,
+        'texts': len(texts),
+        'max_delta': float(delta.max()) if delta.size else 0.0,
+        'mean_delta': float(delta.mean()) if delta.size else 0.0,
+        'argmax_changes': int((outputs['backend'].argmax(axis=1) != outputs['reference'].argmax(axis=1)).sum()),
+        'reference_seconds': round(timings['reference'], 3),
+        'backend_seconds': round(timings['backend'], 3)
+    }
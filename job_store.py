@@ -0,0 +1,268 @@
+"""
+Job Store — background batch analysis jobs persisted in SQLite.
+A job holds its input conversations and results in jobs.sqlite, so any
+worker process can pick it up and no external broker is needed. Finished
+jobs are deleted with their results JOB_RETENTION_DAYS after they end.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Where jobs.sqlite lives: the image's data volume, or the source directory
+# when running outside the container
+DEFAULT_DATA_DIR = '/app/data'
+DATA_DIR = os.environ.get('DATA_DIR') or (
+    DEFAULT_DATA_DIR if os.path.isdir(DEFAULT_DATA_DIR) else os.path.dirname(os.path.abspath(__file__))
+)
+JOBS_DB = os.environ.get('JOBS_DB', os.path.join(DATA_DIR, 'jobs.sqlite'))
+
+# Conversations analyzed per step; progress and results are committed after each step
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', '32'))
+
+# A running job whose heartbeat is older than this is considered orphaned
+# (worker crashed or was recycled) and gets picked up again
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '300'))
+
+# Idle poll interval of the background worker
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '1.0'))
+
+# Finished (done or failed) jobs and their results are deleted this many
+# days after they end (0 keeps them forever)
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', '7'))
+
+# How often the background worker purges expired jobs (also when it starts)
+JOB_PURGE_INTERVAL_SECONDS = 3600
+
+_local = threading.local()
+_worker_lock = threading.Lock()
+_worker_pid = None
+
+
+def _connect() -> sqlite3.Connection:
+    """Per-thread, per-process connection (SQLite handles must not cross a fork)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'pid', None) != os.getpid() or getattr(_local, 'path', None) != JOBS_DB:
+        os.makedirs(os.path.dirname(os.path.abspath(JOBS_DB)), exist_ok=True)
+        conn = sqlite3.connect(JOBS_DB, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                finished_at TEXT,
+                heartbeat REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at);
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+        ''')
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.path = JOBS_DB
+    return conn
+
+
+def create_job(items: list) -> str:
+    """Persist a batch of conversations as a new queued job. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    conn = _connect()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute(
+            'INSERT INTO jobs (id, status, total, created_at) VALUES (?, ?, ?, ?)',
+            (job_id, 'queued', len(items), datetime.now().isoformat())
+        )
+        conn.executemany(
+            'INSERT INTO job_items (job_id, idx, payload) VALUES (?, ?, ?)',
+            ((job_id, i, json.dumps(item, ensure_ascii=False)) for i, item in enumerate(items))
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return job_id
+
+
+def get_job(job_id: str) -> dict | None:
+    """Status and progress of a job."""
+    row = _connect().execute(
+        'SELECT id, status, total, processed, error, created_at, finished_at FROM jobs WHERE id = ?',
+        (job_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    job_id, status, total, processed, error, created_at, finished_at = row
+    job = {
+        'job_id': job_id,
+        'status': status,
+        'total': total,
+        'processed': processed,
+        'progress': round(processed / total * 100, 1) if total else 100.0,
+        'created_at': created_at,
+        'finished_at': finished_at
+    }
+    if error:
+        job['error'] = error
+    return job
+
+
+def get_results(job_id: str, offset: int = 0, limit: int | None = None) -> list:
+    """Results produced so far, in input order, starting at `offset`."""
+    rows = _connect().execute(
+        'SELECT result FROM job_results WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?',
+        (job_id, offset, -1 if limit is None else limit)
+    ).fetchall()
+    return [json.loads(r[0]) for r in rows]
+
+
+def claim_next_job() -> str | None:
+    """Atomically take the oldest queued (or orphaned running) job."""
+    conn = _connect()
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status = 'queued' "
+            "OR (status = 'running' AND heartbeat < ?) ORDER BY created_at LIMIT 1",
+            (now - JOB_STALE_SECONDS,)
+        ).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+        conn.execute("UPDATE jobs SET status = 'running', heartbeat = ? WHERE id = ?", (now, row[0]))
+        conn.execute('COMMIT')
+        return row[0]
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _next_items(job_id: str, batch_size: int) -> tuple:
+    """Next unprocessed (indices, payloads) of a job."""
+    conn = _connect()
+    processed = conn.execute('SELECT processed FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+    rows = conn.execute(
+        'SELECT idx, payload FROM job_items WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?',
+        (job_id, processed, batch_size)
+    ).fetchall()
+    return [r[0] for r in rows], [json.loads(r[1]) for r in rows]
+
+
+def _save_results(job_id: str, indices: list, results: list):
+    """Commit a step: store results, drop consumed inputs, advance progress."""
+    conn = _connect()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany(
+            'INSERT OR REPLACE INTO job_results (job_id, idx, result) VALUES (?, ?, ?)',
+            ((job_id, i, json.dumps(r, ensure_ascii=False)) for i, r in zip(indices, results))
+        )
+        conn.execute('DELETE FROM job_items WHERE job_id = ? AND idx <= ?', (job_id, indices[-1]))
+        conn.execute(
+            'UPDATE jobs SET processed = ?, heartbeat = ? WHERE id = ?',
+            (indices[-1] + 1, time.time(), job_id)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _finish_job(job_id: str, status: str, error: str | None = None):
+    _connect().execute(
+        'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+        (status, error, datetime.now().isoformat(), job_id)
+    )
+
+
+def run_job(job_id: str, process_batch, batch_size: int = JOB_BATCH_SIZE):
+    """
+    Process a claimed job step by step.
+    `process_batch(items) -> results` must return one result per item, in order.
+    """
+    try:
+        while True:
+            indices, items = _next_items(job_id, batch_size)
+            if not items:
+                break
+            _save_results(job_id, indices, process_batch(items))
+        _finish_job(job_id, 'done')
+    except Exception as e:
+        print(f"Error processing job {job_id}: {e}")
+        _finish_job(job_id, 'failed', str(e))
+
+
+def purge_jobs(retention_days: float = JOB_RETENTION_DAYS) -> int:
+    """Delete jobs that finished more than `retention_days` ago, with their results. Returns how many."""
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    conn = _connect()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        expired = [r[0] for r in conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+        )]
+        for job_id in expired:
+            conn.execute('DELETE FROM job_results WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM job_items WHERE job_id = ?', (job_id,))
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return len(expired)
+
+
+def _worker_loop(process_batch):
+    last_purge = None
+    while True:
+        if JOB_RETENTION_DAYS > 0 and (last_purge is None or time.time() - last_purge >= JOB_PURGE_INTERVAL_SECONDS):
+            last_purge = time.time()
+            try:
+                purged = purge_jobs(JOB_RETENTION_DAYS)
+                if purged:
+                    print(f"Purged {purged} finished job(s) older than {JOB_RETENTION_DAYS:g} day(s)")
+            except sqlite3.Error as e:
+                print(f"Job purge error: {e}")
+        try:
+            job_id = claim_next_job()
+        except sqlite3.Error as e:
+            print(f"Job worker error: {e}")
+            job_id = None
+        if job_id is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        run_job(job_id, process_batch)
+
+
+def start_worker(process_batch):
+    """Start the background job worker for this process (no-op if already running)."""
+    global _worker_pid
+    if _worker_pid == os.getpid():
+        return
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        thread = threading.Thread(target=_worker_loop, args=(process_batch,), name='job-worker', daemon=True)
+        thread.start()
+        _worker_pid = os.getpid()
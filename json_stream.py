@@ -0,0 +1,173 @@
+"""
+JSON Stream — incremental decoding of a top-level JSON array.
+Yields one element at a time while reading the file in chunks, so a large
+export never has to be fully decoded in memory.
+
+LineSplitter and iter_lines cut NDJSON bodies into lines for the API, fed
+block by block from a file-like stream (app.py) or from ASGI body chunks
+(app_asgi.py).
+"""
+
+import codecs
+import json
+
+# Bytes (or characters) read from the file per step
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+class NotAnArrayError(ValueError):
+    """The document is valid so far but its top-level value is not an array."""
+
+
+def iter_json_array(fp, chunk_size: int = CHUNK_SIZE):
+    """
+    Yield the elements of the top-level JSON array stored in `fp`.
+
+    `fp` may be a binary (UTF-8, with or without BOM) or text file object.
+    Raises json.JSONDecodeError on malformed input and NotAnArrayError when
+    the document is not an array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill(size: int = chunk_size) -> bool:
+        """Append the next chunk to the buffer, dropping what was consumed."""
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = fp.read(size)
+        if isinstance(chunk, bytes):
+            chunk = utf8.decode(chunk, final=not chunk)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+        return bool(chunk)
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def error(msg: str):
+        return json.JSONDecodeError(msg, buf, pos)
+
+    skip_whitespace()
+    if pos >= len(buf):
+        raise error('Expecting value')
+    if buf[pos] != '[':
+        raise NotAnArrayError('Top-level JSON value is not an array')
+    pos += 1
+
+    skip_whitespace()
+    if pos < len(buf) and buf[pos] == ']':
+        pos += 1
+    else:
+        while True:
+            # Decode one element, reading more data until it is complete.
+            # Reads grow with the pending element so a large element costs O(n).
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if not fill(max(chunk_size, len(buf) - pos)):
+                        raise
+                    continue
+                # A number ending exactly at the buffer edge may continue in the next chunk
+                if end == len(buf) and not eof:
+                    fill()
+                    continue
+                break
+            pos = end
+            yield value
+
+            skip_whitespace()
+            if pos >= len(buf):
+                raise error("Expecting ',' delimiter")
+            if buf[pos] == ']':
+                pos += 1
+                break
+            if buf[pos] != ',':
+                raise error("Expecting ',' delimiter")
+            pos += 1
+            skip_whitespace()
+
+    skip_whitespace()
+    if pos < len(buf):
+        raise error('Extra data')
+
+
+class LineSplitter:
+    """
+    Cut bytes fed block by block into lines. The parts of an unfinished line
+    are kept in a list and joined once its newline arrives, so a line spread
+    over many blocks is copied only once.
+
+    A line longer than `max_line` bytes is not kept: what was buffered of it
+    is dropped, the rest is skipped up to its newline, and it comes out as
+    None, so callers can still report it in place.
+    """
+
+    def __init__(self, max_line: int | None = None):
+        self.max_line = max_line
+        self._parts = []
+        self._size = 0
+        self._skipping = False
+
+    def _too_long(self, size: int) -> bool:
+        return self.max_line is not None and size > self.max_line
+
+    def _end_line(self, last_part: bytes) -> bytes | None:
+        if self._skipping or self._too_long(self._size + len(last_part)):
+            line = None
+        else:
+            line = b''.join(self._parts) + last_part
+        self._parts = []
+        self._size = 0
+        self._skipping = False
+        return line
+
+    def feed(self, block: bytes) -> list:
+        """The lines completed by `block`, without their newline (None when too long)."""
+        *complete, tail = block.split(b'\n')
+        lines = []
+        if complete:
+            lines.append(self._end_line(complete[0]))
+            lines.extend(None if self._too_long(len(line)) else line for line in complete[1:])
+        if tail and not self._skipping:
+            self._size += len(tail)
+            if self._too_long(self._size):
+                self._parts = []
+                self._skipping = True
+            else:
+                self._parts.append(tail)
+        return lines
+
+    def finish(self) -> list:
+        """The last line when the input did not end with a newline."""
+        if not self._parts and not self._skipping:
+            return []
+        return [self._end_line(b'')]
+
+
+def iter_lines(stream, block_size: int = CHUNK_SIZE, max_line: int | None = None):
+    """
+    Lines of a binary stream, read in blocks (None for lines longer than
+    `max_line`, see LineSplitter). Iterating the WSGI input stream directly
+    reads it one byte per call.
+    """
+    splitter = LineSplitter(max_line)
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        yield from splitter.feed(block)
+    yield from splitter.finish()
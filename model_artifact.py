@@ -0,0 +1,141 @@
+"""
+Model artifact — the sentiment model pre-serialized for fast cold starts.
+
+build() writes, from a loaded pysentimiento analyzer, a directory with:
+  model.safetensors  every weight and buffer of the model
+  config.json        the model config (labels, architecture)
+  tokenizer files    the model's own tokenizer (fast tokenizer.json, or the
+                     vocabulary/merges of a slow one such as BERTweet's)
+  artifact.json      format version, model name, max length, preprocessing args
+
+load() rebuilds the model from it without the Hugging Face cache layout or
+the analyzer pipeline: the model skeleton is created on the meta device (no
+weight allocation or random init) and the tensors are assigned straight
+from the memory-mapped safetensors file. Weight pages are read on demand
+and stay in the page cache, shared by every process (and container) that
+maps the same file.
+
+The Docker build runs preload_model.py, which calls build() into
+MODEL_ARTIFACT_DIR; sentiment.py loads from there when the artifact exists.
+"""
+
+import json
+import os
+import shutil
+import time
+
+# Where the artifact is written and read ('' disables it)
+MODEL_ARTIFACT_DIR = os.environ.get(
+    'MODEL_ARTIFACT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'sentiment-pt')
+)
+
+# Bumped when the layout changes; artifacts of another version are ignored
+ARTIFACT_FORMAT = 1
+
+# Encoded by the original and the saved tokenizer, which must agree
+TOKENIZER_CHECK_TEXT = 'Bom dia!! Não gostei do atendimento @usuario 😡 https://exemplo.com #fail'
+
+WEIGHTS_FILE = 'model.safetensors'
+MANIFEST_FILE = 'artifact.json'
+
+
+def exists(path: str = MODEL_ARTIFACT_DIR) -> bool:
+    """Whether `path` holds an artifact this code can load."""
+    if not path:
+        return False
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get('format') == ARTIFACT_FORMAT and os.path.exists(os.path.join(path, WEIGHTS_FILE))
+
+
+def build(analyzer, path: str = MODEL_ARTIFACT_DIR, model_name: str | None = None) -> bool:
+    """
+    Write the artifact of a loaded analyzer to `path` (replacing any previous one).
+    Returns False, leaving no loadable artifact, when the saved tokenizer
+    does not encode like the analyzer's own.
+    """
+    from safetensors.torch import save_file
+    from transformers import AutoTokenizer
+
+    model = analyzer.model
+    tokenizer = analyzer.tokenizer
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    # Buffers too (position ids, ...): non-persistent ones are not in the
+    # state dict, and on load nothing else would fill them in
+    tensors = dict(model.named_parameters())
+    tensors.update(model.named_buffers())
+    weights_path = os.path.join(path, WEIGHTS_FILE)
+    tmp_path = f'{weights_path}.{os.getpid()}.tmp'
+    save_file({name: t.detach().contiguous() for name, t in tensors.items()}, tmp_path)
+    os.replace(tmp_path, weights_path)
+
+    model.config.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+    if not getattr(tokenizer, 'is_fast', False):
+        # A slow tokenizer does not always write its files back in the format
+        # it reads (BERTweet's BPE merges lose their counts): ship the originals
+        for attr, filename in getattr(tokenizer, 'vocab_files_names', {}).items():
+            source = getattr(tokenizer, attr, None)
+            if isinstance(source, str) and os.path.isfile(source):
+                shutil.copyfile(source, os.path.join(path, filename))
+
+    saved = AutoTokenizer.from_pretrained(path)
+    if saved(TOKENIZER_CHECK_TEXT)['input_ids'] != tokenizer(TOKENIZER_CHECK_TEXT)['input_ids']:
+        print(f"Warning: the tokenizer saved to {path} does not encode like the original; model artifact not written")
+        return False
+
+    # Written last: an interrupted build leaves no loadable artifact
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'format': ARTIFACT_FORMAT,
+            'model_name': model_name or getattr(model.config, '_name_or_path', None),
+            'model_max_length': tokenizer.model_max_length,
+            'preprocessing_args': dict(getattr(analyzer, 'preprocessing_args', None) or {}),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }, f, indent=2)
+    return True
+
+
+def load(path: str = MODEL_ARTIFACT_DIR) -> tuple:
+    """
+    Load the artifact at `path`.
+    Returns (model in eval mode with frozen weights, tokenizer, manifest).
+    """
+    import torch
+    from safetensors.torch import load_file
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+    with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    config = AutoConfig.from_pretrained(path)
+    with torch.device('meta'):
+        model = AutoModelForSequenceClassification.from_config(config)
+
+    # Tensors backed by the memory-mapped file, assigned without a copy
+    for name, tensor in load_file(os.path.join(path, WEIGHTS_FILE)).items():
+        module_name, _, attr = name.rpartition('.')
+        module = model.get_submodule(module_name)
+        if attr in module._parameters:
+            module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attr] = tensor
+
+    missing = [name for name, t in [*model.named_parameters(), *model.named_buffers()] if t.is_meta]
+    if missing:
+        raise RuntimeError(f"Model artifact at {path} is missing tensors: {', '.join(missing[:5])}")
+    model.eval()
+
+    # The model's own tokenizer class (special tokens, normalization), fast
+    # or slow as it was saved: BERTweet only has a slow tokenizer
+    tokenizer = AutoTokenizer.from_pretrained(path)
+    tokenizer.model_max_length = manifest['model_max_length']
+    return model, tokenizer, manifest
@@ -0,0 +1,203 @@
+"""
+Prediction Cache — content-addressed store of model probabilities.
+Keeps a bounded in-process LRU tier and an optional SQLite tier on disk
+that survives restarts and can be shared between the API and dashboard.
+Keys hash the model identity and the normalized text, so case and
+whitespace variants of a message share one prediction. The disk tier keeps
+at most PREDICTION_CACHE_DB_MAX_ENTRIES rows, pruning the least recently
+used ones.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Max entries kept in memory per process (0 disables the memory tier)
+CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', '50000'))
+
+# SQLite file for the shared disk tier (empty disables it)
+CACHE_DB = os.environ.get('PREDICTION_CACHE_DB', '')
+
+# Max rows of the disk tier (0 = unbounded); the least recently used go first
+CACHE_DB_MAX_ENTRIES = int(os.environ.get('PREDICTION_CACHE_DB_MAX_ENTRIES', '1000000'))
+
+# Rows written by a process between two checks of the disk tier's size
+_PRUNE_EVERY = 1000
+
+# SQLite limits the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    """Case-folded text with runs of whitespace collapsed to one space."""
+    return ' '.join(text.split()).casefold()
+
+
+class PredictionCache:
+    """Two-tier cache mapping hash(model, normalized text) -> {'POS', 'NEG', 'NEU'}."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, db_path: str = CACHE_DB,
+                 db_max_entries: int = CACHE_DB_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.db_path = db_path or None
+        self.db_max_entries = db_max_entries
+        self._written = 0
+        self.pruned = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model_id: str) -> str:
+        """Content address for a model input (preprocessed text), normalized with normalize_text()."""
+        h = hashlib.sha256()
+        h.update(model_id.encode('utf-8'))
+        h.update(b'\0')
+        h.update(normalize_text(text).encode('utf-8'))
+        return h.hexdigest()
+
+    def _db(self):
+        """Return the SQLite connection for this process (reopened after fork)."""
+        if self.db_path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, pos REAL NOT NULL, neg REAL NOT NULL, neu REAL NOT NULL, '
+                'used_at REAL NOT NULL DEFAULT 0)'
+            )
+            # Databases written before the row cap have no last-use column
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(predictions)')]
+            if 'used_at' not in columns:
+                conn.execute('ALTER TABLE predictions ADD COLUMN used_at REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_predictions_used_at ON predictions (used_at)')
+            conn.commit()
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, probas: dict):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = probas
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: list) -> dict:
+        """Look up many keys at once. Returns {key: probas} for the hits only."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                probas = self._memory.get(key)
+                if probas is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = probas
+                    self.hits_memory += 1
+                else:
+                    missing.append(key)
+
+            conn = self._db()
+            if conn is not None and missing:
+                try:
+                    for i in range(0, len(missing), _SQL_CHUNK):
+                        chunk = missing[i:i + _SQL_CHUNK]
+                        rows = conn.execute(
+                            'SELECT key, pos, neg, neu FROM predictions WHERE key IN (%s)'
+                            % ','.join('?' * len(chunk)),
+                            chunk
+                        ).fetchall()
+                        for key, pos, neg, neu in rows:
+                            probas = {'POS': pos, 'NEG': neg, 'NEU': neu}
+                            found[key] = probas
+                            self._remember(key, probas)
+                            self.hits_disk += 1
+                        # Disk hits count as uses for the pruning order
+                        if rows:
+                            with conn:
+                                conn.execute(
+                                    'UPDATE predictions SET used_at = ? WHERE key IN (%s)'
+                                    % ','.join('?' * len(rows)),
+                                    [time.time()] + [row[0] for row in rows]
+                                )
+                except sqlite3.Error as e:
+                    print(f"Prediction cache read error: {e}")
+
+            self.misses += len(missing) - sum(1 for k in missing if k in found)
+        return found
+
+    def put_many(self, items: dict):
+        """Store {key: probas} in both tiers."""
+        if not items:
+            return
+        with self._lock:
+            for key, probas in items.items():
+                self._remember(key, probas)
+
+            conn = self._db()
+            if conn is not None:
+                try:
+                    now = time.time()
+                    with conn:
+                        conn.executemany(
+                            'INSERT OR REPLACE INTO predictions (key, pos, neg, neu, used_at) VALUES (?, ?, ?, ?, ?)',
+                            [(k, p['POS'], p['NEG'], p['NEU'], now) for k, p in items.items()]
+                        )
+                    self._written += len(items)
+                    if self.db_max_entries > 0 and self._written >= min(_PRUNE_EVERY, self.db_max_entries):
+                        self._written = 0
+                        self._prune(conn)
+                except sqlite3.Error as e:
+                    print(f"Prediction cache write error: {e}")
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Delete the least recently used rows past db_max_entries (lock held)."""
+        with conn:
+            deleted = conn.execute(
+                'DELETE FROM predictions WHERE key IN ('
+                'SELECT key FROM predictions ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+                (self.db_max_entries,)
+            ).rowcount
+        self.pruned += max(deleted, 0)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process."""
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'hits_memory': self.hits_memory,
+                'hits_disk': self.hits_disk,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_max_entries': self.max_entries,
+                'disk_enabled': self.db_path is not None,
+                'disk_max_entries': self.db_max_entries,
+                'disk_pruned': self.pruned
+            }
+
+    def clear(self):
+        """Drop every cached prediction from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._db()
+            if conn is not None:
+                with conn:
+                    conn.execute('DELETE FROM predictions')
+
+
+prediction_cache = PredictionCache()
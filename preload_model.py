@@ -1,6 +1,24 @@
 from pysentimiento import create_analyzer
+import os
+
+import model_artifact
 
 print("Pre-loading model for Docker build...")
 # This triggers the download and caching of the model
-create_analyzer(task="sentiment", lang="pt")
+analyzer = create_analyzer(task="sentiment", lang="pt")
 print("Model downloaded successfully.")
+analyzer.model.eval()
+
+# Bake the pre-serialized artifact (mmap-able safetensors + tokenizer)
+# into the image, so containers skip the pipeline build on startup
+if model_artifact.MODEL_ARTIFACT_DIR:
+    if model_artifact.build(analyzer):
+        print(f"Model artifact written to {model_artifact.MODEL_ARTIFACT_DIR}.")
+    else:
+        print("Model artifact skipped; containers will load the model from the Hugging Face cache.")
+
+# Bake the ONNX graph into the image when that backend is selected
+if os.environ.get('INFERENCE_BACKEND') == 'onnx':
+    import inference
+    inference.export_onnx(analyzer.model)
+    print(f"ONNX model exported to {inference.ONNX_MODEL_PATH}.")
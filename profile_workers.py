@@ -0,0 +1,148 @@
+"""
+Memory/throughput profile of a running gunicorn deployment.
+
+Run inside the container (needs /proc access to the gunicorn processes):
+    python profile_workers.py --url http://localhost:5000/analyze --requests 200 --concurrency 4
+
+Reports RSS/PSS/USS per gunicorn process (PSS splits shared pages fairly,
+so the PSS total is the real memory cost of the deployment) and the
+request throughput under concurrent load, after printing the model startup
+timings (imports, weight load, warm-up) reported by /ready.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SAMPLE_CONVERSATION = {
+    'id': 'profile',
+    'Full Conversation': [
+        {'sender': [], 'message': 'Bom dia, meu pedido ainda não chegou e já faz uma semana.'},
+        {'sender': [{'firstName': 'Agente'}], 'message': 'Vou verificar para você.'},
+        {'sender': [], 'message': 'Isso é um absurdo, ninguém me dá uma resposta!'},
+        {'sender': [], 'message': 'Ok, obrigado pela ajuda, chegou certinho.'},
+    ]
+}
+
+
+def gunicorn_pids() -> list:
+    """Find the gunicorn master and worker processes."""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='ignore')
+        except OSError:
+            continue
+        if 'gunicorn' in cmdline and 'profile_workers' not in cmdline:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def memory_of(pid: int) -> dict:
+    """RSS, PSS and USS (private pages) of a process in MB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    uss = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {
+        'rss': values.get('Rss', 0) / 1024,
+        'pss': values.get('Pss', 0) / 1024,
+        'uss': uss / 1024
+    }
+
+
+def report_memory():
+    pids = gunicorn_pids()
+    if not pids:
+        print("No gunicorn processes found.")
+        return
+
+    print(f"{'PID':>8} | {'RSS MB':>8} | {'PSS MB':>8} | {'USS MB':>8}")
+    print("-" * 42)
+    total_pss = 0.0
+    for pid in pids:
+        try:
+            m = memory_of(pid)
+        except OSError:
+            continue
+        total_pss += m['pss']
+        print(f"{pid:>8} | {m['rss']:>8.0f} | {m['pss']:>8.0f} | {m['uss']:>8.0f}")
+    print("-" * 42)
+    print(f"Total PSS: {total_pss:.0f} MB")
+
+
+def report_startup(url: str):
+    ready_url = url.rsplit('/', 1)[0] + '/ready'
+    status = requests.get(ready_url).json()
+    if not status.get('ready'):
+        print(f"Model not loaded yet in worker {status.get('pid')} ({status.get('error', 'loading')})")
+        return
+    print(f"Worker {status['pid']} ({status['backend']}): imports {status['import_seconds']}s, "
+          f"model {status['load_seconds']}s, warm-up {status['warm_up_seconds']}s, "
+          f"ready {status['ready_after_seconds']}s after import")
+
+
+def sample_conversation(n: int) -> dict:
+    """SAMPLE_CONVERSATION with its messages numbered, so the prediction cache never answers for the model."""
+    return dict(
+        SAMPLE_CONVERSATION, id=f'profile-{n}',
+        **{'Full Conversation': [
+            dict(m, message=f"{m['message']} {n}") for m in SAMPLE_CONVERSATION['Full Conversation']
+        ]}
+    )
+
+
+def report_throughput(url: str, total: int, concurrency: int, batch: int):
+    def call(n):
+        if batch > 1:
+            payload = [sample_conversation(n * batch + i) for i in range(batch)]
+        else:
+            payload = sample_conversation(n)
+        start = time.perf_counter()
+        response = requests.post(url, json=payload)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    # Warm-up outside the measurement
+    call(-1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(call, range(total)))
+    elapsed = time.perf_counter() - start
+
+    print(f"Requests: {total} x {batch} conversation(s), concurrency {concurrency}")
+    print(f"Throughput: {total * batch / elapsed:.1f} conversations/s")
+    print(f"Latency p50: {latencies[len(latencies) // 2] * 1000:.0f} ms | "
+          f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000/analyze')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=1, help='conversations per request')
+    args = parser.parse_args()
+
+    print("=== Startup ===")
+    report_startup(args.url)
+    print("\n=== Memory (idle) ===")
+    report_memory()
+    print("\n=== Throughput ===")
+    report_throughput(args.url, args.requests, args.concurrency, args.batch)
+    print("\n=== Memory (after load) ===")
+    report_memory()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Re-score saved dashboard sessions with the current feedback offsets.
+
+Labels are recomputed from the model probabilities stored with each
+session, so no model is loaded and a large session takes seconds:
+    python rescore_sessions.py                      # every session
+    python rescore_sessions.py 20260101_120000_abc123
+    python rescore_sessions.py --no-refinement      # drop feedback refinement
+"""
+
+import argparse
+import time
+
+from feedback_store import get_correction_offsets
+from session_store import rescore_session, rescore_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('session_ids', nargs='*', help='sessions to re-score (default: all)')
+    parser.add_argument('--no-refinement', action='store_true', help='ignore stored feedback corrections')
+    args = parser.parse_args()
+
+    offsets = None if args.no_refinement else get_correction_offsets()
+    if offsets:
+        print(f"Feedback offsets: {offsets['count']} correction(s), global offset {offsets['score_offset']}")
+
+    start = time.perf_counter()
+    if args.session_ids:
+        for sid in args.session_ids:
+            done = rescore_session(sid, offsets)
+            if done is None:
+                print(f"{sid}: not found")
+            elif not done:
+                print(f"{sid}: saved without probabilities, upload it again to re-score")
+            else:
+                print(f"{sid}: re-scored")
+    else:
+        summary = rescore_sessions(offsets)
+        print(f"Re-scored {summary['rescored']} session(s), skipped {summary['skipped']}")
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Scoring — vectorized conversion of model probabilities into results.
+Takes an (N_messages x 3) POS/NEG/NEU matrix plus the conversation (segment)
+id of each row and computes scores, labels and 7-level distributions for
+every conversation in one NumPy pass. Results match the original per-item
+code exactly, including Python's round() semantics.
+"""
+
+import numpy as np
+
+# Column order of the probability matrix
+PROBA_COLUMNS = ('POS', 'NEG', 'NEU')
+
+# 7-level sentiment labels ordered from most negative to most positive
+LEVELS = [
+    'very_negative',
+    'negative',
+    'slightly_negative',
+    'neutral',
+    'slightly_positive',
+    'positive',
+    'very_positive'
+]
+
+LEVEL_LABELS = {
+    'very_negative': 'Very Negative',
+    'negative': 'Negative',
+    'slightly_negative': 'Slightly Negative',
+    'neutral': 'Neutral',
+    'slightly_positive': 'Slightly Positive',
+    'positive': 'Positive',
+    'very_positive': 'Very Positive'
+}
+
+LABELS = [LEVEL_LABELS[level] for level in LEVELS]
+LABEL_INDEX = {label: i for i, label in enumerate(LABELS)}
+
+# Score ranges for each label (used for reclassification after offset)
+SCORE_RANGES = [
+    (0, 15, 'Very Negative'),
+    (15, 30, 'Negative'),
+    (30, 42, 'Slightly Negative'),
+    (42, 58, 'Neutral'),
+    (58, 70, 'Slightly Positive'),
+    (70, 85, 'Positive'),
+    (85, 100, 'Very Positive'),
+]
+
+# Upper bounds of every range but the last; scores >= 85 are Very Positive
+_RANGE_EDGES = np.array([high for _, high, _ in SCORE_RANGES[:-1]], dtype=np.float64)
+_RANGE_LABELS = np.array([LABEL_INDEX[label] for _, _, label in SCORE_RANGES])
+
+# Score points per label step (100/7)
+POINTS_PER_LABEL = 14.3
+
+NEUTRAL_INDEX = LEVELS.index('neutral')
+
+
+def py_round(values, ndigits: int) -> np.ndarray:
+    """
+    Element-wise round() with Python semantics.
+
+    np.round scales by 10**ndigits first, which can tip values sitting on a
+    .5 boundary the other way; those few near-ties are rounded with round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    factor = 10.0 ** ndigits
+    scaled = values * factor
+    rounded = np.rint(scaled) / factor
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded = rounded.copy()
+        for i in zip(*np.nonzero(near_tie)):
+            rounded[i] = round(float(values[i]), ndigits)
+    return rounded
+
+
+def probas_to_matrix(probas: list) -> np.ndarray:
+    """Stack {'POS', 'NEG', 'NEU'} dicts into an (N x 3) matrix."""
+    if not probas:
+        return np.empty((0, 3), dtype=np.float64)
+    return np.array([[p[c] for c in PROBA_COLUMNS] for p in probas], dtype=np.float64)
+
+
+def level_distribution(pos, neg, neu) -> np.ndarray:
+    """
+    Convert raw POS/NEG/NEU probabilities into (N x 7) level distributions.
+    Uses intensity to split positive/negative into gradations.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    neg = np.asarray(neg, dtype=np.float64)
+    neu = np.asarray(neu, dtype=np.float64)
+    zeros = np.zeros_like(pos)
+    intensity = np.maximum(pos, neg)
+
+    def gradations(p):
+        # Strong (> 0.6): 70/30 over the two outer levels; moderate (> 0.3):
+        # 60/40 over the two inner ones; weak (> 0.02): all to the mildest level
+        strong = p > 0.6
+        moderate = (p > 0.3) & ~strong
+        weak = (p > 0.02) & (p <= 0.3)
+        outer = np.where(strong, p * 0.7, zeros)
+        middle = np.where(strong, p * 0.3, np.where(moderate, p * 0.6, zeros))
+        mild = np.where(moderate, p * 0.4, np.where(weak, p * 1.0, zeros))
+        return outer, middle, mild
+
+    very_neg, negative, slightly_neg = gradations(neg)
+    very_pos, positive, slightly_pos = gradations(pos)
+
+    # Neutral only keeps its probability when there is no noticeable signal
+    neutral = np.where(intensity > 0.3, zeros, np.where(intensity > 0.15, neu * 0.1, neu))
+
+    scores = np.stack([very_neg, negative, slightly_neg, neutral, slightly_pos, positive, very_pos], axis=1)
+
+    # Normalize to sum to 1 (summed left to right like the scalar code)
+    total = scores[:, 0].copy()
+    for k in range(1, len(LEVELS)):
+        total += scores[:, k]
+    normalizable = total > 0.001
+    scores[normalizable] /= total[normalizable, None]
+    scores[~normalizable, NEUTRAL_INDEX] = 1.0
+    return scores
+
+
+def message_weights(matrix: np.ndarray) -> np.ndarray:
+    """Emotional intensity max(POS, NEG) of each message: emotional messages count more."""
+    matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, 3)
+    return np.maximum(matrix[:, 0], matrix[:, 1])
+
+
+def score_segments(matrix: np.ndarray, segment_ids: np.ndarray, n_segments: int,
+                   weights: np.ndarray | None = None) -> dict:
+    """
+    Weighted aggregation of per-message probabilities into per-conversation results.
+
+    Each message is weighted by `weights` (default: message_weights()).
+    Returns arrays with one entry per segment:
+    'score', 'label_index', 'level_scores' (n x 7) and 'empty' (no weight,
+    reported as the neutral response).
+    """
+    matrix = np.asarray(matrix, dtype=np.float64).reshape(-1, 3)
+    segment_ids = np.asarray(segment_ids, dtype=np.intp)
+    pos, neg, neu = matrix[:, 0], matrix[:, 1], matrix[:, 2]
+
+    weight = message_weights(matrix) if weights is None else np.asarray(weights, dtype=np.float64)
+    total_weight = np.bincount(segment_ids, weights=weight, minlength=n_segments)
+    sum_pos = np.bincount(segment_ids, weights=pos * weight, minlength=n_segments)
+    sum_neg = np.bincount(segment_ids, weights=neg * weight, minlength=n_segments)
+    sum_neu = np.bincount(segment_ids, weights=neu * weight, minlength=n_segments)
+
+    empty = total_weight == 0
+    denominator = np.where(empty, 1.0, total_weight)
+    avg_pos = sum_pos / denominator
+    avg_neg = sum_neg / denominator
+    avg_neu = sum_neu / denominator
+
+    level_scores = level_distribution(avg_pos, avg_neg, avg_neu)
+    label_index = np.argmax(level_scores, axis=1)
+
+    # Map sentiment value [-1, 1] to a 0-100 score
+    score = np.clip(py_round((avg_pos - avg_neg + 1) / 2 * 100, 1), 0, 100)
+
+    # Conversations without weight get the neutral response
+    score[empty] = 50.0
+    label_index[empty] = NEUTRAL_INDEX
+    level_scores[empty] = 0.0
+    level_scores[empty, NEUTRAL_INDEX] = 1.0
+
+    return {
+        'score': score,
+        'label_index': label_index,
+        'level_scores': level_scores,
+        'empty': empty
+    }
+
+
+def build_results(scored: dict) -> list:
+    """Turn score_segments() arrays into the API result dicts."""
+    level_scores = py_round(scored['level_scores'], 3).tolist()
+    return [
+        {
+            'score': score,
+            'sentiment_label': LABELS[label],
+            'level_scores': dict(zip(LEVELS, levels))
+        }
+        for score, label, levels in zip(scored['score'].tolist(), scored['label_index'].tolist(), level_scores)
+    ]
+
+
+def labels_for_scores(scores) -> np.ndarray:
+    """Label index for each 0-100 score according to SCORE_RANGES."""
+    return _RANGE_LABELS[np.searchsorted(_RANGE_EDGES, scores, side='right')]
+
+
+def refine_scores(scores, label_indices, offsets: dict) -> tuple:
+    """
+    Shift scores by the feedback offsets and reclassify them.
+
+    A label with its own average shift moves by shift * 14.3 points,
+    any other label by the global score offset. Returns (scores, label_indices).
+    """
+    label_shifts = offsets.get('label_shifts', {})
+    offset_by_label = np.array([
+        label_shifts[label] * POINTS_PER_LABEL if label in label_shifts else offsets['score_offset']
+        for label in LABELS
+    ], dtype=np.float64)
+
+    adjusted = np.asarray(scores, dtype=np.float64) + offset_by_label[np.asarray(label_indices, dtype=np.intp)]
+    adjusted = np.clip(py_round(adjusted, 1), 0, 100)
+    return adjusted, labels_for_scores(adjusted)
+
+
+def refine_results(results: list, offsets: dict) -> list:
+    """Apply feedback refinement to result dicts in place (one vectorized pass)."""
+    if offsets['count'] == 0:
+        for result in results:
+            result['refined'] = False
+        return results
+    if not results:
+        return results
+
+    scores, labels = refine_scores(
+        [r['score'] for r in results],
+        [LABEL_INDEX[r['sentiment_label']] for r in results],
+        offsets
+    )
+    for result, score, label in zip(results, scores.tolist(), labels.tolist()):
+        result['score'] = score
+        result['sentiment_label'] = LABELS[label]
+        result['refined'] = True
+        result['refinement_offset'] = round(score - result.get('_original_score', score), 1)
+    return results
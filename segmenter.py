@@ -0,0 +1,194 @@
+"""
+Segmenter — streaming sentence windows for raw text (transcripts, PDF/DOCX).
+
+Text is scanned once, chunk by chunk: sentences are cut at . ! ? … and at
+blank lines, except after Portuguese abbreviations (Sr., Dra., p. ex., ...),
+initials and inside numbers (1.500, 3.5). Sentences are grouped into
+windows that are yielded as soon as they are complete, so a long document
+never has to be held as lists of strings, and prefetch() lets the model
+work on the first windows while the rest is still being segmented.
+"""
+
+import queue
+import re
+import threading
+
+# Sentences per window sent to the model
+WINDOW_SENTENCES = 5
+
+# Sentences up to this many characters are dropped (greetings, "ok", ...)
+MIN_SENTENCE_CHARS = 10
+
+# Windows up to this many characters are dropped
+MIN_WINDOW_CHARS = 20
+
+# A dot after these words (lowercase, without the dot) does not end a sentence
+ABBREVIATIONS = frozenset({
+    'sr', 'sra', 'srta', 'srs', 'sras', 'dr', 'dra', 'drs', 'dras',
+    'prof', 'profa', 'profs', 'eng', 'enga', 'adv', 'exmo', 'exma', 'ilmo', 'ilma',
+    'av', 'r', 'rod', 'tel', 'cel', 'fax', 'cep', 'obs', 'ex', 'p', 'pág', 'pag', 'págs',
+    'cap', 'art', 'arts', 'inc', 'nº', 'n', 'núm', 'ltda', 'cia', 'dept', 'depto',
+    'aprox', 'qtd', 'qtde', 'vs', 'v', 'sto', 'sta', 'ref',
+})
+
+# Sentence terminators: runs of . ! ? … or a blank line
+_TERMINATOR = re.compile(r'[.!?…]+|\n[ \t\r\f\v]*\n')
+
+# Characters needed after a terminator to decide whether it ends a sentence
+_LOOKAHEAD = 2
+
+# Tail of a chunk scanned again with the next one (a blank line may straddle them)
+_RESCAN = 64
+
+
+def _word_before(text: str, pos: int) -> str:
+    start = pos
+    while start > 0 and text[start - 1].isalpha():
+        start -= 1
+    return text[start:pos]
+
+
+def _is_boundary(text: str, start: int, end: int) -> bool:
+    """Whether the terminator text[start:end] really ends a sentence."""
+    mark = text[start:end]
+    if mark[0] == '\n' or any(c in mark for c in '!?'):
+        return True
+
+    after = text[end:end + _LOOKAHEAD].lstrip()[:1]
+    if mark == '.':
+        # Numbers: 1.500 / 3.5
+        if start > 0 and text[start - 1].isdigit() and after.isdigit():
+            return False
+        word = _word_before(text, start)
+        if word.lower() in ABBREVIATIONS:
+            return False
+        # Initials: "J. Silva"
+        if len(word) == 1 and word.isupper():
+            return False
+        return True
+
+    # Ellipsis: a pause when the sentence goes on in lowercase
+    return not after.islower()
+
+
+def iter_sentences(source):
+    """
+    Yield the stripped sentences of `source`, a string or an iterable of
+    text chunks (pages, paragraphs, file reads) consumed one at a time.
+    Terminators are not part of the yielded sentences.
+    """
+    chunks = [source] if isinstance(source, str) else source
+    buf = ''
+    scan_from = 0
+    for chunk in chunks:
+        buf += chunk
+        # Terminators too close to the end may continue in the next chunk
+        limit = len(buf) - _LOOKAHEAD
+        pos = 0
+        undecided = None
+        for m in _TERMINATOR.finditer(buf, scan_from):
+            if m.end() > limit:
+                undecided = m.start()
+                break
+            if _is_boundary(buf, m.start(), m.end()):
+                sentence = buf[pos:m.start()].strip()
+                if sentence:
+                    yield sentence
+                pos = m.end()
+        # Resume where the undecided text starts instead of rescanning the tail
+        if undecided is None:
+            undecided = max(pos, len(buf) - _RESCAN)
+        buf = buf[pos:]
+        scan_from = undecided - pos
+
+    # End of text: everything left is decided without lookahead
+    pos = 0
+    for m in _TERMINATOR.finditer(buf, scan_from):
+        if _is_boundary(buf, m.start(), m.end()):
+            sentence = buf[pos:m.start()].strip()
+            if sentence:
+                yield sentence
+            pos = m.end()
+    sentence = buf[pos:].strip()
+    if sentence:
+        yield sentence
+
+
+def iter_windows(sentences, window_size: int = WINDOW_SENTENCES,
+                 min_sentence_chars: int = MIN_SENTENCE_CHARS, min_window_chars: int = MIN_WINDOW_CHARS):
+    """Group sentences into windows of `window_size`, yielding each as soon as it is full."""
+    window = []
+    for sentence in sentences:
+        if len(sentence) <= min_sentence_chars:
+            continue
+        window.append(sentence)
+        if len(window) == window_size:
+            text = ' '.join(window)
+            if len(text) > min_window_chars:
+                yield text
+            window = []
+    if window:
+        text = ' '.join(window)
+        if len(text) > min_window_chars:
+            yield text
+
+
+def iter_text_windows(source, window_size: int = WINDOW_SENTENCES):
+    """Sentence windows of a string or an iterable of text chunks."""
+    return iter_windows(iter_sentences(source), window_size)
+
+
+def chunked(iterable, size: int):
+    """Yield lists of up to `size` items."""
+    group = []
+    for item in iterable:
+        group.append(item)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+_DONE = object()
+
+
+def prefetch(iterable, max_pending: int = 256):
+    """
+    Iterate `iterable` in a background thread, at most `max_pending` items
+    ahead of the consumer. Exceptions are re-raised in the consumer; the
+    producer stops when the consumer stops early.
+    """
+    pending = queue.Queue(max_pending)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+
+    thread = threading.Thread(target=produce, name='segmenter-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = pending.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
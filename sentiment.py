@@ -1,34 +1,342 @@
-from pysentimiento import create_analyzer
-import numpy as np
-import torch
+"""
+Sentiment model and conversation scoring.
 
-# Limit threads to reduce memory overhead on CPU
-torch.set_num_threads(1)
+The model is loaded lazily: importing this module is cheap, and the
+tokenizer and inference backend are built by the first call that
+needs them (get_model()), once per process and thread-safely. warm_up()
+loads the model and runs one forward pass ahead of traffic;
+start_warm_up() does it in a background thread so the process can answer
+health checks meanwhile. model_status() reports whether the model is
+ready and how long loading took.
+"""
 
-analyzer = create_analyzer(task="sentiment", lang="pt")
+from prediction_cache import prediction_cache
+import scoring
+import segmenter
+import windowing
+import threading
+import time
+import os
+
+# Intra-op threads per process; keep workers x TORCH_THREADS <= available cores
+TORCH_THREADS = int(os.environ.get('TORCH_THREADS', '1'))
+
+LANG = "pt"
+
+# Batching knobs: a mini-batch is closed when it reaches MAX_BATCH_SIZE texts
+# or when its padded size (texts x longest sequence) would exceed MAX_BATCH_TOKENS
+MAX_BATCH_SIZE = int(os.environ.get('SENTIMENT_MAX_BATCH_SIZE', '32'))
+MAX_BATCH_TOKENS = int(os.environ.get('SENTIMENT_MAX_BATCH_TOKENS', '4096'))
+
+# Messages longer than the model's max length are split into overlapping
+# token windows (see windowing.py); at most this many windows per message
+WINDOW_OVERLAP = int(os.environ.get('SENTIMENT_WINDOW_OVERLAP', str(windowing.WINDOW_OVERLAP)))
+MAX_TEXT_WINDOWS = int(os.environ.get('SENTIMENT_MAX_TEXT_WINDOWS', '64'))
+
+# Padded batch lengths are rounded up to a multiple of this, so the model
+# only ever sees a handful of sequence shapes
+SEQUENCE_BUCKET = int(os.environ.get('SENTIMENT_SEQUENCE_BUCKET', '16'))
+
+# Sentence windows of raw text (transcripts, documents) are sent to the model
+# in groups of this many, so the first groups are scored while the rest of
+# the text is still being segmented
+TEXT_WINDOW_GROUP = int(os.environ.get('SENTIMENT_TEXT_WINDOW_GROUP', str(MAX_BATCH_SIZE * 4)))
+
+# Text run through the model by warm_up()
+WARM_UP_TEXT = 'Bom dia, gostaria de saber o status do meu pedido.'
+
+# Reference point of the startup timings in model_status()
+_IMPORTED_AT = time.perf_counter()
+
+
+class SentimentModel:
+    """
+    The loaded tokenizer and inference backend, with their load timings.
+    Read from the pre-serialized artifact (model_artifact.py) when there is
+    one, otherwise built by pysentimiento from the Hugging Face cache.
+    """
+
+    def __init__(self):
+        start = time.perf_counter()
+        # Heavy imports happen here, not when the module is imported
+        import torch
+        from pysentimiento.preprocessing import preprocess_tweet
+        import inference
+        import model_artifact
+        imported = time.perf_counter()
+
+        torch.set_num_threads(TORCH_THREADS)
+        analyzer = None
+        if model_artifact.exists():
+            # Pre-serialized at build time: memory-mapped weights, saved tokenizer
+            model, self.tokenizer, manifest = model_artifact.load()
+            model_name = manifest.get('model_name')
+            self.preprocessing_args = dict(manifest.get('preprocessing_args') or {})
+            self.source = 'artifact'
+        else:
+            from pysentimiento import create_analyzer
+            analyzer = create_analyzer(task="sentiment", lang=LANG)
+            model = analyzer.model
+            model_name = getattr(model.config, '_name_or_path', None)
+            self.tokenizer = analyzer.tokenizer
+            self.preprocessing_args = dict(getattr(analyzer, 'preprocessing_args', None) or {})
+            self.source = 'hub'
+
+        # Inference only: weights are never written after load, so forked gunicorn
+        # workers keep sharing the master's copy-on-write pages
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+
+        self.config = model.config
+        self.special_tokens = _special_token_ids(self.tokenizer)
+        self._preprocess_tweet = preprocess_tweet
+        self._predict_padded = inference.predict_padded
+        self.preprocessing_args.setdefault('lang', LANG)
+
+        # Execution backend (torch, torch-int8 or onnx), see inference.py
+        self.backend = inference.create_backend(inference.INFERENCE_BACKEND, model, threads=TORCH_THREADS)
+        # Only the backend keeps the model: with ONNX the PyTorch weights (also
+        # held by the analyzer's evaluation Trainer) are released here
+        del model, analyzer
+
+        # Identity of the loaded weights, part of every prediction cache key;
+        # other backends produce slightly different probabilities, so they get their own keys
+        self.model_id = model_name or 'pysentimiento-sentiment-pt'
+        if self.backend.name != inference.TorchBackend.name:
+            self.model_id = f'{self.model_id}#{self.backend.name}'
+
+        # Cache keys also depend on how long texts are windowed
+        self.cache_namespace = f'{self.model_id}|windows:{WINDOW_OVERLAP}:{MAX_TEXT_WINDOWS}:end'
+
+        loaded = time.perf_counter()
+        self.timings = {
+            'import_seconds': round(imported - start, 3),
+            'load_seconds': round(loaded - imported, 3),
+            'ready_after_seconds': round(loaded - _IMPORTED_AT, 3),
+        }
+        print(
+            f"Sentiment model loaded from {self.source} in {loaded - start:.2f}s "
+            f"(imports {imported - start:.2f}s, {self.backend.name} model {loaded - imported:.2f}s)"
+        )
+
+    def preprocess(self, text: str) -> str:
+        """Apply the same tweet preprocessing the analyzer uses in predict()."""
+        return self._preprocess_tweet(text, **self.preprocessing_args)
+
+    def predict(self, input_ids: list, pad_to: int | None = None) -> list:
+        """POS/NEG/NEU probability rows of one batch of token id lists."""
+        return self._predict_padded(self.backend, self.tokenizer, input_ids, pad_to=pad_to)
+
+
+def _special_token_ids(tokenizer) -> tuple:
+    """
+    The (prefix, suffix) token ids the tokenizer wraps a single text with,
+    e.g. ([CLS], [SEP]); read from a sample encoding, which works for every
+    tokenizer class and transformers version.
+    """
+    plain = tokenizer('a', add_special_tokens=False)['input_ids']
+    full = tokenizer('a')['input_ids']
+    for start in range(len(full) - len(plain) + 1):
+        if full[start:start + len(plain)] == plain:
+            return full[:start], full[start + len(plain):]
+    raise RuntimeError("Could not locate the text inside the tokenizer's special tokens")
+
+
+_model = None
+_model_lock = threading.Lock()
+_warm_up_lock = threading.Lock()
+_warm_up_seconds = None
+_load_error = None
+
+
+def get_model() -> SentimentModel:
+    """The process-wide model, loaded on first use (callers wait while it loads)."""
+    global _model, _load_error
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = SentimentModel()
+                    _load_error = None
+                except Exception as e:
+                    _load_error = str(e)
+                    raise
+    return _model
+
+
+def is_ready() -> bool:
+    """Whether the model is loaded (never triggers loading)."""
+    return _model is not None
+
+
+def warm_up() -> dict:
+    """Load the model and run one forward pass so the first request pays neither."""
+    global _warm_up_seconds
+    model = get_model()
+    with _warm_up_lock:
+        if _warm_up_seconds is None:
+            start = time.perf_counter()
+            # Straight to the model: a cached prediction would skip the forward pass
+            _run_model([model.preprocess(WARM_UP_TEXT)])
+            _warm_up_seconds = round(time.perf_counter() - start, 3)
+            print(f"Sentiment model warmed up in {_warm_up_seconds:.2f}s")
+    return model_status()
+
+
+def start_warm_up() -> threading.Thread:
+    """warm_up() in a background thread; errors are reported by model_status()."""
+    def run():
+        try:
+            warm_up()
+        except Exception as e:
+            print(f"Error loading sentiment model: {e}")
+
+    thread = threading.Thread(target=run, name='sentiment-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def model_status() -> dict:
+    """Readiness and startup timings of the model in this process."""
+    status = {'ready': _model is not None, 'pid': os.getpid()}
+    if _model is not None:
+        status.update(_model.timings)
+        status['backend'] = _model.backend.name
+        status['source'] = _model.source
+        status['model_id'] = _model.model_id
+        status['warm_up_seconds'] = _warm_up_seconds
+    elif _load_error is not None:
+        status['error'] = _load_error
+    return status
+
+
+def plan_batches(lengths: list, max_batch_size: int = None, max_batch_tokens: int = None) -> list:
+    """
+    Group sequence indices into mini-batches sorted by length.
+
+    Sorting keeps similarly sized sequences together so padding stays small;
+    each batch respects both the size cap and the padded token budget.
+    """
+    max_batch_size = max_batch_size or MAX_BATCH_SIZE
+    max_batch_tokens = max_batch_tokens or MAX_BATCH_TOKENS
+
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    current = []
+    for i in order:
+        # Sorted ascending, so the newest item is always the longest in the batch
+        padded = (len(current) + 1) * lengths[i]
+        if current and (len(current) >= max_batch_size or padded > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def predict_probas(texts: list) -> list:
+    """
+    Predict POS/NEG/NEU probabilities for many texts.
+
+    Repeated texts are served from the prediction cache, keyed on the
+    preprocessed text with case and whitespace normalized (see
+    prediction_cache.normalize_text); the remaining unique texts run through
+    the model in padded, dynamically sized mini-batches.
+    Texts longer than the model's max length are read as overlapping windows.
+    Returns one {'POS', 'NEG', 'NEU'} dict per input text, in input order,
+    or None for texts that could not be analyzed.
+    """
+    if not texts:
+        return []
+
+    model = get_model()
+    prepared = [model.preprocess(t) for t in texts]
+    keys = [prediction_cache.make_key(t, model.cache_namespace) for t in prepared]
+    known = prediction_cache.get_many(keys)
+
+    # Each distinct uncached text goes through the model only once
+    pending = {}
+    for key, text in zip(keys, prepared):
+        if key not in known and key not in pending:
+            pending[key] = text
+
+    if pending:
+        computed = {}
+        for key, p in zip(pending, _run_model(list(pending.values()))):
+            if p is not None:
+                computed[key] = p
+        prediction_cache.put_many(computed)
+        known.update(computed)
+
+    return [known.get(key) for key in keys]
+
+
+def _token_windows(prepared: list) -> tuple:
+    """
+    Tokenize texts once and split the long ones into overlapping windows.
+    Returns the model inputs of every window and the text index each belongs to.
+    """
+    model = get_model()
+    tokenizer = model.tokenizer
+    prefix, suffix = model.special_tokens
+    window_size = tokenizer.model_max_length - len(prefix) - len(suffix)
+
+    # No truncation: the whole text is tokenized, windows decide what the model sees
+    encoded = tokenizer(prepared, add_special_tokens=False, verbose=False)['input_ids']
+
+    windows = []
+    owners = []
+    for i, ids in enumerate(encoded):
+        for window in windowing.split_windows(ids, window_size, WINDOW_OVERLAP, MAX_TEXT_WINDOWS):
+            windows.append(prefix + window + suffix)
+            owners.append(i)
+    return windows, owners
+
+
+def _run_model(prepared: list) -> list:
+    """Forward preprocessed texts through the model in length-sorted, padded mini-batches."""
+    model = get_model()
+    tokenizer = model.tokenizer
+    id2label = model.config.id2label
+
+    windows, owners = _token_windows(prepared)
+
+    # Batches are planned and padded on bucketed lengths
+    lengths = [windowing.bucket_length(len(ids), SEQUENCE_BUCKET, tokenizer.model_max_length) for ids in windows]
+    window_probas = [None] * len(windows)
+    for batch in plan_batches(lengths):
+        try:
+            batch_probs = model.predict([windows[i] for i in batch], pad_to=max(lengths[i] for i in batch))
+        except Exception as e:
+            print(f"Error analyzing batch of {len(batch)} chunks: {e}")
+            continue
+
+        for i, row in zip(batch, batch_probs):
+            window_probas[i] = {id2label[j]: p for j, p in enumerate(row)}
+
+    # Windows of the same text are merged with intensity weighting. A text
+    # with a failed window gets None, like a failed short text: a merge of
+    # the surviving windows would be cached as if it were the whole text
+    per_text = [[] for _ in prepared]
+    for owner, p in zip(owners, window_probas):
+        per_text[owner].append(p)
+    return [
+        None if any(p is None for p in probas) else windowing.merge_window_probas(probas)
+        for probas in per_text
+    ]
+
+
+class AnalysisCancelled(Exception):
+    """The caller gave up on an analysis (e.g. the client disconnected)."""
 
 
 class SentimentAnalyzer:
     # 7-level sentiment labels ordered from most negative to most positive
-    LEVELS = [
-        'very_negative',
-        'negative', 
-        'slightly_negative',
-        'neutral',
-        'slightly_positive',
-        'positive',
-        'very_positive'
-    ]
-    
-    LEVEL_LABELS = {
-        'very_negative': 'Very Negative',
-        'negative': 'Negative',
-        'slightly_negative': 'Slightly Negative',
-        'neutral': 'Neutral',
-        'slightly_positive': 'Slightly Positive',
-        'positive': 'Positive',
-        'very_positive': 'Very Positive'
-    }
+    LEVELS = scoring.LEVELS
+
+    LEVEL_LABELS = scoring.LEVEL_LABELS
 
     @staticmethod
     def analyze_conversation(conversation_data) -> dict:
@@ -38,18 +346,93 @@ class SentimentAnalyzer:
         - Real 7-level probability distribution
         - Neutral only when truly dominant
         """
+        if isinstance(conversation_data, str):
+            return SentimentAnalyzer.analyze_text(conversation_data)
+
+        texts = SentimentAnalyzer.extract_texts(conversation_data)
+        if not texts:
+            return SentimentAnalyzer._build_neutral_response()
+
+        # All customer messages go through the model together in padded mini-batches
+        probas = predict_probas(texts)
+        return SentimentAnalyzer.aggregate_probas([p for p in probas if p is not None])
+
+    @staticmethod
+    def analyze_text(source, cancel_event: threading.Event | None = None) -> dict:
+        """
+        Analyze raw text as one conversation. `source` is a string or an
+        iterable of text chunks (e.g. PDF pages), consumed lazily: sentence
+        windows are segmented in a background thread and scored group by
+        group as soon as they are ready. Setting `cancel_event` stops the
+        analysis before the next group with AnalysisCancelled.
+        """
+        rows = []
+        seen = 0
+        windows = segmenter.prefetch(segmenter.iter_text_windows(source))
+        try:
+            for group in segmenter.chunked(windows, TEXT_WINDOW_GROUP):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AnalysisCancelled()
+                seen += len(group)
+                rows.extend(p for p in predict_probas(group) if p is not None)
+        finally:
+            # Stops the segmentation thread when the loop ends early
+            windows.close()
+
+        if not seen:
+            return SentimentAnalyzer._build_neutral_response()
+        return SentimentAnalyzer.aggregate_probas(rows)
+
+    @staticmethod
+    def analyze_batch(conversations: list) -> list:
+        """
+        Analyze many conversations with a single shared work queue.
+
+        Messages from every conversation are flattened together so the model
+        runs in full, length-sorted batches; probabilities are then scattered
+        back and aggregated per conversation. Output order matches input order.
+        """
+        matrix, segment_ids = SentimentAnalyzer.predict_batch(conversations)
+        return SentimentAnalyzer.score_batch(matrix, segment_ids, len(conversations))
 
+    @staticmethod
+    def predict_batch(conversations: list) -> tuple:
+        """
+        Model probabilities of every scored message of many conversations.
+        Returns an (N x 3) POS/NEG/NEU matrix and the conversation index of each row.
+        """
         texts = []
+        owners = []
+        for idx, conversation_data in enumerate(conversations):
+            for text in SentimentAnalyzer.extract_texts(conversation_data):
+                texts.append(text)
+                owners.append(idx)
+
+        rows = []
+        segment_ids = []
+        for owner, p in zip(owners, predict_probas(texts)):
+            if p is not None:
+                rows.append(p)
+                segment_ids.append(owner)
+
+        return scoring.probas_to_matrix(rows), segment_ids
+
+    @staticmethod
+    def score_batch(matrix, segment_ids, n_conversations: int, offsets: dict | None = None) -> list:
+        """Results from stored probabilities, refined by `offsets` when given (no model call)."""
+        results = scoring.build_results(scoring.score_segments(matrix, segment_ids, n_conversations))
+        if offsets is not None:
+            scoring.refine_results(results, offsets)
+        return results
 
-        # Raw text (e.g. meeting transcription) - split into sentence windows
+    @staticmethod
+    def extract_texts(conversation_data) -> list:
+        """Collect the texts to score from a conversation, raw string or message object."""
+        texts = []
+
+        # Raw text (e.g. meeting transcription) - sentence windows, see segmenter.py
         if isinstance(conversation_data, str):
-            sentences = [t.strip() for t in conversation_data.replace('!', '.').replace('?', '.').split('.') if len(t.strip()) > 10]
-            # Group sentences into windows of 3
-            window_size = 5
-            for i in range(0, len(sentences), window_size):
-                window = ' '.join(sentences[i:i + window_size])
-                if len(window) > 20:
-                    texts.append(window)
+            texts.extend(segmenter.iter_text_windows(conversation_data))
         else:
             # New format: simple object with direct 'message' field
             if 'message' in conversation_data and isinstance(conversation_data.get('message'), str):
@@ -65,131 +448,23 @@ class SentimentAnalyzer:
                         if len(msg) > 2:
                             texts.append(msg)
 
-        if not texts:
-            return SentimentAnalyzer._build_neutral_response()
-
-        chunk_results = []
-        import gc
-
-        processed_count = 0
-        for text in texts:
-            processed_count += 1
-            # Truncate text to avoid OOM on very long sequences
-            if len(text) > 1024:
-                text = text[:1024]
-
-            try:
-                with torch.no_grad():
-                    pred = analyzer.predict(text)
-            except Exception as e:
-                print(f"Error analyzing chunk: {e}")
-                continue
-            
-            # Periodic garbage collection to prevent memory buildup
-            if processed_count % 50 == 0:
-                gc.collect()
-
-            p = pred.probas
-
-            # Emotional intensity (how non-neutral it is)
-            intensity = max(p['POS'], p['NEG'])
-            
-            # Calculate weight: emotional messages count more
-            # Linear weighting to allow weaker signals to pass through
-            # without getting crushed by a threshold
-            weight = intensity
-
-            chunk_results.append({
-                'pos': p['POS'],
-                'neg': p['NEG'],
-                'neu': p['NEU'],
-                'weight': weight
-            })
-
-        # Fallback if everything was weak
-        if not chunk_results:
-            return SentimentAnalyzer._build_neutral_response()
+        return texts
 
-        # Weighted aggregation of raw probabilities
-        total_weight = sum(c['weight'] for c in chunk_results)
-        if total_weight == 0:
-             return SentimentAnalyzer._build_neutral_response()
-             
-        avg_pos = sum(c['pos'] * c['weight'] for c in chunk_results) / total_weight
-        avg_neg = sum(c['neg'] * c['weight'] for c in chunk_results) / total_weight
-        avg_neu = sum(c['neu'] * c['weight'] for c in chunk_results) / total_weight
-
-        # Build 7-level probability distribution from the 3 raw probabilities
-        level_scores = SentimentAnalyzer._compute_7_level_scores(avg_pos, avg_neg, avg_neu)
-        
-        # Find dominant level
-        dominant_level = max(level_scores, key=level_scores.get)
-        sentiment_label = SentimentAnalyzer.LEVEL_LABELS[dominant_level]
-        
-        # Calculate overall score (0-100)
-        # Map from sentiment value [-1, 1] to [0, 100]
-        sentiment_value = avg_pos - avg_neg
-        score = round((sentiment_value + 1) / 2 * 100, 1)
-        score = max(0, min(100, score))
+    @staticmethod
+    def aggregate_probas(probas: list) -> dict:
+        """Weighted aggregation of per-message POS/NEG/NEU probabilities into a conversation result."""
+        scored = scoring.score_segments(scoring.probas_to_matrix(probas), [0] * len(probas), 1)
+        return scoring.build_results(scored)[0]
 
-        return {
-            'score': score,
-            'sentiment_label': sentiment_label,
-            'level_scores': {k: round(v, 3) for k, v in level_scores.items()}
-        }
-    
     @staticmethod
     def _compute_7_level_scores(pos: float, neg: float, neu: float) -> dict:
         """
         Convert 3 raw probabilities (POS, NEG, NEU) into 7-level distribution.
         Uses intensity to split positive/negative into gradations.
         """
-        # Intensity determines how extreme the sentiment is
-        intensity = max(pos, neg)
-        
-        # Initialize all levels
-        scores = {level: 0.0 for level in SentimentAnalyzer.LEVELS}
-        
-        # Distribute negative probability across negative levels
-        if neg > 0.02: # Lower threshold to catch slight negatives
-            if neg > 0.6:  # Strong negative
-                scores['very_negative'] = neg * 0.7
-                scores['negative'] = neg * 0.3
-            elif neg > 0.3:  # Moderate negative
-                scores['negative'] = neg * 0.6
-                scores['slightly_negative'] = neg * 0.4
-            else:  # Weak negative
-                scores['slightly_negative'] = neg * 1.0 # Push all to slightly negative if weak
-        
-        # Distribute positive probability across positive levels
-        if pos > 0.02:
-            if pos > 0.6:  # Strong positive
-                scores['very_positive'] = pos * 0.7
-                scores['positive'] = pos * 0.3
-            elif pos > 0.3:  # Moderate positive
-                scores['positive'] = pos * 0.6
-                scores['slightly_positive'] = pos * 0.4
-            else:  # Weak positive
-                scores['slightly_positive'] = pos * 1.0
-        
-        # Neutral: Only allow neutral to have significant score if truly no signal
-        # If there is noticeable intensity (> 0.15), crush neutral score
-        if intensity > 0.3:
-            scores['neutral'] = 0.0 # Signal is too strong for neutral
-        elif intensity > 0.15:
-            scores['neutral'] = neu * 0.1 # Heavily penalized
-        else:
-            scores['neutral'] = neu # True neutral
-        
-        # Normalize to sum to 1
-        total = sum(scores.values())
-        if total > 0.001:
-            scores = {k: v / total for k, v in scores.items()}
-        else:
-            scores['neutral'] = 1.0
-            
-        return scores
-    
+        levels = scoring.level_distribution([pos], [neg], [neu])[0]
+        return dict(zip(SentimentAnalyzer.LEVELS, levels.tolist()))
+
     @staticmethod
     def _build_neutral_response() -> dict:
         """Build a neutral response when no valid text is found."""
@@ -208,15 +483,7 @@ class SentimentAnalyzer:
         }
 
     # Score ranges for each label (used for reclassification after offset)
-    SCORE_RANGES = [
-        (0, 15, 'Very Negative'),
-        (15, 30, 'Negative'),
-        (30, 42, 'Slightly Negative'),
-        (42, 58, 'Neutral'),
-        (58, 70, 'Slightly Positive'),
-        (70, 85, 'Positive'),
-        (85, 100, 'Very Positive'),
-    ]
+    SCORE_RANGES = scoring.SCORE_RANGES
 
     @staticmethod
     def analyze_conversation_with_refinement(conversation_data) -> dict:
@@ -227,38 +494,15 @@ class SentimentAnalyzer:
         from feedback_store import get_correction_offsets
 
         result = SentimentAnalyzer.analyze_conversation(conversation_data)
-        offsets = get_correction_offsets()
-
-        if offsets['count'] == 0:
-            result['refined'] = False
-            return result
-
-        # Apply label-specific shift if available, otherwise global offset
-        original_label = result['sentiment_label']
-        label_shifts = offsets.get('label_shifts', {})
-        
-        if original_label in label_shifts:
-            # Per-label offset: shift * 14.3 points per label step
-            specific_offset = label_shifts[original_label] * 14.3
-            adjusted_score = result['score'] + specific_offset
-        else:
-            adjusted_score = result['score'] + offsets['score_offset']
-
-        # Clamp to 0-100
-        adjusted_score = max(0, min(100, round(adjusted_score, 1)))
-
-        # Reclassify based on adjusted score
-        new_label = 'Neutral'
-        for low, high, label in SentimentAnalyzer.SCORE_RANGES:
-            if low <= adjusted_score < high:
-                new_label = label
-                break
-        if adjusted_score >= 85:
-            new_label = 'Very Positive'
-
-        result['score'] = adjusted_score
-        result['sentiment_label'] = new_label
-        result['refined'] = True
-        result['refinement_offset'] = round(adjusted_score - (result.get('_original_score', adjusted_score)), 1)
-
-        return result
+        return SentimentAnalyzer.apply_refinement(result, get_correction_offsets())
+
+    @staticmethod
+    def analyze_batch_with_refinement(conversations: list, offsets: dict) -> list:
+        """Batch version of analyze_conversation_with_refinement using precomputed offsets."""
+        results = SentimentAnalyzer.analyze_batch(conversations)
+        return scoring.refine_results(results, offsets)
+
+    @staticmethod
+    def apply_refinement(result: dict, offsets: dict) -> dict:
+        """Shift a result's score by the feedback offsets and reclassify its label."""
+        return scoring.refine_results([result], offsets)[0]
@@ -0,0 +1,684 @@
+"""
+Session Store — persists dashboard analysis sessions on disk.
+
+Each session is a directory under SESSIONS_DIR:
+  summary.json    session metadata (filename, date, count, ...)
+  rows.sqlite     one compact row per conversation, indexed for paging,
+                  sorting and filtering
+  messages.jsonl  one line per conversation with its full message array
+  messages.idx    byte offset of each line in messages.jsonl (uint64 array)
+
+Aggregate metrics (label counts, score sums, per-agent and per-day
+breakdowns) are accumulated while rows are written and stored in the
+summary, so the results header never touches per-conversation data.
+Results pages query rows page by page; message bodies are read one
+conversation at a time through the offset index.
+Sessions saved by older versions as a single <session_id>.json file are
+converted to this layout the first time they are opened.
+
+rows.sqlite also keeps the model probabilities and weight of every scored
+message (probas table), so a session can be re-scored after the feedback
+offsets change without running the model again.
+
+A catalog (SESSIONS_DIR/catalog.sqlite) lists every session with its
+metadata, so listing, searching and expiring sessions never opens them.
+"""
+
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+import scoring
+
+SESSIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sessions')
+os.makedirs(SESSIONS_DIR, exist_ok=True)
+
+SUMMARY_FILE = 'summary.json'
+ROWS_FILE = 'rows.sqlite'
+MESSAGES_FILE = 'messages.jsonl'
+INDEX_FILE = 'messages.idx'
+
+CATALOG_FILE = 'catalog.sqlite'
+
+# Session ids as generated by the dashboard: YYYYmmdd_HHMMSS_<6 hex digits>
+SESSION_ID_PATTERN = re.compile(r'^\d{8}_\d{6}_[0-9a-f]{6}$')
+
+# Sessions older than this many days are deleted on save (0 keeps them forever)
+SESSION_RETENTION_DAYS = int(os.environ.get('SESSION_RETENTION_DAYS', '0'))
+
+# Paging limits of query_results
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Sort keys accepted by query_results -> indexed column
+SORT_COLUMNS = {
+    'index': 'idx',
+    'score': 'score',
+    'date': 'created_at',
+}
+
+_ROWS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS rows (
+        idx INTEGER PRIMARY KEY,
+        conv_id TEXT,
+        score REAL,
+        sentiment_label TEXT,
+        ai_agent TEXT,
+        human_escalation INTEGER,
+        refined INTEGER,
+        created_at TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_rows_score ON rows (score, idx);
+    CREATE INDEX IF NOT EXISTS idx_rows_date ON rows (created_at, idx);
+    CREATE INDEX IF NOT EXISTS idx_rows_label ON rows (sentiment_label, score);
+    CREATE INDEX IF NOT EXISTS idx_rows_agent ON rows (ai_agent);
+    CREATE TABLE IF NOT EXISTS probas (
+        idx INTEGER NOT NULL,
+        pos REAL NOT NULL,
+        neg REAL NOT NULL,
+        neu REAL NOT NULL,
+        weight REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_probas_idx ON probas (idx);
+'''
+
+# Rows re-scored per UPDATE batch
+_RESCORE_CHUNK = 1000
+
+
+def valid_session_id(session_id) -> bool:
+    """Whether `session_id` looks like an id this store generates (ids arrive in URLs and JSON bodies)."""
+    return isinstance(session_id, str) and SESSION_ID_PATTERN.match(session_id) is not None
+
+
+def _session_path(session_id: str, suffix: str = '') -> str:
+    """Path of a session entry in SESSIONS_DIR; ValueError for anything that could resolve elsewhere."""
+    if not valid_session_id(session_id):
+        raise ValueError(f'Invalid session id: {session_id!r}')
+    root = os.path.realpath(SESSIONS_DIR)
+    path = os.path.realpath(os.path.join(root, session_id + suffix))
+    if os.path.dirname(path) != root:
+        raise ValueError(f'Session path outside {root}: {path}')
+    return path
+
+
+def _session_dir(session_id: str) -> str:
+    return _session_path(session_id)
+
+
+def _legacy_path(session_id: str) -> str:
+    return _session_path(session_id, '.json')
+
+
+def _date_key(value) -> str:
+    """Sortable text for CreatedAt values (ISO strings or Mongo {'$date': ...})."""
+    if isinstance(value, dict):
+        value = value.get('$date', '')
+    return str(value) if value else ''
+
+
+def _day_key(created_at: str) -> str:
+    """YYYY-MM-DD part of a sortable CreatedAt value."""
+    return created_at[:10] if len(created_at) >= 10 else ''
+
+
+class SessionMetrics:
+    """Running aggregates of a session, updated one row at a time."""
+
+    def __init__(self):
+        self.total = 0
+        self.score_sum = 0.0
+        self.label_counts = {}
+        self.by_agent = {}
+        self.by_day = {}
+
+    @staticmethod
+    def _bump(bucket: dict, label: str, score: float, count: int = 1):
+        bucket['count'] = bucket.get('count', 0) + count
+        bucket['score_sum'] = bucket.get('score_sum', 0.0) + score
+        labels = bucket.setdefault('label_counts', {})
+        labels[label] = labels.get(label, 0) + count
+
+    def add(self, label: str, score: float, agent: str, day: str, count: int = 1):
+        """Account for `count` rows sharing the same label, agent and day (scores summed)."""
+        self.total += count
+        self.score_sum += score
+        self.label_counts[label] = self.label_counts.get(label, 0) + count
+        self._bump(self.by_agent.setdefault(agent, {}), label, score, count)
+        self._bump(self.by_day.setdefault(day, {}), label, score, count)
+
+    def to_dict(self) -> dict:
+        return {
+            'total': self.total,
+            'score_sum': self.score_sum,
+            'label_counts': self.label_counts,
+            'by_agent': self.by_agent,
+            'by_day': self.by_day
+        }
+
+
+class SessionWriter:
+    """
+    Writes a session incrementally: message bodies go to the message store
+    and summary rows to the row index as they are added, so nothing grows
+    in memory with the size of the upload.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.path = _session_dir(session_id)
+        os.makedirs(self.path, exist_ok=True)
+        self._messages = open(os.path.join(self.path, MESSAGES_FILE), 'wb')
+        self._offsets = array('Q')
+        self._db = sqlite3.connect(os.path.join(self.path, ROWS_FILE))
+        self._db.executescript(_ROWS_SCHEMA)
+        self.metrics = SessionMetrics()
+        self.count = 0
+        # Only sessions whose every row came with its probabilities can be re-scored
+        self.has_probas = True
+
+    def add(self, row: dict):
+        """
+        Add a result row; its 'messages' are moved to the message store and
+        its 'probas' (N x 3 POS/NEG/NEU matrix of scored messages) to the
+        probas table. Its label at analysis time is kept as 'model_label'.
+        """
+        messages = row.pop('messages', [])
+        row.setdefault('model_label', row.get('sentiment_label'))
+        probas = row.pop('probas', None)
+        self._offsets.append(self._messages.tell())
+        self._messages.write(json.dumps(messages, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        row['index'] = self.count
+        created_at = _date_key(row.get('created_at'))
+        agent = row.get('ai_agent') or ''
+        self.metrics.add(row.get('sentiment_label'), row.get('score') or 0.0, agent, _day_key(created_at))
+        self._db.execute(
+            'INSERT INTO rows (idx, conv_id, score, sentiment_label, ai_agent, human_escalation, '
+            'refined, created_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                self.count,
+                str(row.get('id', '')),
+                row.get('score'),
+                row.get('sentiment_label'),
+                agent,
+                1 if row.get('human_escalation') else 0,
+                1 if row.get('refined') else 0,
+                created_at,
+                json.dumps(row, ensure_ascii=False)
+            )
+        )
+        if probas is None:
+            self.has_probas = False
+        elif len(probas):
+            probas = np.asarray(probas, dtype=np.float64).reshape(-1, 3)
+            weights = scoring.message_weights(probas)
+            self._db.executemany(
+                'INSERT INTO probas (idx, pos, neg, neu, weight) VALUES (?, ?, ?, ?, ?)',
+                ((self.count, p[0], p[1], p[2], w) for p, w in zip(probas.tolist(), weights.tolist()))
+            )
+        self.count += 1
+
+    def discard(self):
+        """Abandon a session that failed midway and remove its files."""
+        self._messages.close()
+        self._db.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def close(self, meta: dict):
+        """Flush the message store and row index, then write the summary with `meta`."""
+        self._messages.close()
+        with open(os.path.join(self.path, INDEX_FILE), 'wb') as f:
+            self._offsets.tofile(f)
+        self._db.commit()
+        self._db.close()
+
+        summary = dict(meta)
+        summary['count'] = self.count
+        summary['metrics'] = self.metrics.to_dict()
+        summary['has_probas'] = self.has_probas
+        # The summary appears atomically, so a half-written session is never listed
+        _write_summary(self.path, summary)
+        _catalog_upsert(self.session_id, summary)
+
+        if SESSION_RETENTION_DAYS > 0:
+            expire_sessions(SESSION_RETENTION_DAYS)
+
+
+def _write_summary(path: str, summary: dict):
+    tmp_path = os.path.join(path, f'{SUMMARY_FILE}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(path, SUMMARY_FILE))
+
+
+def save_session(session_id: str, data: dict):
+    """Persist a complete session dict whose rows still carry their 'messages'."""
+    writer = SessionWriter(session_id)
+    for row in data.get('results', []):
+        writer.add(dict(row))
+    writer.close({k: v for k, v in data.items() if k not in ('results', 'count')})
+
+
+def _migrate_legacy(session_id: str) -> bool:
+    """Convert a single-file session to the directory layout. Returns True if one existed."""
+    legacy = _legacy_path(session_id)
+    if not os.path.exists(legacy):
+        return False
+    with open(legacy, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    save_session(session_id, data)
+    try:
+        os.remove(legacy)
+    except FileNotFoundError:
+        pass  # Migrated concurrently by another worker
+    return True
+
+
+def load_session(session_id: str) -> dict | None:
+    """Load a session's metadata."""
+    if not valid_session_id(session_id):
+        return None
+    path = os.path.join(_session_dir(session_id), SUMMARY_FILE)
+    if not os.path.exists(path) and not _migrate_legacy(session_id):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _open_rows(session_id: str) -> sqlite3.Connection | None:
+    if not valid_session_id(session_id):
+        return None
+    path = os.path.join(_session_dir(session_id), ROWS_FILE)
+    if not os.path.exists(path) and not _migrate_legacy(session_id):
+        return None
+    return sqlite3.connect(path)
+
+
+def query_results(session_id: str, page: int = 1, per_page: int = DEFAULT_PAGE_SIZE,
+                  sort: str = 'index', order: str = 'asc', label: str | None = None,
+                  agent: str | None = None, human_escalation: bool | None = None,
+                  refined: bool | None = None) -> dict | None:
+    """One page of a session's rows, filtered and sorted through the row index."""
+    conn = _open_rows(session_id)
+    if conn is None:
+        return None
+
+    where = []
+    params = []
+    if label:
+        where.append('sentiment_label = ?')
+        params.append(label)
+    if agent:
+        where.append('ai_agent = ?')
+        params.append(agent)
+    if human_escalation is not None:
+        where.append('human_escalation = ?')
+        params.append(1 if human_escalation else 0)
+    if refined is not None:
+        where.append('refined = ?')
+        params.append(1 if refined else 0)
+    where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+
+    column = SORT_COLUMNS.get(sort, 'idx')
+    direction = 'DESC' if order == 'desc' else 'ASC'
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    page = max(1, page)
+
+    try:
+        total = conn.execute(f'SELECT COUNT(*) FROM rows {where_sql}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT data FROM rows {where_sql} ORDER BY {column} {direction}, idx {direction} LIMIT ? OFFSET ?',
+            params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+        'results': [json.loads(r[0]) for r in rows]
+    }
+
+
+def list_agents(session_id: str) -> list:
+    """Distinct AI agents present in a session."""
+    conn = _open_rows(session_id)
+    if conn is None:
+        return []
+    try:
+        rows = conn.execute("SELECT DISTINCT ai_agent FROM rows WHERE ai_agent != '' ORDER BY ai_agent").fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def compute_metrics(session_id: str) -> dict | None:
+    """Rebuild a session's aggregate metrics from its row index."""
+    conn = _open_rows(session_id)
+    if conn is None:
+        return None
+    try:
+        groups = conn.execute(
+            'SELECT sentiment_label, ai_agent, substr(created_at, 1, 10), COUNT(*), SUM(score) '
+            'FROM rows GROUP BY 1, 2, 3'
+        ).fetchall()
+    finally:
+        conn.close()
+
+    metrics = SessionMetrics()
+    for label, agent, day, count, score_sum in groups:
+        metrics.add(label, score_sum or 0.0, agent, day if len(day) == 10 else '', count)
+    return metrics.to_dict()
+
+
+def load_metrics(session_id: str, summary: dict | None = None) -> dict | None:
+    """Precomputed metrics of a session, rebuilt only if they were invalidated."""
+    summary = summary or load_session(session_id)
+    if summary is None:
+        return None
+    if summary.get('metrics') is None:
+        revision = summary.get('revision', 0)
+        metrics = compute_metrics(session_id)
+        # Only store them if no correction landed while they were being rebuilt
+        latest = load_session(session_id)
+        if latest.get('revision', 0) == revision:
+            latest['metrics'] = metrics
+            _write_summary(_session_dir(session_id), latest)
+        return metrics
+    return summary['metrics']
+
+
+def update_row_label(session_id: str, index: int, label: str, css_class: str) -> bool:
+    """
+    Apply a user correction to a stored row and invalidate the session metrics.
+    The correction is shown as the row's label and kept in 'corrected_label';
+    'model_label' keeps the label of the analysis.
+    """
+    conn = _open_rows(session_id)
+    if conn is None:
+        return False
+    try:
+        with conn:
+            found = conn.execute('SELECT data FROM rows WHERE idx = ?', (index,)).fetchone()
+            if found is None:
+                return False
+            row = json.loads(found[0])
+            if row.get('sentiment_label') == label:
+                return True
+            row.setdefault('model_label', row.get('sentiment_label'))
+            row['sentiment_label'] = label
+            row['css_class'] = css_class
+            row['corrected_label'] = label
+            conn.execute(
+                'UPDATE rows SET sentiment_label = ?, data = ? WHERE idx = ?',
+                (label, json.dumps(row, ensure_ascii=False), index)
+            )
+    finally:
+        conn.close()
+
+    summary = load_session(session_id)
+    summary['metrics'] = None
+    summary['revision'] = summary.get('revision', 0) + 1
+    _write_summary(_session_dir(session_id), summary)
+    return True
+
+
+def rescore_session(session_id: str, offsets: dict | None = None) -> bool | None:
+    """
+    Recompute score, label, level_scores and refinement of every row from
+    the stored probabilities, refined by `offsets` (feedback_store offsets)
+    when they hold corrections. Labels corrected by hand are kept.
+    Returns None if the session does not exist and False if it predates
+    stored probabilities (it has to be uploaded again).
+    """
+    summary = load_session(session_id)
+    if summary is None:
+        return None
+    if not summary.get('has_probas'):
+        return False
+
+    offsets = offsets or {'score_offset': 0.0, 'label_shifts': {}, 'count': 0}
+    count = summary.get('count', 0)
+    conn = _open_rows(session_id)
+    try:
+        stored = np.array(
+            conn.execute('SELECT idx, pos, neg, neu, weight FROM probas ORDER BY idx').fetchall(),
+            dtype=np.float64
+        ).reshape(-1, 5)
+        scored = scoring.score_segments(stored[:, 1:4], stored[:, 0].astype(np.intp), count, weights=stored[:, 4])
+        results = scoring.refine_results(scoring.build_results(scored), offsets)
+
+        with conn:
+            for start in range(0, count, _RESCORE_CHUNK):
+                updates = []
+                for idx, data in conn.execute(
+                    'SELECT idx, data FROM rows WHERE idx >= ? AND idx < ? ORDER BY idx',
+                    (start, start + _RESCORE_CHUNK)
+                ).fetchall():
+                    row = json.loads(data)
+                    if row.get('analysis_error'):
+                        continue
+                    result = results[idx]
+                    row['score'] = result['score']
+                    row['level_scores'] = result['level_scores']
+                    row['refined'] = result['refined']
+                    if not row.get('corrected_label'):
+                        row['sentiment_label'] = result['sentiment_label']
+                        row['css_class'] = result['sentiment_label'].lower().replace(' ', '-')
+                    updates.append((
+                        row['score'], row['sentiment_label'], 1 if row['refined'] else 0,
+                        json.dumps(row, ensure_ascii=False), idx
+                    ))
+                conn.executemany(
+                    'UPDATE rows SET score = ?, sentiment_label = ?, refined = ?, data = ? WHERE idx = ?',
+                    updates
+                )
+    finally:
+        conn.close()
+
+    summary = load_session(session_id)
+    summary['metrics'] = compute_metrics(session_id)
+    summary['revision'] = summary.get('revision', 0) + 1
+    summary['refinement_active'] = offsets['count'] > 0
+    summary['feedback_count'] = offsets['count']
+    summary['rescored_at'] = datetime.now().strftime('%d/%m/%Y %H:%M')
+    _write_summary(_session_dir(session_id), summary)
+    return True
+
+
+def rescore_sessions(offsets: dict | None = None) -> dict:
+    """Re-score every cataloged session. Returns {'rescored': n, 'skipped': n}."""
+    conn = _catalog()
+    try:
+        session_ids = [r[0] for r in conn.execute('SELECT id FROM sessions ORDER BY created_at')]
+    finally:
+        conn.close()
+
+    rescored = skipped = 0
+    for sid in session_ids:
+        try:
+            done = rescore_session(sid, offsets)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            print(f"Error re-scoring session {sid}: {e}")
+            done = False
+        if done:
+            rescored += 1
+        else:
+            skipped += 1
+    return {'rescored': rescored, 'skipped': skipped}
+
+
+def load_messages(session_id: str, index: int) -> list | None:
+    """Load the message array of one conversation of a session."""
+    if not valid_session_id(session_id):
+        return None
+    path = _session_dir(session_id)
+    index_path = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_path) and not _migrate_legacy(session_id):
+        return None
+
+    offsets = array('Q')
+    with open(index_path, 'rb') as f:
+        count = os.fstat(f.fileno()).st_size // offsets.itemsize
+        if not 0 <= index < count:
+            return None
+        f.seek(index * offsets.itemsize)
+        offsets.fromfile(f, 1)
+    with open(os.path.join(path, MESSAGES_FILE), 'rb') as f:
+        f.seek(offsets[0])
+        return json.loads(f.readline())
+
+
+def _created_at(session_id: str) -> float:
+    """Creation time encoded in the session id (YYYYmmdd_HHMMSS_xxxxxx)."""
+    try:
+        return datetime.strptime(session_id[:15], '%Y%m%d_%H%M%S').timestamp()
+    except ValueError:
+        return time.time()
+
+
+def _catalog() -> sqlite3.Connection:
+    """Open the session catalog, building it from the sessions on disk the first time."""
+    path = os.path.join(SESSIONS_DIR, CATALOG_FILE)
+    is_new = not os.path.exists(path)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions (created_at);
+    ''')
+    if is_new:
+        _backfill_catalog(conn)
+    return conn
+
+
+def _backfill_catalog(conn: sqlite3.Connection):
+    """One-time scan of SESSIONS_DIR for sessions saved before the catalog existed."""
+    for fname in os.listdir(SESSIONS_DIR):
+        if fname.endswith('.json'):
+            sid = fname[:-len('.json')]
+        elif os.path.isdir(os.path.join(SESSIONS_DIR, fname)):
+            sid = fname
+        else:
+            continue
+        if not valid_session_id(sid):
+            continue
+        summary = load_session(sid)
+        if summary:
+            _catalog_upsert(sid, summary, conn)
+
+
+def _catalog_upsert(session_id: str, summary: dict, conn: sqlite3.Connection | None = None):
+    own = conn is None
+    conn = conn or _catalog()
+    try:
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions (id, filename, count, date, created_at) VALUES (?, ?, ?, ?, ?)',
+                (
+                    session_id,
+                    summary.get('filename', 'Desconhecido'),
+                    summary.get('count', 0),
+                    summary.get('date', ''),
+                    _created_at(session_id)
+                )
+            )
+    finally:
+        if own:
+            conn.close()
+
+
+def list_sessions(page: int = 1, per_page: int = 10, search: str | None = None,
+                  date_from: str | None = None, date_to: str | None = None) -> dict:
+    """
+    Page through saved sessions, newest first.
+    `search` matches the filename or the displayed date; `date_from` and
+    `date_to` (YYYY-MM-DD, inclusive) bound the creation date.
+    """
+    where = []
+    params = []
+    if search:
+        where.append("(filename LIKE ? ESCAPE '\\' OR date LIKE ? ESCAPE '\\')")
+        pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params += [pattern, pattern]
+    if date_from:
+        where.append('created_at >= ?')
+        params.append(datetime.strptime(date_from, '%Y-%m-%d').timestamp())
+    if date_to:
+        where.append('created_at < ?')
+        params.append(datetime.strptime(date_to, '%Y-%m-%d').timestamp() + 86400)
+    where_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+    page = max(1, page)
+
+    conn = _catalog()
+    try:
+        total = conn.execute(f'SELECT COUNT(*) FROM sessions {where_sql}', params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT id, filename, count, date FROM sessions {where_sql} '
+            'ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?',
+            params + [per_page, (page - 1) * per_page]
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        'sessions': [
+            {'id': sid, 'filename': filename, 'count': count, 'date': date}
+            for sid, filename, count, date in rows
+        ],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page
+    }
+
+
+def delete_session(session_id: str) -> bool:
+    """Delete a session's files and its catalog entry."""
+    if not valid_session_id(session_id):
+        return False
+    path = _session_dir(session_id)
+    legacy = _legacy_path(session_id)
+    existed = os.path.isdir(path) or os.path.exists(legacy)
+    shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+    conn = _catalog()
+    try:
+        with conn:
+            removed = conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,)).rowcount
+    finally:
+        conn.close()
+    return existed or removed > 0
+
+
+def expire_sessions(retention_days: int = SESSION_RETENTION_DAYS) -> int:
+    """Delete sessions older than `retention_days`. Returns how many were removed."""
+    cutoff = time.time() - retention_days * 86400
+    conn = _catalog()
+    try:
+        expired = [r[0] for r in conn.execute('SELECT id FROM sessions WHERE created_at < ?', (cutoff,))]
+    finally:
+        conn.close()
+    for sid in expired:
+        delete_session(sid)
+    return len(expired)
@@ -0,0 +1,67 @@
+import json
+import unittest
+from unittest import mock
+
+import app as api
+from json_stream import CHUNK_SIZE
+
+
+class TestNdjsonStream(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+
+    def analyze_batch(self, items):
+        # Echoes each conversation's 'n' so the output order can be checked
+        self.batches.append(len(items))
+        return [{'n': item.get('n')} for item in items]
+
+    def post(self, body, batch_size=3):
+        with mock.patch.object(api, 'NDJSON_BATCH_SIZE', batch_size), \
+                mock.patch.object(api.SentimentAnalyzer, 'analyze_batch', side_effect=self.analyze_batch):
+            response = api.app.test_client().post('/analyze', data=body, content_type='application/x-ndjson')
+            # The body is streamed: read it while the model is patched
+            out = response.get_data()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in out.splitlines()]
+
+    def test_order_across_batches(self):
+        body = b''.join(b'{"n": %d}\n' % n for n in range(8))
+        self.assertEqual(self.post(body), [{'n': n} for n in range(8)])
+        self.assertEqual(self.batches, [3, 3, 2])
+
+    def test_error_lines_stay_aligned(self):
+        body = b'{"n": 0}\n{"n": 1}\nnot json\n{"n": 2}\n[1, 2]\n"text"\n{"n": 3}\n'
+        self.assertEqual(self.post(body), [
+            {'n': 0},
+            {'n': 1},
+            {'error': 'Invalid JSON object', 'line': 3},
+            {'n': 2},
+            {'error': 'Invalid JSON object', 'line': 5},
+            {'error': 'Invalid JSON object', 'line': 6},
+            {'n': 3},
+        ])
+        # Pending results are flushed before each error line
+        self.assertEqual(self.batches, [2, 1, 1])
+
+    def test_blank_lines_are_skipped(self):
+        body = b'\n{"n": 0}\n\n  \r\n{"n": 1}\n\n{bad\n'
+        self.assertEqual(self.post(body), [{'n': 0}, {'n': 1}, {'error': 'Invalid JSON object', 'line': 7}])
+
+    def test_line_split_across_read_blocks(self):
+        first = b'{"n": 0, "pad": "' + b'x' * (CHUNK_SIZE - 40) + b'"}\n'
+        # The second line starts just before the first block boundary and ends past it
+        second = b'{"n": 1, "pad": "' + b'y' * 100 + b'"}\n'
+        self.assertLess(len(first), CHUNK_SIZE)
+        self.assertGreater(len(first + second), CHUNK_SIZE)
+        long_line = b'{"n": 2, "pad": "' + b'z' * (2 * CHUNK_SIZE) + b'"}\n'
+        self.assertEqual(self.post(first + second + long_line), [{'n': 0}, {'n': 1}, {'n': 2}])
+
+    def test_last_line_without_newline(self):
+        self.assertEqual(self.post(b'{"n": 0}\n{"n": 1}'), [{'n': 0}, {'n': 1}])
+        self.assertEqual(self.post(b'{"n": 0}\n{"n": 1'), [{'n': 0}, {'error': 'Invalid JSON object', 'line': 2}])
+        self.assertEqual(self.post(b''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import unittest
+from unittest import mock
+
+import app_asgi
+from app import VERSION_INFO
+from sentiment import SentimentAnalyzer
+
+
+def call(path, method='GET', body=b'', headers=None, chunked=False, disconnect=False):
+    """
+    Run one request through the ASGI app. Returns (status, headers, body).
+    With `disconnect`, the client goes away right after sending its body.
+    """
+    headers = dict(headers or {})
+    if not chunked:
+        headers.setdefault('content-length', str(len(body)))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def run():
+        never = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            if disconnect:
+                return {'type': 'http.disconnect'}
+            await never.wait()
+
+        async def send(message):
+            sent.append(message)
+
+        await app_asgi.app(scope, receive, send)
+
+    asyncio.run(run())
+    start = next(m for m in sent if m['type'] == 'http.response.start')
+    response_headers = {k.decode(): v.decode() for k, v in start['headers']}
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body')
+
+
+def multipart(filename, content):
+    boundary = 'testboundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: text/plain\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, {'content-type': f'multipart/form-data; boundary={boundary}'}
+
+
+class TestAsgiApp(unittest.TestCase):
+    def test_health_version_and_readiness(self):
+        status, _, _ = call('/health')
+        self.assertEqual(status, 200)
+
+        status, _, body = call('/version')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), VERSION_INFO)
+
+        status, _, body = call('/ready')
+        self.assertEqual(status, 503)
+        self.assertFalse(json.loads(body)['ready'])
+
+    def test_single_conversation_goes_through_the_executor(self):
+        with mock.patch.object(SentimentAnalyzer, 'analyze_batch', side_effect=lambda items: [{'n': len(items)}] * len(items)):
+            status, _, body = call('/analyze', 'POST', json.dumps({'messages': ['oi']}).encode(),
+                                   {'content-type': 'application/json'})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {'n': 1})
+
+        status, _, body = call('/analyze', 'POST', b'not json', {'content-type': 'application/json'})
+        self.assertEqual(status, 400)
+        self.assertIn('error', json.loads(body))
+
+    def test_body_over_the_limit_is_rejected(self):
+        with mock.patch.dict(app_asgi.BODY_LIMITS, {'/analyze': 16}):
+            status, _, body = call('/analyze', 'POST', b'x' * 32, {'content-type': 'application/json'})
+            self.assertEqual(status, 413)
+            self.assertIn('Request too large', json.loads(body)['error'])
+
+            # No Content-Length: cut off while the body is being received
+            status, _, body = call('/analyze', 'POST', b'x' * 32, {'content-type': 'application/json'}, chunked=True)
+            self.assertEqual(status, 413)
+
+    def test_ndjson_stream_past_the_body_limit(self):
+        body = b'{"messages": ["oi"]}\n' * 3 + b'[1, 2]\n'
+        with mock.patch.dict(app_asgi.BODY_LIMITS, {'/analyze': 16}), \
+                mock.patch.object(SentimentAnalyzer, 'analyze_batch', side_effect=lambda items: [{}] * len(items)):
+            status, _, out = call('/analyze', 'POST', body, {'content-type': 'application/x-ndjson'})
+        self.assertEqual(status, 200)
+        lines = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[-1], {'error': 'Invalid JSON object', 'line': 4})
+
+    def test_ndjson_lines_over_the_line_limit_are_skipped(self):
+        body = b'{"id": "a"}\n' + b'x' * 5000 + b'\n{"id": "b"}\n' + b'y' * 2000
+        with mock.patch.object(app_asgi, 'NDJSON_MAX_LINE_BYTES', 1024), \
+                mock.patch.object(SentimentAnalyzer, 'analyze_batch', side_effect=lambda items: [{}] * len(items)):
+            status, _, out = call('/analyze', 'POST', body, {'content-type': 'application/x-ndjson'})
+        self.assertEqual(status, 200)
+        self.assertEqual([json.loads(line) for line in out.splitlines()], [
+            {'id': 'a'},
+            {'error': 'Line too long', 'line': 2},
+            {'id': 'b'},
+            {'error': 'Line too long', 'line': 4},
+        ])
+
+    def test_busy_server_answers_429(self):
+        with mock.patch.object(app_asgi, 'ASGI_MAX_PENDING', 0):
+            status, headers, body = call('/analyze', 'POST', b'[{"messages": ["oi"]}]',
+                                         {'content-type': 'application/json'})
+        self.assertEqual(status, 429)
+        self.assertEqual(headers['retry-after'], '1')
+        self.assertIn('error', json.loads(body))
+
+    def test_client_disconnect_cancels_the_analysis(self):
+        cancelled = threading.Event()
+        finished = threading.Event()
+        outcome = {}
+
+        def slow_analysis(chunks, cancel_event=None):
+            if cancel_event.wait(5):
+                cancelled.set()
+            # The rest of the upload is still readable after the disconnect
+            try:
+                outcome['text'] = ''.join(chunks)
+            except Exception as e:
+                outcome['error'] = e
+            finished.set()
+            return {}
+
+        text = 'Que dia lindo. Adorei o atendimento. ' * 5000
+        body, headers = multipart('chat.txt', text.encode())
+        with mock.patch.object(SentimentAnalyzer, 'analyze_text', side_effect=slow_analysis):
+            status, _, _ = call('/analyze', 'POST', body, headers, disconnect=True)
+            self.assertTrue(cancelled.wait(5))
+            self.assertTrue(finished.wait(5))
+        self.assertEqual(status, 499)
+        self.assertNotIn('error', outcome)
+        self.assertEqual(outcome['text'], text)
+
+
+if __name__ == '__main__':
+    unittest.main()
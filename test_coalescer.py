@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from coalescer import RequestCoalescer
+
+
+class TestCoalescer(unittest.TestCase):
+    def test_concurrent_calls_share_a_batch(self):
+        batches = []
+
+        def handler(items):
+            batches.append(list(items))
+            return [item * 10 for item in items]
+
+        coalescer = RequestCoalescer(handler, max_batch_size=8, max_wait_ms=200)
+        results = {}
+        barrier = threading.Barrier(8)
+
+        def call(i):
+            barrier.wait()
+            results[i] = coalescer(i, timeout=5)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: i * 10 for i in range(8)})
+        self.assertEqual(len(batches), 1)
+        stats = coalescer.stats()
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(stats['items'], 8)
+        self.assertEqual(stats['flush_reasons'], {'size': 1})
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_lone_call_is_flushed_after_max_wait(self):
+        coalescer = RequestCoalescer(lambda items: [len(items)] * len(items), max_batch_size=32, max_wait_ms=20)
+        start = time.perf_counter()
+        self.assertEqual(coalescer('x', timeout=5), 1)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.015)
+        self.assertEqual(coalescer.stats()['flush_reasons'], {'wait': 1})
+
+    def test_bad_item_fails_alone(self):
+        def handler(items):
+            if 'bad' in items:
+                raise ValueError('bad item')
+            return [item.upper() for item in items]
+
+        coalescer = RequestCoalescer(handler, max_batch_size=3, max_wait_ms=500)
+        futures = [coalescer.submit(item) for item in ('a', 'bad', 'c')]
+        self.assertEqual(futures[0].result(5), 'A')
+        self.assertEqual(futures[2].result(5), 'C')
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertEqual(coalescer.stats()['fallbacks'], 1)
+
+    def test_cancelled_calls_are_skipped(self):
+        seen = []
+        coalescer = RequestCoalescer(lambda items: seen.extend(items) or items, max_batch_size=2, max_wait_ms=100)
+        cancelled = coalescer.submit('gone')
+        self.assertTrue(cancelled.cancel())
+        self.assertEqual(coalescer('kept', timeout=5), 'kept')
+        self.assertEqual(seen, ['kept'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import feedback_store
+
+
+class TestFeedbackStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self._orig = (feedback_store.FEEDBACK_DB, feedback_store.FEEDBACK_FILE)
+        feedback_store.FEEDBACK_DB = os.path.join(self.tmpdir.name, 'feedbacks.sqlite')
+        feedback_store.FEEDBACK_FILE = os.path.join(self.tmpdir.name, 'feedbacks.json')
+
+    def tearDown(self):
+        feedback_store.FEEDBACK_DB, feedback_store.FEEDBACK_FILE = self._orig
+        self.tmpdir.cleanup()
+
+    def test_offsets_follow_saves_replacements_and_clear(self):
+        self.assertEqual(feedback_store.get_correction_offsets(), {'score_offset': 0.0, 'label_shifts': {}, 'count': 0})
+
+        feedback_store.save_feedback('a', 'Neutral', 'Positive', 50.0)
+        feedback_store.save_feedback('b', 'Neutral', 'Slightly Positive', 52.0)
+        feedback_store.save_feedback('c', 'Negative', 'Very Negative', 20.0)
+        feedback_store.save_feedback('d', 'Unknown', 'Neutral', 40.0)
+        offsets = feedback_store.get_correction_offsets()
+        self.assertEqual(offsets['count'], 4)
+        self.assertEqual(offsets['label_shifts'], {'Neutral': 1.5, 'Negative': -1.0})
+        self.assertEqual(offsets['score_offset'], round((2 + 1 - 1) / 3 * 14.3, 2))
+
+        # Re-correcting a conversation replaces its previous contribution
+        feedback_store.save_feedback('c', 'Negative', 'Negative', 20.0)
+        offsets = feedback_store.get_correction_offsets()
+        self.assertEqual(offsets['count'], 4)
+        self.assertEqual(offsets['label_shifts'], {'Neutral': 1.5, 'Negative': 0.0})
+        self.assertEqual([fb['conversation_id'] for fb in feedback_store.load_feedbacks()], ['a', 'b', 'd', 'c'])
+        self.assertEqual(feedback_store.get_feedback_stats()['corrections_by_label']['Neutral'],
+                         {'Positive': 1, 'Slightly Positive': 1})
+
+        feedback_store.clear_feedbacks()
+        self.assertEqual(feedback_store.get_correction_offsets()['count'], 0)
+        self.assertEqual(feedback_store.get_feedback_stats(), {'total': 0, 'corrections_by_label': {}})
+
+    def test_legacy_json_is_migrated_once(self):
+        with open(feedback_store.FEEDBACK_FILE, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'conversation_id': 'x', 'original_label': 'Positive', 'corrected_label': 'Neutral',
+                 'original_score': 70.0, 'timestamp': '2026-01-01T10:00:00'},
+                {'conversation_id': 'y', 'original_label': 'Positive', 'corrected_label': 'Very Positive',
+                 'original_score': 75.0, 'timestamp': '2026-01-01T11:00:00'},
+            ], f)
+
+        offsets = feedback_store.get_correction_offsets()
+        self.assertEqual(offsets['count'], 2)
+        self.assertEqual(offsets['label_shifts'], {'Positive': -0.5})
+        self.assertFalse(os.path.exists(feedback_store.FEEDBACK_FILE))
+        self.assertEqual(feedback_store.load_feedbacks(limit=1)[0]['conversation_id'], 'y')
+
+    def test_commit_from_another_connection_invalidates_cache(self):
+        feedback_store.save_feedback('a', 'Neutral', 'Positive', 50.0)
+        self.assertEqual(feedback_store.get_correction_offsets()['count'], 1)
+
+        # Simulate another worker process writing through its own connection
+        other = sqlite3.connect(feedback_store.FEEDBACK_DB, isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        feedback_store._upsert(other, 'b', 'Neutral', 'Negative', 50.0, '2026-01-02T00:00:00')
+        other.execute('COMMIT')
+        other.close()
+
+        offsets = feedback_store.get_correction_offsets()
+        self.assertEqual(offsets['count'], 2)
+        self.assertEqual(offsets['label_shifts'], {'Neutral': 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,76 @@
 import unittest
 from io import BytesIO
+from unittest import mock
+
+import docx
+from pypdf import PdfWriter
+from pypdf.generic import DictionaryObject, NameObject, StreamObject
+
+import file_parser
 from file_parser import parse_pdf, parse_docx
 
+
+def make_pdf(pages: list) -> BytesIO:
+    """A PDF with one line of Helvetica text per page."""
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for text in pages:
+        page = writer.add_blank_page(300, 100)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})
+        })
+        content = StreamObject()
+        content.set_data(f'BT /F1 12 Tf 10 50 Td ({text}) Tj ET'.encode('latin-1'))
+        page[NameObject('/Contents')] = writer._add_object(content)
+    stream = BytesIO()
+    writer.write(stream)
+    stream.seek(0)
+    return stream
+
 class TestFileParser(unittest.TestCase):
+    PAGES = [f'Pagina {i}. Texto da pagina {i}.' for i in range(6)]
+
+    def test_pdf_pages_in_order(self):
+        expected = [p + "\n" for p in self.PAGES]
+        self.assertEqual(list(file_parser.iter_pdf_pages(make_pdf(self.PAGES))), expected)
+        self.assertEqual(list(file_parser.iter_pdf_pages(make_pdf(self.PAGES), processes=2)), expected)
+        self.assertEqual(list(file_parser.iter_pdf_pages(make_pdf(self.PAGES), max_pages=2)), expected[:2])
+        self.assertEqual(parse_pdf(make_pdf(self.PAGES)), ''.join(expected))
+        self.assertEqual(list(file_parser.iter_pdf_pages(BytesIO(b'not a pdf'))), [])
+
+    def test_docx_paragraphs(self):
+        doc = docx.Document()
+        doc.add_paragraph('Primeiro parágrafo.')
+        doc.add_paragraph('Segundo parágrafo.')
+        stream = BytesIO()
+        doc.save(stream)
+        stream.seek(0)
+        self.assertEqual(parse_docx(stream), 'Primeiro parágrafo.\nSegundo parágrafo.\n')
+
+    def test_txt_blocks_and_caps(self):
+        text = 'ação ' * 100
+        blocks = list(file_parser.iter_txt_blocks(BytesIO(text.encode('utf-8')), block_size=7))
+        self.assertEqual(''.join(blocks), text)
+
+        capped = ''.join(file_parser.cap_bytes(iter(['abc', 'ção', 'xyz']), max_bytes=5))
+        self.assertEqual(capped, 'abcç')
+
+        # Text that fits exactly is passed through whole, without the cap notice
+        with mock.patch('builtins.print') as notice:
+            self.assertEqual(list(file_parser.cap_bytes(iter(['abc', 'de']), max_bytes=5)), ['abc', 'de'])
+        notice.assert_not_called()
+        with mock.patch('builtins.print') as notice:
+            self.assertEqual(list(file_parser.cap_bytes(iter(['abc', 'de', 'f']), max_bytes=5)), ['abc', 'de'])
+        notice.assert_called_once()
+        self.assertIsNone(file_parser.iter_document(BytesIO(b''), 'planilha.xlsx'))
+
+        self.assertIsNone(file_parser.first_text(['', '\n', '  ']))
+        self.assertEqual(list(file_parser.first_text(['\n', 'a', ''])), ['a', ''])
+
     def test_txt_sentiment_logic(self):
         # We can't easily mock PDF/DOCX binary generation without heavy libs in test enviroment
         # But we can test the sentiment logic refactor with strings
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import job_store
+
+
+class TestJobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self._orig_db = job_store.JOBS_DB
+        job_store.JOBS_DB = os.path.join(self.tmpdir.name, 'jobs.sqlite')
+
+    def tearDown(self):
+        job_store.JOBS_DB = self._orig_db
+        self.tmpdir.cleanup()
+
+    def test_job_lifecycle(self):
+        items = [{'id': f'c{i}', 'message': f'mensagem {i}'} for i in range(5)]
+        job_id = job_store.create_job(items)
+        self.assertEqual(job_store.get_job(job_id)['status'], 'queued')
+
+        self.assertEqual(job_store.claim_next_job(), job_id)
+        self.assertIsNone(job_store.claim_next_job())
+
+        job_store.run_job(job_id, lambda batch: [{'id': it['id']} for it in batch], batch_size=2)
+
+        job = job_store.get_job(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['processed'], 5)
+        self.assertEqual(job['progress'], 100.0)
+        self.assertEqual([r['id'] for r in job_store.get_results(job_id)], [f'c{i}' for i in range(5)])
+        self.assertEqual([r['id'] for r in job_store.get_results(job_id, offset=3, limit=1)], ['c3'])
+
+    def test_failed_job_keeps_partial_results(self):
+        job_id = job_store.create_job([{'id': 'a'}, {'id': 'b'}, {'id': 'c'}])
+        job_store.claim_next_job()
+
+        def process(batch):
+            if batch[0]['id'] == 'c':
+                raise RuntimeError('boom')
+            return [{'id': it['id']} for it in batch]
+
+        job_store.run_job(job_id, process, batch_size=2)
+
+        job = job_store.get_job(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'boom')
+        self.assertEqual(len(job_store.get_results(job_id)), 2)
+
+    def test_purge_removes_old_finished_jobs(self):
+        old_done = job_store.create_job([{'id': 'a'}])
+        job_store.claim_next_job()
+        job_store.run_job(old_done, lambda batch: [{}] * len(batch))
+        old_failed = job_store.create_job([{'id': 'b'}, {'id': 'c'}])
+        job_store.claim_next_job()
+        job_store.run_job(old_failed, lambda batch: 1 / 0, batch_size=1)
+        recent = job_store.create_job([{'id': 'd'}])
+        job_store.claim_next_job()
+        job_store.run_job(recent, lambda batch: [{}] * len(batch))
+        queued = job_store.create_job([{'id': 'e'}])
+
+        conn = job_store._connect()
+        long_ago = (datetime.now() - timedelta(days=10)).isoformat()
+        conn.execute('UPDATE jobs SET finished_at = ?, created_at = ? WHERE id IN (?, ?)',
+                     (long_ago, long_ago, old_done, old_failed))
+        conn.execute('UPDATE jobs SET created_at = ? WHERE id = ?', (long_ago, queued))
+
+        self.assertEqual(job_store.purge_jobs(7), 2)
+        self.assertIsNone(job_store.get_job(old_done))
+        self.assertIsNone(job_store.get_job(old_failed))
+        self.assertEqual(job_store.get_results(old_done), [])
+        for table in ('job_results', 'job_items'):
+            left = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE job_id IN (?, ?)', (old_done, old_failed))
+            self.assertEqual(left.fetchone()[0], 0)
+        # Recent and unfinished jobs stay
+        self.assertEqual(job_store.get_job(recent)['status'], 'done')
+        self.assertEqual(len(job_store.get_results(recent)), 1)
+        self.assertEqual(job_store.get_job(queued)['status'], 'queued')
+        self.assertEqual(job_store.purge_jobs(7), 0)
+
+    def test_unknown_job(self):
+        self.assertIsNone(job_store.get_job('missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
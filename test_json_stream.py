@@ -0,0 +1,80 @@
+import io
+import json
+import unittest
+
+from json_stream import LineSplitter, iter_json_array, iter_lines, NotAnArrayError
+
+
+class TestJsonStream(unittest.TestCase):
+    def decode(self, text, chunk_size=7, binary=True):
+        fp = io.BytesIO(text.encode('utf-8')) if binary else io.StringIO(text)
+        return list(iter_json_array(fp, chunk_size=chunk_size))
+
+    def test_matches_json_load(self):
+        data = [
+            {'_id': 'a1', 'Full Conversation': [{'sender': [], 'message': 'Olá, está tudo ótimo! 😀'}]},
+            {'id': 2, 'message': 'texto com "aspas" e \\\\ barras', 'score': 12345.678},
+            [], {}, 'string', 1234567890, True, None
+        ]
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        for chunk_size in (1, 3, 7, 64, 100000):
+            self.assertEqual(self.decode(text, chunk_size), data)
+            self.assertEqual(self.decode(text, chunk_size, binary=False), data)
+
+    def test_number_split_across_chunks(self):
+        self.assertEqual(self.decode('[123456789, 42]', chunk_size=4), [123456789, 42])
+
+    def test_empty_array_and_bom(self):
+        self.assertEqual(self.decode('  [ ]  '), [])
+        fp = io.BytesIO(b'\xef\xbb\xbf[{"a": 1}]')
+        self.assertEqual(list(iter_json_array(fp)), [{'a': 1}])
+
+    def test_not_an_array(self):
+        with self.assertRaises(NotAnArrayError):
+            self.decode('{"a": 1}')
+
+    def test_malformed(self):
+        for text in ('', '[{"a": 1}', '[{"a": 1},]', '[1 2]', '[1] x', '[{"a": }]'):
+            with self.assertRaises(json.JSONDecodeError, msg=text):
+                self.decode(text)
+
+    def test_is_lazy(self):
+        fp = io.BytesIO(b'[{"a": 1}, {"b": 2}, ' + b'x' * 10)
+        items = iter_json_array(fp, chunk_size=4)
+        self.assertEqual(next(items), {'a': 1})
+        self.assertEqual(next(items), {'b': 2})
+        with self.assertRaises(json.JSONDecodeError):
+            next(items)
+
+
+    def test_lines_across_blocks(self):
+        data = b'{"a": 1}\n\n' + b'x' * 1000 + b'\n{"b": 2}'
+        expected = data.split(b'\n')
+        for block_size in (1, 3, 7, 64, 100000):
+            self.assertEqual(list(iter_lines(io.BytesIO(data), block_size)), expected)
+        self.assertEqual(list(iter_lines(io.BytesIO(data + b'\n'))), expected)
+        self.assertEqual(list(iter_lines(io.BytesIO(b''))), [])
+
+    def test_line_splitter(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'ab'), [])
+        self.assertEqual(splitter.feed(b'c\nd'), [b'abc'])
+        self.assertEqual(splitter.feed(b'\n\n'), [b'd', b''])
+        self.assertEqual(splitter.feed(b'e'), [])
+        self.assertEqual(splitter.finish(), [b'e'])
+        self.assertEqual(splitter.finish(), [])
+
+    def test_line_splitter_skips_long_lines(self):
+        data = b'abc\n' + b'x' * 20 + b'\nde\n' + b'y' * 9 + b'\n' + b'z' * 11
+        for block_size in (1, 3, 7, 100):
+            splitter = LineSplitter(max_line=10)
+            lines = []
+            for start in range(0, len(data), block_size):
+                lines += splitter.feed(data[start:start + block_size])
+            lines += splitter.finish()
+            self.assertEqual(lines, [b'abc', None, b'de', b'y' * 9, None], block_size)
+            # Nothing of a skipped line is held
+            self.assertEqual(splitter._parts, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+import torch
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+import model_artifact
+
+
+def _mapped_file(tensor):
+    """Path of the file mapping that holds `tensor`'s data, if any."""
+    address = tensor.data_ptr()
+    with open('/proc/self/maps') as f:
+        for line in f:
+            fields = line.split()
+            low, high = (int(x, 16) for x in fields[0].split('-'))
+            if low <= address < high:
+                return fields[5] if len(fields) > 5 else None
+    return None
+
+
+class TestModelArtifact(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        vocab = os.path.join(self.dir, 'vocab.txt')
+        with open(vocab, 'w') as f:
+            f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'bom', 'dia', 'ruim']))
+        tokenizer = BertTokenizerFast(vocab)
+        tokenizer.model_max_length = 128
+        config = BertConfig(
+            vocab_size=8, hidden_size=16, num_hidden_layers=2, num_attention_heads=2, intermediate_size=32,
+            num_labels=3, id2label={0: 'NEG', 1: 'NEU', 2: 'POS'}, label2id={'NEG': 0, 'NEU': 1, 'POS': 2}
+        )
+        self.analyzer = types.SimpleNamespace(
+            model=BertForSequenceClassification(config).eval(),
+            tokenizer=tokenizer,
+            preprocessing_args={'user_token': '@USER'}
+        )
+        self.path = os.path.join(self.dir, 'artifact')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        self.assertFalse(model_artifact.exists(self.path))
+        model_artifact.build(self.analyzer, self.path, model_name='tiny-pt')
+        self.assertTrue(model_artifact.exists(self.path))
+
+        model, tokenizer, manifest = model_artifact.load(self.path)
+        self.assertEqual(manifest['model_name'], 'tiny-pt')
+        self.assertEqual(manifest['preprocessing_args'], {'user_token': '@USER'})
+        self.assertEqual(tokenizer.model_max_length, 128)
+        self.assertTrue(tokenizer.is_fast)
+
+        inputs = self.analyzer.tokenizer(['bom dia', 'ruim'], padding=True, return_tensors='pt')
+        with torch.no_grad():
+            expected = self.analyzer.model(**inputs).logits
+            actual = model(**inputs).logits
+        self.assertTrue(torch.allclose(expected, actual))
+        self.assertEqual(model.config.id2label[2], 'POS')
+
+    @unittest.skipUnless(os.path.exists('/proc/self/maps'), 'needs /proc')
+    def test_weights_are_memory_mapped(self):
+        model_artifact.build(self.analyzer, self.path)
+        model, _, _ = model_artifact.load(self.path)
+        weight = model.classifier.weight
+        self.assertFalse(weight.requires_grad)
+        self.assertEqual(_mapped_file(weight), os.path.join(self.path, model_artifact.WEIGHTS_FILE))
+
+    def test_slow_bertweet_tokenizer(self):
+        # The production model is BERTweet based, whose tokenizer has no fast version
+        from transformers import BertweetTokenizer, RobertaConfig, RobertaForSequenceClassification
+
+        vocab = os.path.join(self.dir, 'bertweet-vocab.txt')
+        merges = os.path.join(self.dir, 'bertweet-bpe.codes')
+        with open(vocab, 'w') as f:
+            f.write('\n'.join(f'{token} 1' for token in ['bom', 'dia', 'ruim', 'b@@', 'om']))
+        with open(merges, 'w') as f:
+            f.write('b o 1\nbo m</w> 1\n')
+        tokenizer = BertweetTokenizer(vocab, merges)
+        tokenizer.model_max_length = 64
+        self.assertFalse(tokenizer.is_fast)
+        config = RobertaConfig(
+            vocab_size=len(tokenizer), hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+            intermediate_size=32, max_position_embeddings=130, pad_token_id=tokenizer.pad_token_id,
+            num_labels=3, id2label={0: 'NEG', 1: 'NEU', 2: 'POS'}, label2id={'NEG': 0, 'NEU': 1, 'POS': 2}
+        )
+        analyzer = types.SimpleNamespace(
+            model=RobertaForSequenceClassification(config).eval(),
+            tokenizer=tokenizer,
+            preprocessing_args={'user_token': '@USUARIO'}
+        )
+
+        model_artifact.build(analyzer, self.path, model_name='tiny-bertweet')
+        model, loaded, _ = model_artifact.load(self.path)
+        self.assertIsInstance(loaded, BertweetTokenizer)
+        self.assertEqual(loaded.model_max_length, 64)
+        self.assertEqual(loaded('bom dia ruim')['input_ids'], tokenizer('bom dia ruim')['input_ids'])
+
+        inputs = tokenizer(['bom dia', 'ruim'], padding=True, return_tensors='pt')
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(analyzer.model(**inputs).logits, model(**inputs).logits))
+
+    def test_other_format_is_ignored(self):
+        model_artifact.build(self.analyzer, self.path)
+        with open(os.path.join(self.path, model_artifact.MANIFEST_FILE), 'w') as f:
+            f.write('{"format": 0}')
+        self.assertFalse(model_artifact.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from prediction_cache import PredictionCache
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'predictions.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_depends_on_model_and_text(self):
+        a = PredictionCache.make_key("obrigado", "model-a")
+        self.assertEqual(a, PredictionCache.make_key("obrigado", "model-a"))
+        self.assertNotEqual(a, PredictionCache.make_key("obrigado", "model-b"))
+        self.assertNotEqual(a, PredictionCache.make_key("bom dia", "model-a"))
+        # Case and whitespace variants share a key
+        self.assertEqual(PredictionCache.make_key("Bom  dia\n", "model-a"),
+                         PredictionCache.make_key("bom dia", "model-a"))
+
+    def test_memory_tier_is_bounded_lru(self):
+        cache = PredictionCache(max_entries=2, db_path='')
+        p = {'POS': 0.1, 'NEG': 0.2, 'NEU': 0.7}
+        cache.put_many({'a': p, 'b': p})
+        cache.get_many(['a'])          # 'a' becomes most recently used
+        cache.put_many({'c': p})       # evicts 'b'
+
+        found = cache.get_many(['a', 'b', 'c'])
+        self.assertEqual(set(found), {'a', 'c'})
+        stats = cache.stats()
+        self.assertEqual(stats['hits_memory'], 3)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['memory_entries'], 2)
+
+    def test_disk_tier_survives_new_instance(self):
+        p = {'POS': 0.9, 'NEG': 0.05, 'NEU': 0.05}
+        PredictionCache(max_entries=10, db_path=self.db_path).put_many({'k': p})
+
+        fresh = PredictionCache(max_entries=10, db_path=self.db_path)
+        self.assertEqual(fresh.get_many(['k', 'missing']), {'k': p})
+        self.assertEqual(fresh.stats()['hits_disk'], 1)
+
+        # Promoted to memory after the disk hit
+        fresh.get_many(['k'])
+        self.assertEqual(fresh.stats()['hits_memory'], 1)
+
+    def test_disk_tier_prunes_least_recently_used_rows(self):
+        p = {'POS': 0.3, 'NEG': 0.3, 'NEU': 0.4}
+        cache = PredictionCache(max_entries=0, db_path=self.db_path, db_max_entries=3)
+        cache.put_many({'a': p, 'b': p})
+        cache.get_many(['a'])                # 'a' used after 'b'
+        cache.put_many({'c': p, 'd': p})     # over the cap: 'b' goes
+
+        self.assertEqual(set(cache.get_many(['a', 'b', 'c', 'd'])), {'a', 'c', 'd'})
+        self.assertEqual(cache.stats()['disk_pruned'], 1)
+
+    def test_disk_tier_written_before_the_row_cap(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE predictions (key TEXT PRIMARY KEY, pos REAL NOT NULL, '
+                     'neg REAL NOT NULL, neu REAL NOT NULL)')
+        conn.execute("INSERT INTO predictions VALUES ('old', 0.1, 0.1, 0.8)")
+        conn.commit()
+        conn.close()
+
+        cache = PredictionCache(max_entries=0, db_path=self.db_path, db_max_entries=1)
+        self.assertEqual(cache.get_many(['old']), {'old': {'POS': 0.1, 'NEG': 0.1, 'NEU': 0.8}})
+        cache.put_many({'new': {'POS': 0.5, 'NEG': 0.2, 'NEU': 0.3}})
+        self.assertEqual(set(cache.get_many(['old', 'new'])), {'new'})
+
+    def test_clear(self):
+        cache = PredictionCache(max_entries=10, db_path=self.db_path)
+        cache.put_many({'k': {'POS': 0.3, 'NEG': 0.3, 'NEU': 0.4}})
+        cache.clear()
+        self.assertEqual(cache.get_many(['k']), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import random
+import unittest
+
+import numpy as np
+
+import scoring
+
+
+def reference_level_scores(pos, neg, neu):
+    """Original per-item 7-level distribution."""
+    intensity = max(pos, neg)
+    scores = {level: 0.0 for level in scoring.LEVELS}
+    if neg > 0.02:
+        if neg > 0.6:
+            scores['very_negative'] = neg * 0.7
+            scores['negative'] = neg * 0.3
+        elif neg > 0.3:
+            scores['negative'] = neg * 0.6
+            scores['slightly_negative'] = neg * 0.4
+        else:
+            scores['slightly_negative'] = neg * 1.0
+    if pos > 0.02:
+        if pos > 0.6:
+            scores['very_positive'] = pos * 0.7
+            scores['positive'] = pos * 0.3
+        elif pos > 0.3:
+            scores['positive'] = pos * 0.6
+            scores['slightly_positive'] = pos * 0.4
+        else:
+            scores['slightly_positive'] = pos * 1.0
+    if intensity > 0.3:
+        scores['neutral'] = 0.0
+    elif intensity > 0.15:
+        scores['neutral'] = neu * 0.1
+    else:
+        scores['neutral'] = neu
+    total = sum(scores.values())
+    if total > 0.001:
+        scores = {k: v / total for k, v in scores.items()}
+    else:
+        scores['neutral'] = 1.0
+    return scores
+
+
+def reference_aggregate(probas):
+    """Original per-conversation weighted aggregation."""
+    chunks = [(p['POS'], p['NEG'], p['NEU'], max(p['POS'], p['NEG'])) for p in probas]
+    total_weight = sum(c[3] for c in chunks)
+    if not chunks or total_weight == 0:
+        return None
+    avg_pos = sum(c[0] * c[3] for c in chunks) / total_weight
+    avg_neg = sum(c[1] * c[3] for c in chunks) / total_weight
+    avg_neu = sum(c[2] * c[3] for c in chunks) / total_weight
+    levels = reference_level_scores(avg_pos, avg_neg, avg_neu)
+    score = max(0, min(100, round((avg_pos - avg_neg + 1) / 2 * 100, 1)))
+    return {
+        'score': score,
+        'sentiment_label': scoring.LEVEL_LABELS[max(levels, key=levels.get)],
+        'level_scores': {k: round(v, 3) for k, v in levels.items()}
+    }
+
+
+def random_probas(rng):
+    a, b = sorted((rng.random(), rng.random()))
+    values = [a, b - a, 1 - b]
+    rng.shuffle(values)
+    return dict(zip(scoring.PROBA_COLUMNS, values))
+
+
+class TestScoring(unittest.TestCase):
+    def test_matches_reference_aggregation(self):
+        rng = random.Random(7)
+        conversations = [[random_probas(rng) for _ in range(rng.randint(0, 6))] for _ in range(500)]
+        # Edge cases: no signal at all, exact thresholds
+        conversations.append([{'POS': 0.0, 'NEG': 0.0, 'NEU': 1.0}])
+        conversations.append([{'POS': 0.3, 'NEG': 0.6, 'NEU': 0.1}, {'POS': 0.15, 'NEG': 0.02, 'NEU': 0.83}])
+
+        rows = [p for conv in conversations for p in conv]
+        segment_ids = [i for i, conv in enumerate(conversations) for _ in conv]
+        results = scoring.build_results(
+            scoring.score_segments(scoring.probas_to_matrix(rows), segment_ids, len(conversations))
+        )
+
+        for conv, result in zip(conversations, results):
+            expected = reference_aggregate(conv)
+            if expected is None:
+                self.assertEqual(result['sentiment_label'], 'Neutral')
+                self.assertEqual(result['score'], 50.0)
+            else:
+                self.assertEqual(result, expected)
+
+    def test_py_round_keeps_python_semantics(self):
+        values = np.array([0.15, 0.25, 2.675, 1.005, 0.0005, 57.45, 99.95, 12.3456])
+        for nd in (1, 3):
+            self.assertEqual(scoring.py_round(values, nd).tolist(), [round(v, nd) for v in values.tolist()])
+
+    def test_refinement_matches_score_ranges(self):
+        offsets = {'score_offset': 5.0, 'label_shifts': {'Neutral': 1.5}, 'count': 3}
+        results = [
+            {'score': 50.0, 'sentiment_label': 'Neutral'},
+            {'score': 25.0, 'sentiment_label': 'Negative'},
+            {'score': 98.0, 'sentiment_label': 'Very Positive'},
+            {'score': 37.0, 'sentiment_label': 'Slightly Negative'},
+        ]
+        scoring.refine_results(results, offsets)
+        self.assertEqual([r['score'] for r in results], [71.5, 30.0, 100.0, 42.0])
+        self.assertEqual([r['sentiment_label'] for r in results],
+                         ['Positive', 'Slightly Negative', 'Very Positive', 'Neutral'])
+        self.assertTrue(all(r['refined'] for r in results))
+
+        untouched = scoring.refine_results([{'score': 50.0, 'sentiment_label': 'Neutral'}], {'count': 0})
+        self.assertFalse(untouched[0]['refined'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import segmenter
+
+
+class TestSegmenter(unittest.TestCase):
+    TEXT = (
+        'O Sr. Silva pagou R$ 1.500,00 ontem. Estou... meio chateado. J. Souza ligou!\n\n'
+        'Novo parágrafo aqui? Sim… Fim.'
+    )
+
+    def test_sentences(self):
+        self.assertEqual(list(segmenter.iter_sentences(self.TEXT)), [
+            'O Sr. Silva pagou R$ 1.500,00 ontem',
+            'Estou... meio chateado',
+            'J. Souza ligou',
+            'Novo parágrafo aqui',
+            'Sim',
+            'Fim',
+        ])
+        self.assertEqual(list(segmenter.iter_sentences('')), [])
+        self.assertEqual(list(segmenter.iter_sentences('sem pontuação')), ['sem pontuação'])
+
+    def test_chunks_give_the_same_sentences(self):
+        expected = list(segmenter.iter_sentences(self.TEXT))
+        for size in (1, 2, 3, 7, 50):
+            chunks = (self.TEXT[i:i + size] for i in range(0, len(self.TEXT), size))
+            self.assertEqual(list(segmenter.iter_sentences(chunks)), expected, size)
+
+    def test_windows(self):
+        sentences = [f'Esta é a frase número {i}' for i in range(12)] + ['ok']
+        windows = list(segmenter.iter_windows(sentences, window_size=5))
+        self.assertEqual(len(windows), 3)
+        self.assertTrue(windows[0].startswith('Esta é a frase número 0 Esta'))
+        self.assertNotIn('ok', windows[-1].split())
+        self.assertEqual(list(segmenter.iter_windows(['curta demais', 'ok'])), [])
+        self.assertEqual(list(segmenter.chunked(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_prefetch_keeps_order_and_raises(self):
+        self.assertEqual(list(segmenter.prefetch(range(1000), max_pending=4)), list(range(1000)))
+
+        def failing():
+            yield 1
+            raise ValueError('boom')
+
+        items = segmenter.prefetch(failing())
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+
+if __name__ == '__main__':
+    unittest.main()
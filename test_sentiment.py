@@ -0,0 +1,171 @@
+import types
+import unittest
+from unittest import mock
+
+import app as api
+import sentiment
+from prediction_cache import PredictionCache
+
+
+WORDS = {'bom': 1, 'ruim': 2, 'erro': 99}
+
+
+class StubTokenizer:
+    """One token per word: 1 = 'bom', 2 = 'ruim', 99 = 'erro' (the model fails on it), 3 otherwise."""
+
+    def __init__(self, model_max_length):
+        self.model_max_length = model_max_length
+
+    def __call__(self, texts, add_special_tokens=True, verbose=True):
+        return {'input_ids': [[WORDS.get(w, 3) for w in t.split()] for t in texts]}
+
+
+class StubModel:
+    """
+    Stands in for sentiment.SentimentModel. POS/NEG grow with the share of
+    'bom'/'ruim' tokens of a window (see expected()). Records the batches it
+    is asked to predict and their inputs.
+    """
+
+    def __init__(self, model_max_length=8):
+        self.tokenizer = StubTokenizer(model_max_length)
+        self.special_tokens = ([100], [101])
+        self.config = types.SimpleNamespace(id2label={0: 'POS', 1: 'NEG', 2: 'NEU'})
+        self.cache_namespace = 'stub'
+        self.batches = []
+        self.inputs = []
+
+    def preprocess(self, text):
+        return text
+
+    def predict(self, input_ids, pad_to=None):
+        self.batches.append((len(input_ids), pad_to))
+        self.inputs.append(input_ids)
+        rows = []
+        for ids in input_ids:
+            if WORDS['erro'] in ids:
+                raise RuntimeError('stub failure')
+            pos, neg = ids.count(1), ids.count(2)
+            total = pos + neg + 1
+            rows.append([pos / total, neg / total, 1 / total])
+        return rows
+
+
+def expected(text):
+    """The stub model's prediction for a short text."""
+    words = text.split()
+    pos, neg = words.count('bom'), words.count('ruim')
+    total = pos + neg + 1
+    return {'POS': pos / total, 'NEG': neg / total, 'NEU': 1 / total}
+
+
+class TestSentiment(unittest.TestCase):
+    def setUp(self):
+        self.model = StubModel()
+        self.cache = PredictionCache(db_path='')
+        patches = [
+            mock.patch.object(sentiment, '_model', self.model),
+            mock.patch.object(sentiment, 'prediction_cache', self.cache),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_plan_batches_respects_size_and_token_caps(self):
+        lengths = [5, 1, 3, 9, 2, 7]
+        batches = sentiment.plan_batches(lengths, max_batch_size=2, max_batch_tokens=12)
+        self.assertEqual(batches, [[1, 4], [2, 0], [5], [3]])
+        for batch in batches:
+            self.assertLessEqual(len(batch), 2)
+            if len(batch) > 1:
+                self.assertLessEqual(len(batch) * max(lengths[i] for i in batch), 12)
+
+        # Shortest first, every index exactly once
+        flat = [i for batch in batches for i in batch]
+        self.assertEqual(sorted(flat), list(range(len(lengths))))
+        self.assertEqual([lengths[i] for i in flat], sorted(lengths))
+
+        # A sequence over the token budget still gets a batch of its own
+        self.assertEqual(sentiment.plan_batches([50, 1], max_batch_size=8, max_batch_tokens=12), [[1], [0]])
+        self.assertEqual(sentiment.plan_batches([]), [])
+
+    def test_predict_probas_sorts_by_length_and_scatters_back(self):
+        texts = ['bom bom ruim dia', 'bom', 'ruim ruim', 'erro aqui', 'dia bom dia bom ruim', 'ruim dia']
+        with mock.patch.object(sentiment, 'MAX_BATCH_SIZE', 2), mock.patch.object(sentiment, 'SEQUENCE_BUCKET', 1):
+            probas = sentiment.predict_probas(texts)
+
+        # Model inputs arrive length-sorted, two per batch
+        lengths = [len(ids) for batch in self.model.inputs for ids in batch]
+        self.assertEqual(lengths, sorted(lengths))
+        self.assertTrue(all(len(batch) <= 2 for batch in self.model.inputs))
+
+        # Results come back in input order; the failed batch only costs its own texts
+        failed = [i for i, p in enumerate(probas) if p is None]
+        self.assertIn(3, failed)
+        self.assertLessEqual(len(failed), 2)
+        for i, (text, p) in enumerate(zip(texts, probas)):
+            if i in failed:
+                continue
+            for label, value in expected(text).items():
+                self.assertAlmostEqual(p[label], value, msg=text)
+        self.assertEqual(sentiment.predict_probas([]), [])
+
+    def test_analyze_batch_mixes_empty_and_valid_conversations(self):
+        conversations = [
+            {'Full Conversation': [{'message': 'bom bom dia'}, {'sender': 'agent', 'message': 'ruim ruim ruim'}]},
+            {'Full Conversation': []},
+            {'message': 'ok'},
+            {'message': 'ruim ruim dia'},
+            {'Full Conversation': [{'message': 'dia dia'}, {'message': 'bom dia'}]},
+        ]
+        results = sentiment.SentimentAnalyzer.analyze_batch(conversations)
+
+        # Every scored message of the call shares one model batch
+        self.assertEqual(self.model.batches, [(4, 8)])
+
+        # Same answers, in the same order, as one conversation at a time
+        self.assertEqual(len(results), len(conversations))
+        for conversation, result in zip(conversations, results):
+            self.assertEqual(result, sentiment.SentimentAnalyzer.analyze_conversation(conversation))
+        self.assertEqual(results[1], sentiment.SentimentAnalyzer._build_neutral_response())
+        self.assertEqual(results[2], sentiment.SentimentAnalyzer._build_neutral_response())
+        self.assertGreater(results[0]['score'], 50)
+        self.assertLess(results[3]['score'], 50)
+        self.assertEqual(sentiment.SentimentAnalyzer.analyze_batch([]), [])
+
+    def test_analyze_items_tags_results_with_ids(self):
+        items = [
+            {'_id': 'a1', 'message': 'bom bom'},
+            {'id': 7, 'Full Conversation': []},
+            {'message': 'ruim dia'},
+            {'_id': 'b2', 'id': 'ignored', 'message': 'bom dia'},
+        ]
+        results = api.analyze_items(items)
+        self.assertEqual([r.get('id') for r in results], ['a1', 7, None, 'b2'])
+        self.assertEqual(results[1]['sentiment_label'], 'Neutral')
+
+    def test_case_and_whitespace_variants_share_a_prediction(self):
+        probas = sentiment.predict_probas(['Bom dia', 'bom  dia ', 'ruim'])
+        self.assertEqual(probas[0], probas[1])
+        self.assertEqual(self.model.batches, [(2, 8)])
+
+        sentiment.predict_probas(['BOM DIA'])
+        self.assertEqual(len(self.model.batches), 1)
+        self.assertEqual(self.cache.stats()['hits_memory'], 1)
+
+    def test_failed_window_fails_the_whole_text(self):
+        # 6 tokens per window: the long text is read as several windows, one batch each
+        long_text = ' '.join(['bom'] * 20 + ['erro'] + ['bom'] * 20)
+        with mock.patch.object(sentiment, 'MAX_BATCH_SIZE', 1), mock.patch.object(sentiment, 'WINDOW_OVERLAP', 2):
+            probas = sentiment.predict_probas([long_text, 'bom dia'])
+
+        self.assertGreater(len(self.model.batches), 3)
+        self.assertIsNone(probas[0])
+        self.assertAlmostEqual(probas[1]['POS'], 0.5)
+        # Only the text that was fully analyzed is cached
+        keys = [PredictionCache.make_key(t, 'stub') for t in (long_text, 'bom dia')]
+        self.assertEqual(list(self.cache.get_many(keys)), [keys[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
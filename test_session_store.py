@@ -0,0 +1,252 @@
+import json
+import os
+import tempfile
+import unittest
+
+import scoring
+import session_store
+
+# Ids as the dashboard generates them
+SID = '20260110_100000_a1b2c3'
+OTHER_SID = '20260111_100000_d4e5f6'
+MISSING_SID = '20260112_100000_000000'
+
+
+class TestSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self._orig_dir = session_store.SESSIONS_DIR
+        session_store.SESSIONS_DIR = self.tmpdir.name
+
+    def tearDown(self):
+        session_store.SESSIONS_DIR = self._orig_dir
+        self.tmpdir.cleanup()
+
+    def test_summary_and_lazy_messages(self):
+        writer = session_store.SessionWriter('20260101_120000_abc123')
+        for i in range(3):
+            writer.add({
+                'id': f'c{i}', 'score': 50.0 + i, 'sentiment_label': 'Neutral',
+                'messages': [{'sender': [], 'message': f'mensagem número {i} ✓'}]
+            })
+        writer.close({'filename': 'export.json', 'date': '01/01/2026 12:00'})
+
+        summary = session_store.load_session('20260101_120000_abc123')
+        self.assertEqual(summary['count'], 3)
+        self.assertEqual(summary['filename'], 'export.json')
+
+        page = session_store.query_results('20260101_120000_abc123')
+        self.assertEqual([r['index'] for r in page['results']], [0, 1, 2])
+        self.assertNotIn('messages', page['results'][0])
+
+        self.assertEqual(
+            session_store.load_messages('20260101_120000_abc123', 2),
+            [{'sender': [], 'message': 'mensagem número 2 ✓'}]
+        )
+        self.assertIsNone(session_store.load_messages('20260101_120000_abc123', 3))
+
+    def test_legacy_single_file_session(self):
+        with open(os.path.join(self.tmpdir.name, f'{OTHER_SID}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'filename': 'old.json', 'count': 1, 'date': '',
+                       'results': [{'id': 'x', 'messages': [{'message': 'oi'}]}]}, f)
+
+        summary = session_store.load_session(OTHER_SID)
+        self.assertEqual(summary['count'], 1)
+        self.assertNotIn('messages', session_store.query_results(OTHER_SID)['results'][0])
+        self.assertEqual(session_store.load_messages(OTHER_SID, 0), [{'message': 'oi'}])
+        self.assertEqual([s['id'] for s in session_store.list_sessions()['sessions']], [OTHER_SID])
+        # Converted to the directory layout on first access
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, f'{OTHER_SID}.json')))
+
+    def test_query_paging_sorting_and_filters(self):
+        writer = session_store.SessionWriter(SID)
+        rows = [
+            ('a', 10.0, 'Very Negative', 'Bot A', True, False, '2026-01-03'),
+            ('b', 90.0, 'Very Positive', 'Bot B', False, True, '2026-01-01'),
+            ('c', 50.0, 'Neutral', 'Bot A', False, False, '2026-01-02'),
+            ('d', 75.0, 'Positive', 'Bot A', True, True, {'$date': '2026-01-04'}),
+        ]
+        for cid, score, label, agent, escalation, refined, created in rows:
+            writer.add({'id': cid, 'score': score, 'sentiment_label': label, 'ai_agent': agent,
+                        'human_escalation': escalation, 'refined': refined, 'created_at': created})
+        writer.close({'filename': 'x.json'})
+
+        def ids(**kwargs):
+            return [r['id'] for r in session_store.query_results(SID, **kwargs)['results']]
+
+        self.assertEqual(ids(sort='score', order='desc'), ['b', 'd', 'c', 'a'])
+        self.assertEqual(ids(sort='date'), ['b', 'c', 'a', 'd'])
+        self.assertEqual(ids(agent='Bot A', sort='score'), ['a', 'c', 'd'])
+        self.assertEqual(ids(human_escalation=True), ['a', 'd'])
+        self.assertEqual(ids(refined=False), ['a', 'c'])
+        self.assertEqual(ids(label='Neutral'), ['c'])
+
+        page = session_store.query_results(SID, page=2, per_page=3)
+        self.assertEqual((page['total'], page['pages']), (4, 2))
+        self.assertEqual([r['id'] for r in page['results']], ['d'])
+
+        self.assertEqual(session_store.list_agents(SID), ['Bot A', 'Bot B'])
+
+    def test_metrics_precomputed_and_invalidated_by_corrections(self):
+        writer = session_store.SessionWriter(SID)
+        for score, label, agent, created in [
+            (10.0, 'Very Negative', 'Bot A', '2026-01-01T10:00:00Z'),
+            (80.0, 'Positive', 'Bot A', '2026-01-02T09:00:00Z'),
+            (50.0, 'Neutral', '', '2026-01-02T11:00:00Z'),
+        ]:
+            writer.add({'id': label, 'score': score, 'sentiment_label': label,
+                        'ai_agent': agent, 'created_at': created})
+        writer.close({'filename': 'm.json'})
+
+        stored = session_store.load_session(SID)['metrics']
+        self.assertEqual(stored, session_store.compute_metrics(SID))
+        self.assertEqual(stored['total'], 3)
+        self.assertAlmostEqual(stored['score_sum'], 140.0)
+        self.assertEqual(stored['by_agent']['Bot A']['count'], 2)
+        self.assertEqual(stored['by_day']['2026-01-02']['label_counts'], {'Positive': 1, 'Neutral': 1})
+
+        self.assertTrue(session_store.update_row_label(SID, 2, 'Positive', 'positive'))
+        self.assertIsNone(session_store.load_session(SID)['metrics'])
+
+        rebuilt = session_store.load_metrics(SID)
+        self.assertEqual(rebuilt['label_counts'], {'Very Negative': 1, 'Positive': 2})
+        self.assertEqual(session_store.load_session(SID)['metrics'], rebuilt)
+        row = session_store.query_results(SID, label='Positive', sort='index')['results'][1]
+        self.assertEqual((row['model_label'], row['corrected_label']), ('Neutral', 'Positive'))
+
+        # A second correction still refers to the analysis label
+        self.assertTrue(session_store.update_row_label(SID, 2, 'Negative', 'negative'))
+        row = session_store.query_results(SID, label='Negative')['results'][0]
+        self.assertEqual((row['model_label'], row['corrected_label']), ('Neutral', 'Negative'))
+        self.assertFalse(session_store.update_row_label(SID, 99, 'Neutral', 'neutral'))
+
+    def test_rescore_from_stored_probabilities(self):
+        conversations = [
+            [[0.9, 0.05, 0.05], [0.7, 0.1, 0.2]],
+            [[0.05, 0.85, 0.1]],
+            [],
+        ]
+        original = scoring.build_results(scoring.score_segments(
+            [p for conv in conversations for p in conv],
+            [i for i, conv in enumerate(conversations) for _ in conv],
+            len(conversations)
+        ))
+        writer = session_store.SessionWriter(SID)
+        for i, (probas, result) in enumerate(zip(conversations, original)):
+            writer.add(dict(result, id=f'c{i}', refined=False, probas=probas))
+        writer.close({'filename': 'r.json'})
+        self.assertTrue(session_store.update_row_label(SID, 1, 'Neutral', 'neutral'))
+
+        offsets = {'score_offset': -20.0, 'label_shifts': {}, 'count': 2}
+        self.assertTrue(session_store.rescore_session(SID, offsets))
+
+        rows = session_store.query_results(SID)['results']
+        self.assertEqual([r['score'] for r in rows],
+                         [max(0, round(r['score'] - 20.0, 1)) for r in original])
+        self.assertEqual(rows[0]['sentiment_label'], scoring.LABELS[scoring.labels_for_scores([rows[0]['score']])[0]])
+        self.assertEqual(rows[1]['sentiment_label'], 'Neutral')  # Corrected by hand
+        self.assertEqual(rows[1]['model_label'], original[1]['sentiment_label'])
+        self.assertTrue(all(r['refined'] for r in rows))
+        summary = session_store.load_session(SID)
+        self.assertEqual(summary['metrics'], session_store.compute_metrics(SID))
+        self.assertTrue(summary['refinement_active'])
+
+        # Without offsets the original results come back
+        self.assertTrue(session_store.rescore_session(SID))
+        rows = session_store.query_results(SID)['results']
+        self.assertEqual([r['score'] for r in rows], [r['score'] for r in original])
+        self.assertEqual(rows[0]['level_scores'], original[0]['level_scores'])
+
+        # Sessions saved without probabilities cannot be re-scored
+        writer = session_store.SessionWriter(OTHER_SID)
+        writer.add({'id': 'x', 'score': 50.0, 'sentiment_label': 'Neutral'})
+        writer.close({'filename': 'old.json'})
+        self.assertFalse(session_store.rescore_session(OTHER_SID))
+        self.assertIsNone(session_store.rescore_session(MISSING_SID))
+        self.assertEqual(session_store.rescore_sessions(), {'rescored': 1, 'skipped': 1})
+
+    def test_discard(self):
+        writer = session_store.SessionWriter(SID)
+        writer.add({'id': 'a', 'messages': []})
+        writer.discard()
+        self.assertIsNone(session_store.load_session(SID))
+        self.assertEqual(session_store.list_sessions()['sessions'], [])
+
+    def test_catalog_paging_search_delete_and_expiry(self):
+        for sid, filename in [
+            ('20260101_100000_aaaaaa', 'Dry_Wash.json'),
+            ('20260102_100000_bbbbbb', 'clinica.json'),
+            ('20260103_100000_cccccc', 'Dry_Wash2.json'),
+        ]:
+            writer = session_store.SessionWriter(sid)
+            writer.add({'id': 'x', 'score': 50.0, 'sentiment_label': 'Neutral'})
+            writer.close({'filename': filename, 'date': sid[6:8] + '/01/2026 10:00'})
+
+        page = session_store.list_sessions(page=1, per_page=2)
+        self.assertEqual((page['total'], page['pages']), (3, 2))
+        self.assertEqual([s['filename'] for s in page['sessions']], ['Dry_Wash2.json', 'clinica.json'])
+
+        found = session_store.list_sessions(search='dry_wash')
+        self.assertEqual([s['id'] for s in found['sessions']], ['20260103_100000_cccccc', '20260101_100000_aaaaaa'])
+        self.assertEqual(session_store.list_sessions(search='02/01/2026')['total'], 1)
+        self.assertEqual(session_store.list_sessions(date_from='2026-01-02', date_to='2026-01-02')['total'], 1)
+
+        self.assertTrue(session_store.delete_session('20260102_100000_bbbbbb'))
+        self.assertIsNone(session_store.load_session('20260102_100000_bbbbbb'))
+        self.assertFalse(session_store.delete_session('20260102_100000_bbbbbb'))
+
+        # Everything from 2026-01 is older than one day by now
+        self.assertEqual(session_store.expire_sessions(1), 2)
+        self.assertEqual(session_store.list_sessions()['total'], 0)
+
+    def test_ids_outside_the_store_are_refused(self):
+        sessions = os.path.join(self.tmpdir.name, 'sessions')
+        os.makedirs(sessions)
+        session_store.SESSIONS_DIR = sessions
+        writer = session_store.SessionWriter(SID)
+        writer.add({'id': 'x', 'score': 50.0, 'sentiment_label': 'Neutral'})
+        writer.close({'filename': 'x.json'})
+        bystander = os.path.join(self.tmpdir.name, 'keep.txt')
+        with open(bystander, 'w') as f:
+            f.write('not a session')
+
+        for bad in ['..', '.', '', '../sessions', SID + '/..', SID.upper(), None]:
+            self.assertFalse(session_store.delete_session(bad))
+            self.assertIsNone(session_store.load_session(bad))
+            self.assertIsNone(session_store.load_messages(bad, 0))
+            self.assertIsNone(session_store.query_results(bad))
+            self.assertIsNone(session_store.rescore_session(bad))
+            self.assertFalse(session_store.update_row_label(bad, 0, 'Positive', 'positive'))
+        with self.assertRaises(ValueError):
+            session_store.SessionWriter('..')
+
+        self.assertTrue(os.path.exists(bystander))
+        self.assertEqual(session_store.load_session(SID)['count'], 1)
+
+    def test_dashboard_answers_404_for_invalid_ids(self):
+        import app_dashboard
+
+        writer = session_store.SessionWriter(SID)
+        writer.close({'filename': 'x.json'})
+        client = app_dashboard.app.test_client()
+        for bad in ['..', '.']:
+            self.assertEqual(client.post(f'/sessions/{bad}/delete').status_code, 404)
+            self.assertEqual(client.post(f'/sessions/{bad}/rescore').status_code, 404)
+        response = client.post('/feedback', json={
+            'conversation_id': 'x', 'original_label': 'Neutral', 'corrected_label': 'Positive',
+            'session_id': '..', 'index': 0
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNotNone(session_store.load_session(SID))
+
+    def test_catalog_backfills_existing_sessions(self):
+        writer = session_store.SessionWriter('20260105_080000_dddddd')
+        writer.close({'filename': 'antigo.json', 'date': '05/01/2026 08:00'})
+        os.remove(os.path.join(self.tmpdir.name, session_store.CATALOG_FILE))
+
+        listed = session_store.list_sessions()
+        self.assertEqual([s['filename'] for s in listed['sessions']], ['antigo.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import sys
+import unittest
+
+import app
+import sentiment
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_does_not_load_the_model(self):
+        self.assertNotIn('pysentimiento', sys.modules)
+        self.assertFalse(sentiment.is_ready())
+
+    def test_health_answers_while_the_model_is_not_loaded(self):
+        client = app.app.test_client()
+        self.assertEqual(client.get('/health').status_code, 200)
+
+        ready = client.get('/ready')
+        self.assertEqual(ready.status_code, 503)
+        self.assertFalse(ready.get_json()['ready'])
+        self.assertFalse(sentiment.is_ready())
+
+
+if __name__ == '__main__':
+    unittest.main()
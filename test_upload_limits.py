@@ -0,0 +1,111 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from flask import Flask, jsonify, request
+from werkzeug.test import EnvironBuilder
+
+import app as api
+import upload_limits
+
+
+def make_app():
+    app = Flask(__name__)
+    upload_limits.install(app, {'upload': 1024}, default=64, stream_limits={'lines': 4096})
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        file = request.files['file']
+        return jsonify({'size': len(file.read()), 'stream': type(file.stream).__name__,
+                        'on_disk': bool(getattr(file.stream, '_rolled', False))})
+
+    @app.route('/lines', methods=['POST'])
+    def lines():
+        return jsonify({'lines': sum(1 for _ in request.stream)})
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'size': len(request.get_data())})
+
+    return app
+
+
+class TestUploadLimits(unittest.TestCase):
+    def setUp(self):
+        self.client = make_app().test_client()
+
+    def test_parse_size(self):
+        self.assertEqual(upload_limits.parse_size('2048'), 2048)
+        self.assertEqual(upload_limits.parse_size('512k'), 512 * 1024)
+        self.assertEqual(upload_limits.parse_size('32M'), 32 * 1024 ** 2)
+        self.assertEqual(upload_limits.parse_size('1.5G'), int(1.5 * 1024 ** 3))
+        self.assertEqual(upload_limits.describe(32 * 1024 ** 2), '32 MB')
+
+    def test_limits_per_endpoint(self):
+        self.assertEqual(self.client.post('/echo', data=b'x' * 64).status_code, 200)
+        self.assertEqual(self.client.post('/echo', data=b'x' * 65).status_code, 413)
+
+        ok = self.client.post('/upload', data={'file': (io.BytesIO(b'x' * 500), 'a.json')})
+        self.assertEqual(ok.status_code, 200)
+        self.assertEqual(ok.get_json()['size'], 500)
+        big = self.client.post('/upload', data={'file': (io.BytesIO(b'x' * 2000), 'a.json')})
+        self.assertEqual(big.status_code, 413)
+
+    def test_chunked_body_is_cut_at_the_limit(self):
+        # No Content-Length: the body is read until it goes past the limit
+        environ = EnvironBuilder(method='POST', path='/echo', input_stream=io.BytesIO(b'x' * 1000)).get_environ()
+        del environ['CONTENT_LENGTH']
+        environ['wsgi.input_terminated'] = True
+        self.assertEqual(self.client.open(environ).status_code, 413)
+
+    def test_ndjson_streams_get_the_stream_limit(self):
+        body = b'{"message": "oi"}\n' * 150
+        ndjson = self.client.post('/lines', data=body, content_type='application/x-ndjson')
+        self.assertEqual(ndjson.status_code, 200)
+        self.assertEqual(ndjson.get_json()['lines'], 150)
+        self.assertEqual(self.client.post('/lines', data=body, content_type='application/json').status_code, 413)
+        self.assertEqual(self.client.post('/lines', data=body * 2, content_type='application/x-ndjson').status_code, 413)
+
+    def test_analyze_streams_ndjson_past_the_body_limit(self):
+        # Lines that are not JSON objects are answered without the model
+        line = b'[' + b'0,' * (512 * 1024) + b'0]\n'
+        body = line * (api.ANALYZE_MAX_BYTES // len(line) + 2)
+        self.assertGreater(len(body), api.ANALYZE_MAX_BYTES)
+
+        response = api.app.test_client().post('/analyze', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        results = response.get_data().splitlines()
+        self.assertEqual(len(results), body.count(b'\n'))
+        self.assertEqual(json.loads(results[-1])['error'], 'Invalid JSON object')
+
+    def test_ndjson_lines_over_the_line_limit_are_skipped(self):
+        body = b'{"id": "a"}\n' + b'x' * 5000 + b'\n[1]\n{"id": "b"}\n' + b'y' * 2000
+        with mock.patch.object(api, 'NDJSON_MAX_LINE_BYTES', 1024), \
+                mock.patch.object(api.SentimentAnalyzer, 'analyze_batch', side_effect=lambda items: [{}] * len(items)):
+            response = api.app.test_client().post('/analyze', data=body, content_type='application/x-ndjson')
+            # The body is streamed: read it while the model is patched
+            out = response.get_data()
+        self.assertEqual([json.loads(line) for line in out.splitlines()], [
+            {'id': 'a'},
+            {'error': 'Line too long', 'line': 2},
+            {'error': 'Invalid JSON object', 'line': 3},
+            {'id': 'b'},
+            {'error': 'Line too long', 'line': 5},
+        ])
+
+    def test_large_files_are_spooled_to_disk(self):
+        original = upload_limits.UPLOAD_SPOOL_MAX_MEMORY
+        upload_limits.UPLOAD_SPOOL_MAX_MEMORY = 100
+        try:
+            small = self.client.post('/upload', data={'file': (io.BytesIO(b'x' * 50), 'a.json')}).get_json()
+            large = self.client.post('/upload', data={'file': (io.BytesIO(b'x' * 600), 'a.json')}).get_json()
+        finally:
+            upload_limits.UPLOAD_SPOOL_MAX_MEMORY = original
+        self.assertFalse(small['on_disk'])
+        self.assertTrue(large['on_disk'])
+        self.assertEqual(large['size'], 600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import io
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import upload_pool
+from sentiment import SentimentAnalyzer
+
+
+def _build_tiny_artifact(path):
+    """A random 3-label BERT saved as a model artifact (no download)."""
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    import model_artifact
+
+    os.makedirs(path)
+    vocab = os.path.join(path, 'vocab.txt')
+    with open(vocab, 'w') as f:
+        f.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]', 'bom', 'dia', 'ruim', 'amo']))
+    tokenizer = BertTokenizerFast(vocab)
+    tokenizer.model_max_length = 32
+    config = BertConfig(
+        vocab_size=9, hidden_size=16, num_hidden_layers=1, num_attention_heads=2, intermediate_size=32,
+        num_labels=3, id2label={0: 'NEG', 1: 'NEU', 2: 'POS'}, label2id={'NEG': 0, 'NEU': 1, 'POS': 2},
+        max_position_embeddings=64
+    )
+    analyzer = types.SimpleNamespace(
+        model=BertForSequenceClassification(config).eval(), tokenizer=tokenizer, preprocessing_args={}
+    )
+    model_artifact.build(analyzer, os.path.join(path, 'artifact'), model_name='tiny-pt')
+
+
+class TestUploadPool(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_rows_from_precomputed_probas(self):
+        import app_dashboard
+
+        probas = [
+            np.array([[0.8, 0.1, 0.1], [0.6, 0.2, 0.2]]),
+            None,
+            np.array([[0.1, 0.7, 0.2]])
+        ]
+        conversations = [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}]
+        rows = app_dashboard.build_result_rows(conversations, 10, False, {'count': 0}, probas)
+
+        expected = SentimentAnalyzer.score_batch(np.concatenate([probas[0], probas[2]]), [0, 0, 1], 2)
+        self.assertEqual([row['id'] for row in rows], ['a', 'b', 'c'])
+        self.assertEqual(rows[0]['score'], expected[0]['score'])
+        self.assertEqual(rows[2]['sentiment_label'], expected[1]['sentiment_label'])
+        self.assertTrue(rows[1]['analysis_error'])
+        self.assertEqual(len(rows[1]['probas']), 0)
+
+    def test_pool_merges_shards_in_input_order(self):
+        _build_tiny_artifact(os.path.join(self.dir, 'model'))
+        env = {
+            'MODEL_ARTIFACT_DIR': os.path.join(self.dir, 'model', 'artifact'),
+            'PREDICTION_CACHE_DB': os.path.join(self.dir, 'cache.sqlite')
+        }
+        # Conversation i has i % 4 scored messages
+        conversations = [
+            {'id': str(i), 'Full Conversation': [{'message': 'bom dia ruim'}] * (i % 4)}
+            for i in range(40)
+        ]
+        shards = [(start, conversations[start:start + 3]) for start in range(0, 40, 3)]
+
+        with mock.patch.dict(os.environ, env), mock.patch.object(upload_pool, 'UPLOAD_PROCESSES', 2), \
+                mock.patch.object(upload_pool, '_pool', None):
+            try:
+                merged = list(upload_pool.analyze_shards(iter(shards)))
+                stats = upload_pool.stats()
+            finally:
+                if upload_pool._pool is not None:
+                    upload_pool._pool.shutdown()
+
+        self.assertEqual([key for key, _, _ in merged], [start for start, _ in shards])
+        probas = [p for _, _, shard_probas in merged for p in shard_probas]
+        self.assertEqual([p.shape for p in probas], [(i % 4, 3) for i in range(40)])
+        self.assertEqual(stats['local_fallbacks'], 0)
+        self.assertTrue(stats['running'])
+
+    def test_failed_upload_leaves_no_session(self):
+        import app_dashboard
+        import session_store
+
+        sessions = os.path.join(self.dir, 'sessions')
+        body = b'[{"id": "a", "Full Conversation": []}, 5]'
+        with mock.patch.object(session_store, 'SESSIONS_DIR', sessions), \
+                mock.patch.object(upload_pool, 'UPLOAD_PROGRESS_DIR', os.path.join(self.dir, 'progress')), \
+                mock.patch.object(app_dashboard, 'get_correction_offsets', return_value={'count': 0}), \
+                mock.patch.object(upload_pool, 'predict_conversations',
+                                  side_effect=lambda batch: [np.empty((0, 3))] * len(batch)):
+            response = app_dashboard.app.test_client().post(
+                '/upload?upload_id=0123456789abcdef',
+                data={'file': (io.BytesIO(body), 'export.json')}, content_type='multipart/form-data'
+            )
+            progress = upload_pool.read_progress('0123456789abcdef')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith('/'))
+        self.assertEqual(progress, {'state': 'error'})
+        self.assertEqual(os.listdir(sessions) if os.path.isdir(sessions) else [], [])
+
+    def test_auto_pool_size_stays_within_the_memory_budget(self):
+        gib = 1024 ** 3
+        with mock.patch.object(upload_pool, 'available_cores', return_value=16), \
+                mock.patch.object(upload_pool, 'UPLOAD_TORCH_THREADS', 2), \
+                mock.patch.object(upload_pool, 'UPLOAD_POOL_MEMORY', 2 * gib):
+            self.assertEqual(upload_pool.pool_size('3'), 3)
+            with mock.patch.object(upload_pool, 'UPLOAD_PROCESS_MEMORY', gib):
+                self.assertEqual(upload_pool.pool_size('auto'), 2)
+            with mock.patch.object(upload_pool, 'UPLOAD_PROCESS_MEMORY', gib // 8):
+                self.assertEqual(upload_pool.pool_size('auto'), 8)
+            with mock.patch.object(upload_pool, 'UPLOAD_PROCESS_MEMORY', 4 * gib):
+                self.assertEqual(upload_pool.pool_size('auto'), 1)
+
+    def test_progress_round_trip(self):
+        with mock.patch.object(upload_pool, 'UPLOAD_PROGRESS_DIR', self.dir):
+            self.assertIsNone(upload_pool.read_progress('0123456789abcdef'))
+            upload_pool.report_progress('0123456789abcdef', state='running', conversations=32, percent=12.5)
+            self.assertEqual(
+                upload_pool.read_progress('0123456789abcdef'),
+                {'state': 'running', 'conversations': 32, 'percent': 12.5}
+            )
+
+            # Anything but a short hex id is ignored (no paths outside the directory)
+            upload_pool.report_progress('../../etc/x', state='done')
+            self.assertIsNone(upload_pool.read_progress('../../etc/x'))
+            self.assertEqual(os.listdir(self.dir), ['0123456789abcdef.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
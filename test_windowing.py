@@ -0,0 +1,59 @@
+import unittest
+
+import windowing
+
+
+class TestWindowing(unittest.TestCase):
+    def test_short_text_is_one_window(self):
+        self.assertEqual(windowing.split_windows([1, 2, 3], 5), [[1, 2, 3]])
+
+    def test_long_text_is_split_into_overlapping_windows(self):
+        ids = list(range(300))
+        windows = windowing.split_windows(ids, 126, overlap=32)
+        self.assertEqual([len(w) for w in windows], [126, 126, 126])
+        self.assertEqual(windows[0][0], 0)
+        self.assertEqual(windows[1][0], 94)
+        # The last window ends with the text
+        self.assertEqual(windows[-1][-1], 299)
+        # Every token is covered and consecutive windows overlap
+        self.assertEqual(set(t for w in windows for t in w), set(ids))
+        self.assertTrue(set(windows[0]) & set(windows[1]))
+
+    def test_capped_text_keeps_its_end_and_counts_the_rest(self):
+        before = windowing.stats()
+        # 10000 tokens need 107 windows of 126 (step 94)
+        capped = windowing.split_windows(list(range(10000)), 126, overlap=32, max_windows=4)
+        self.assertEqual([w[0] for w in capped], [0, 94, 188, 10000 - 126])
+        self.assertEqual(capped[-1][-1], 9999)
+
+        after = windowing.stats()
+        self.assertEqual(after['truncated_messages'] - before['truncated_messages'], 1)
+        self.assertEqual(after['dropped_windows'] - before['dropped_windows'], 107 - 4)
+
+        # Exactly max_windows windows: nothing dropped
+        self.assertEqual(len(windowing.split_windows(list(range(300)), 126, overlap=32, max_windows=3)), 3)
+        self.assertEqual(windowing.stats(), after)
+
+    def test_bucket_length(self):
+        self.assertEqual(windowing.bucket_length(17, 16), 32)
+        self.assertEqual(windowing.bucket_length(32, 16), 32)
+        self.assertEqual(windowing.bucket_length(127, 16, max_length=128), 128)
+        self.assertEqual(windowing.bucket_length(125, 16, max_length=126), 126)
+        self.assertEqual(windowing.bucket_length(7, 1), 7)
+
+    def test_merge_weights_windows_by_intensity(self):
+        calm = {'POS': 0.1, 'NEG': 0.1, 'NEU': 0.8}
+        angry = {'POS': 0.0, 'NEG': 0.9, 'NEU': 0.1}
+        self.assertIs(windowing.merge_window_probas([calm]), calm)
+        self.assertIsNone(windowing.merge_window_probas([None]))
+
+        merged = windowing.merge_window_probas([calm, angry, None])
+        self.assertAlmostEqual(merged['NEG'], (0.1 * 0.1 + 0.9 * 0.9) / 1.0)
+        self.assertAlmostEqual(sum(merged.values()), 1.0)
+
+        flat = windowing.merge_window_probas([{'POS': 0.0, 'NEG': 0.0, 'NEU': 1.0}] * 2)
+        self.assertEqual(flat['NEU'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Upload limits — per-endpoint request body limits and disk-spooled uploads.
+
+install() sets a body size limit per Flask endpoint, with a separate,
+larger limit for streamed NDJSON bodies (read line by line, so their
+size does not cost memory). A request whose
+Content-Length is over the limit is rejected with 413 before any of its
+body is read; a body without Content-Length (chunked) is cut off with 413
+as soon as it goes past the limit. Uploaded files are kept in memory only
+up to UPLOAD_SPOOL_MAX_MEMORY bytes and spooled to a temporary file beyond
+that, so a large upload costs disk, not worker memory.
+
+Sizes are given in bytes, optionally with a K, M or G suffix (e.g. 32M).
+"""
+
+import os
+import tempfile
+
+from flask import Request, abort, request
+
+
+def parse_size(value: str) -> int:
+    """'1048576', '512K', '32M' or '1G' -> bytes."""
+    value = value.strip().upper()
+    multiplier = 1
+    if value and value[-1] in 'KMG':
+        multiplier = 1024 ** ('KMG'.index(value[-1]) + 1)
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+def env_size(name: str, default: str) -> int:
+    return parse_size(os.environ.get(name, default))
+
+
+# Body limit of endpoints without a limit of their own
+MAX_REQUEST_BYTES = env_size('MAX_REQUEST_BYTES', '1M')
+
+# Uploaded files larger than this are moved from memory to a temporary file
+UPLOAD_SPOOL_MAX_MEMORY = env_size('UPLOAD_SPOOL_MAX_MEMORY', '1M')
+
+# Where spooled uploads are written (default: the system temp dir)
+UPLOAD_TMP_DIR = os.environ.get('UPLOAD_TMP_DIR') or None
+
+# Bodies of this type are consumed incrementally and get the stream limits
+STREAM_MIMETYPE = 'application/x-ndjson'
+
+
+class SpooledRequest(Request):
+    """Request whose uploaded files are spooled to disk past UPLOAD_SPOOL_MAX_MEMORY bytes."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, dir=UPLOAD_TMP_DIR)
+
+
+def install(app, limits: dict, default: int = MAX_REQUEST_BYTES, stream_limits: dict | None = None):
+    """
+    Enforce `limits` ({endpoint name: max body bytes}) on `app`; other
+    endpoints get `default`. STREAM_MIMETYPE bodies sent to an endpoint of
+    `stream_limits` get that limit instead. Oversize requests raise 413,
+    which the app can render with its own errorhandler.
+    """
+    stream_limits = stream_limits or {}
+    app.request_class = SpooledRequest
+    # Global ceiling, in case a request fails before its endpoint is known
+    app.config['MAX_CONTENT_LENGTH'] = max([default, *limits.values(), *stream_limits.values()])
+
+    @app.before_request
+    def enforce_body_limit():
+        if request.mimetype == STREAM_MIMETYPE and request.endpoint in stream_limits:
+            limit = stream_limits[request.endpoint]
+        else:
+            limit = limits.get(request.endpoint, default)
+        request.max_content_length = limit
+        if request.content_length is not None and request.content_length > limit:
+            abort(413)
+
+
+def describe(limit: int) -> str:
+    """Human-readable size for error messages."""
+    for unit, size in (('GB', 1024 ** 3), ('MB', 1024 ** 2), ('KB', 1024)):
+        if limit >= size:
+            return f'{limit / size:g} {unit}'
+    return f'{limit} bytes'
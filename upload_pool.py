@@ -0,0 +1,279 @@
+"""
+Upload pool — dashboard uploads analyzed by a pool of model processes.
+
+With UPLOAD_PROCESSES set, the conversations of an upload are cut into
+shards (UPLOAD_BATCH_SIZE conversations each) and sent to worker
+processes that each hold their own model, using UPLOAD_TORCH_THREADS
+intra-op threads. UPLOAD_PROCESSES=auto sizes the pool by the available
+cores, capped by a memory budget: every process costs about
+UPLOAD_PROCESS_MEMORY, more when there is no model artifact whose weights
+the processes share. Results come back in input order. At most
+UPLOAD_SHARDS_PER_PROCESS shards per process are in flight, so the JSON
+decoding never runs far ahead of the model. The pool starts on the first
+upload and lives as long as the dashboard process. When it breaks (a
+worker killed by the OOM killer, ...), the affected shards are analyzed in
+the request's own process and a new pool starts on the next upload.
+
+Without UPLOAD_PROCESSES (the default), shards are analyzed one after the
+other in the request thread.
+
+The progress of each upload is written to a small file per upload id, so
+that any dashboard worker can answer the browser's progress polls.
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import model_artifact
+import sentiment
+from sentiment import SentimentAnalyzer
+from upload_limits import env_size
+
+
+def available_cores() -> int:
+    """Cores this process may run on (the container's CPU set, not the host's)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def memory_limit() -> int | None:
+    """The container's memory limit (cgroup v2 or v1), None when unlimited or unknown."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # v1 reports "unlimited" as a huge number
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value)
+        return None
+    return None
+
+
+# Intra-op torch threads of each pool process
+UPLOAD_TORCH_THREADS = max(1, int(os.environ.get('UPLOAD_TORCH_THREADS', '1')))
+
+# Memory the pool processes may use together ('auto' sizing); default: half
+# the container's limit (the web worker keeps the rest), or 2G
+_limit = memory_limit()
+UPLOAD_POOL_MEMORY = env_size('UPLOAD_POOL_MEMORY', str(_limit // 2) if _limit else '2G')
+
+# Private memory of one pool process: torch runtime and activations, plus a
+# copy of the weights when there is no model artifact to share them from
+UPLOAD_PROCESS_MEMORY = env_size('UPLOAD_PROCESS_MEMORY', '512M' if model_artifact.exists() else '1G')
+
+
+def pool_size(setting: str) -> int:
+    """UPLOAD_PROCESSES: a number, or 'auto' for one process per UPLOAD_TORCH_THREADS cores within UPLOAD_POOL_MEMORY."""
+    setting = setting.strip().lower()
+    if setting != 'auto':
+        return int(setting)
+    return max(1, min(available_cores() // UPLOAD_TORCH_THREADS, UPLOAD_POOL_MEMORY // UPLOAD_PROCESS_MEMORY))
+
+
+# Model processes per dashboard process (0 = analyze in the request thread)
+UPLOAD_PROCESSES = pool_size(os.environ.get('UPLOAD_PROCESSES', '0'))
+
+# Shards queued per pool process ahead of the one being merged
+UPLOAD_SHARDS_PER_PROCESS = 2
+
+# Where upload progress files are written
+UPLOAD_PROGRESS_DIR = os.environ.get(
+    'UPLOAD_PROGRESS_DIR',
+    os.path.join(tempfile.gettempdir(), 'sentiment-upload-progress')
+)
+
+# Progress files older than this are removed
+PROGRESS_MAX_AGE_SECONDS = 3600
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{8,32}$')
+
+_pool = None
+_pool_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_shards = 0
+_local_fallbacks = 0
+_restarts = 0
+
+
+def predict_conversations(conversations: list, start_index: int = 0) -> list:
+    """
+    Model probabilities (N x 3 POS/NEG/NEU matrix) of the scored messages of
+    each conversation, or None for a conversation that cannot be analyzed.
+    Runs in a pool process or in the request's own process.
+    """
+    try:
+        matrix, segment_ids = SentimentAnalyzer.predict_batch(conversations)
+        # Rows are grouped by conversation in input order
+        counts = np.bincount(np.asarray(segment_ids, dtype=np.intp), minlength=len(conversations))
+        return np.split(matrix, np.cumsum(counts)[:-1])
+    except Exception as e:
+        print(f"Error analyzing batch at {start_index}, retrying one by one: {e}")
+
+    probas = []
+    for i, conversation in enumerate(conversations, start_index):
+        try:
+            probas.append(SentimentAnalyzer.predict_batch([conversation])[0])
+        except Exception as e:
+            conv_id = conversation.get('_id') or conversation.get('id') or str(i)
+            print(f"Error analyzing conversation {conv_id}: {e}")
+            probas.append(None)
+    return probas
+
+
+def _init_process(torch_threads: int):
+    # Read by the model when it loads, right below
+    sentiment.TORCH_THREADS = torch_threads
+    sentiment.warm_up()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None and UPLOAD_PROCESSES > 0:
+            # spawn: a fork of a threaded web worker (torch thread pool, warm-up
+            # thread) can deadlock in the child
+            _pool = ProcessPoolExecutor(
+                max_workers=UPLOAD_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process,
+                initargs=(UPLOAD_TORCH_THREADS,)
+            )
+            print(f"Upload pool: {UPLOAD_PROCESSES} processes x {UPLOAD_TORCH_THREADS} torch threads")
+        return _pool
+
+
+def _drop_pool(pool):
+    """Forget a broken pool; the next upload starts a new one."""
+    global _pool, _restarts
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _restarts += 1
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def analyze_shards(shards):
+    """
+    Analyze an iterable of (key, conversations) shards.
+    Yields (key, conversations, probas) in input order, probas as returned
+    by predict_conversations. `key` is passed through untouched.
+    """
+    global _shards
+    pool = _get_pool()
+    if pool is None:
+        for key, conversations in shards:
+            yield key, conversations, predict_conversations(conversations)
+        return
+
+    def collect(entry):
+        global _local_fallbacks
+        key, conversations, future = entry
+        if future is not None:
+            try:
+                return key, conversations, future.result()
+            except BrokenProcessPool as e:
+                print(f"Upload pool broke, analyzing in process: {e}")
+                _drop_pool(pool)
+            except Exception as e:
+                print(f"Error in upload pool shard, analyzing in process: {e}")
+        with _stats_lock:
+            _local_fallbacks += 1
+        return key, conversations, predict_conversations(conversations)
+
+    pending = deque()
+    max_pending = UPLOAD_PROCESSES * UPLOAD_SHARDS_PER_PROCESS
+    try:
+        for key, conversations in shards:
+            if len(pending) >= max_pending:
+                yield collect(pending.popleft())
+            try:
+                future = pool.submit(predict_conversations, conversations)
+            except (BrokenProcessPool, RuntimeError) as e:
+                print(f"Upload pool unavailable, analyzing in process: {e}")
+                _drop_pool(pool)
+                future = None
+            with _stats_lock:
+                _shards += 1
+            pending.append((key, conversations, future))
+        while pending:
+            yield collect(pending.popleft())
+    finally:
+        # Upload aborted (invalid JSON, client gone): drop its queued shards
+        for _, _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {
+            'processes': UPLOAD_PROCESSES,
+            'torch_threads': UPLOAD_TORCH_THREADS,
+            'memory_budget': UPLOAD_POOL_MEMORY,
+            'process_memory': UPLOAD_PROCESS_MEMORY,
+            'running': _pool is not None,
+            'shards': _shards,
+            'local_fallbacks': _local_fallbacks,
+            'restarts': _restarts
+        }
+
+
+def _progress_path(upload_id: str) -> str | None:
+    if not upload_id or not _UPLOAD_ID.match(upload_id):
+        return None
+    return os.path.join(UPLOAD_PROGRESS_DIR, f'{upload_id}.json')
+
+
+def report_progress(upload_id: str, **progress):
+    """Record the progress of an upload (state, conversations, percent, ...); no-op without a valid id."""
+    path = _progress_path(upload_id)
+    if path is None:
+        return
+    try:
+        os.makedirs(UPLOAD_PROGRESS_DIR, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing upload progress: {e}")
+
+
+def read_progress(upload_id: str) -> dict | None:
+    """Last recorded progress of an upload, or None when unknown."""
+    path = _progress_path(upload_id)
+    if path is None:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def expire_progress(max_age: float = PROGRESS_MAX_AGE_SECONDS):
+    """Remove the progress files of uploads finished (or abandoned) long ago."""
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(UPLOAD_PROGRESS_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
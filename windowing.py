@@ -0,0 +1,88 @@
+"""
+Windowing — token-budget splitting of long messages.
+
+A message longer than the model's max sequence length is split into
+overlapping windows of token ids instead of being truncated, so the end of
+a long complaint is still read. Window predictions are merged back into one
+prediction per message with the same intensity weighting used to aggregate
+messages into a conversation. A message needing more than `max_windows`
+windows keeps its first and last windows; the windows dropped in between
+are counted (see stats(), shown by GET /stats).
+"""
+
+import threading
+
+# Tokens shared by consecutive windows, so a sentence cut at a window
+# boundary is still seen whole by one of them
+WINDOW_OVERLAP = 32
+
+
+_stats_lock = threading.Lock()
+_truncated_messages = 0
+_dropped_windows = 0
+
+
+def split_windows(token_ids: list, window_size: int, overlap: int = WINDOW_OVERLAP,
+                  max_windows: int | None = None) -> list:
+    """
+    Split token ids (without special tokens) into windows of at most
+    `window_size` tokens, each starting `window_size - overlap` after the
+    previous one. The last window is aligned to the end of the text so no
+    window is needlessly short. Past `max_windows` windows, the middle of
+    the text is skipped: the first `max_windows - 1` windows and the last
+    one are returned, and the skipped windows are counted in stats().
+    """
+    global _truncated_messages, _dropped_windows
+    if len(token_ids) <= window_size:
+        return [token_ids]
+    overlap = max(0, min(overlap, window_size - 1))
+    step = window_size - overlap
+
+    # Windows starting at 0, step, ... plus the end-aligned one
+    count = -(-(len(token_ids) - window_size) // step) + 1
+    head = count - 1
+    if max_windows and count > max_windows:
+        head = max(0, max_windows - 1)
+        with _stats_lock:
+            _truncated_messages += 1
+            _dropped_windows += count - head - 1
+
+    windows = [token_ids[start:start + window_size] for start in range(0, head * step, step)]
+    windows.append(token_ids[-window_size:])
+    return windows
+
+
+def stats() -> dict:
+    """Messages that needed more than max_windows windows, and the windows skipped in them."""
+    with _stats_lock:
+        return {'truncated_messages': _truncated_messages, 'dropped_windows': _dropped_windows}
+
+
+def bucket_length(length: int, bucket: int, max_length: int | None = None) -> int:
+    """Round a sequence length up to a multiple of `bucket` (never past `max_length`)."""
+    if bucket > 1:
+        length = -(-length // bucket) * bucket
+    if max_length is not None:
+        length = min(length, max_length)
+    return length
+
+
+def merge_window_probas(probas: list) -> dict | None:
+    """
+    Merge the {'POS', 'NEG', 'NEU'} predictions of one message's windows,
+    weighting each window by its emotional intensity max(POS, NEG).
+    Windows that failed (None) are skipped.
+    """
+    probas = [p for p in probas if p is not None]
+    if not probas:
+        return None
+    if len(probas) == 1:
+        return probas[0]
+
+    weights = [max(p['POS'], p['NEG']) for p in probas]
+    total = sum(weights)
+    if total == 0:
+        # No window carries any signal: plain average
+        weights = [1.0] * len(probas)
+        total = float(len(probas))
+    return {label: sum(p[label] * w for p, w in zip(probas, weights)) / total for label in probas[0]}